@@ -0,0 +1,244 @@
+"""
+Сравнение агрегатов из asset_totals с подсчетом по таблице purchases.
+
+База SQLite заполняется покупками (по умолчанию 10 000 на актив), затем
+для случайных пар пользователь/актив измеряются задержки запросов
+статистики и списка активов двумя способами: чтение строки asset_totals,
+которую ведут триггеры, и агрегирование покупок при каждом запросе.
+Отдельно измеряется цена триггеров при добавлении покупки: на той же
+базе с триггерами и на копии без них.
+
+Запуск: ``python -m benchmarks.aggregates -u 10 -a 3 -p 10000``
+"""
+
+import argparse
+import json
+import logging
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import typing  # noqa: skip
+from os import path
+
+from .utils import summarize
+from core.constants import SUPPORTED_CRYPTOS
+from data.storage import SQLiteStorage
+
+QUERIES: dict[str, str] = {
+    "stats_summary": """
+        SELECT total_cost, total_amount, purchase_count
+        FROM asset_totals
+        WHERE user_id = ? AND asset = ?
+    """,
+    "stats_scan": """
+        SELECT SUM(price * amount), SUM(amount), COUNT(*)
+        FROM purchases
+        WHERE user_id = ? AND asset = ?
+    """,
+    "assets_summary": "SELECT asset FROM asset_totals WHERE user_id = ?",
+    "assets_scan": "SELECT DISTINCT asset FROM purchases WHERE user_id = ?",
+}
+TRIGGERS: tuple[str, ...] = (
+    "purchases_insert_totals",
+    "purchases_delete_totals",
+)
+
+
+def fill(
+    db_path: str, users: int, assets: int, purchases: int, seed: int
+) -> float:
+    """Заполняет базу покупками, возвращает длительность в секундах."""
+    rng = random.Random(seed)
+    storage = SQLiteStorage(db_path)
+    start = time.perf_counter()
+    try:
+        for user_id in range(1, users + 1):
+            user_assets = rng.sample(sorted(SUPPORTED_CRYPTOS), assets)
+            storage.add_purchases_bulk(
+                user_id,
+                [
+                    (asset, rng.uniform(1, 100_000), rng.uniform(0.001, 10))
+                    for asset in user_assets
+                    for _ in range(purchases)
+                ],
+            )
+    finally:
+        storage.close()
+    return time.perf_counter() - start
+
+
+def measure_queries(
+    db_path: str, users: int, ops: int, seed: int
+) -> dict[str, dict[str, float]]:
+    """Задержки запросов агрегатов для случайных пользователей."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        pairs = conn.execute(
+            "SELECT user_id, asset FROM asset_totals"
+        ).fetchall()
+        keys = [rng.choice(pairs) for _ in range(ops)]
+        samples: dict[str, list[int]] = {name: [] for name in QUERIES}
+        for user_id, asset in keys:
+            for name, query in QUERIES.items():
+                params = (user_id, asset)
+                if name.startswith("assets"):
+                    params = (user_id,)
+                start = time.perf_counter_ns()
+                conn.execute(query, params).fetchall()
+                samples[name].append(time.perf_counter_ns() - start)
+    finally:
+        conn.close()
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def measure_inserts(
+    db_path: str, users: int, ops: int, seed: int
+) -> dict[str, float]:
+    """Задержки ``add_purchase`` в базе ``db_path``."""
+    rng = random.Random(seed)
+    assets = sorted(SUPPORTED_CRYPTOS)
+    storage = SQLiteStorage(db_path)
+    samples: list[int] = []
+    try:
+        for _ in range(ops):
+            args = (
+                rng.randint(1, users),
+                rng.choice(assets),
+                rng.uniform(1, 100_000),
+                rng.uniform(0.001, 10),
+            )
+            start = time.perf_counter_ns()
+            storage.add_purchase(*args)
+            samples.append(time.perf_counter_ns() - start)
+    finally:
+        storage.close()
+    return summarize(samples)
+
+
+def copy_without_triggers(db_path: str, target: str) -> None:
+    """
+    Копирует базу и удаляет из копии триггеры агрегатов.
+
+    SQLiteStorage при открытии создает их заново, поэтому копия
+    измеряется прямыми запросами через ``measure_raw_inserts``.
+    """
+    shutil.copyfile(db_path, target)
+    conn = sqlite3.connect(target)
+    try:
+        for trigger in TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def measure_raw_inserts(
+    db_path: str, users: int, ops: int, seed: int
+) -> dict[str, float]:
+    """Задержки одиночной вставки покупки без SQLiteStorage."""
+    rng = random.Random(seed)
+    assets = sorted(SUPPORTED_CRYPTOS)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    samples: list[int] = []
+    try:
+        for _ in range(ops):
+            args = (
+                rng.randint(1, users),
+                rng.choice(assets),
+                rng.uniform(1, 100_000),
+                rng.uniform(0.001, 10),
+                time.time(),
+            )
+            start = time.perf_counter_ns()
+            conn.execute(
+                """
+                INSERT INTO purchases (
+                    user_id, asset, price, amount, created_at
+                )
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                args,
+            )
+            samples.append(time.perf_counter_ns() - start)
+    finally:
+        conn.close()
+    return summarize(samples)
+
+
+def run(args: argparse.Namespace, workdir: str) -> dict[str, typing.Any]:
+    db_path = path.join(workdir, "aggregates.db")
+    plain_path = path.join(workdir, "plain.db")
+    fill_seconds = fill(
+        db_path, args.users, args.assets, args.purchases, args.seed
+    )
+    copy_without_triggers(db_path, plain_path)
+    total = args.users * args.assets * args.purchases
+    return {
+        "users": args.users,
+        "assets": args.assets,
+        "purchases_per_asset": args.purchases,
+        "fill_purchases_per_sec": total / fill_seconds,
+        "queries": measure_queries(db_path, args.users, args.ops, args.seed),
+        "inserts": {
+            "with_triggers": measure_raw_inserts(
+                db_path, args.users, args.ops, args.seed
+            ),
+            "without_triggers": measure_raw_inserts(
+                plain_path, args.users, args.ops, args.seed
+            ),
+            "add_purchase": measure_inserts(
+                db_path, args.users, args.ops, args.seed
+            ),
+        },
+    }
+
+
+def print_report(report: dict[str, typing.Any]) -> None:
+    print(
+        f"{report['users']} x {report['assets']} x "
+        f"{report['purchases_per_asset']}, заполнение: "
+        f"{report['fill_purchases_per_sec']:,.0f} покупок/с"
+    )
+    rows = {**report["queries"], **report["inserts"]}
+    print(f"{'операция':<18} {'оп/с':>10} {'p50, мс':>9} {'p99, мс':>9}")
+    for name, stats in rows.items():
+        print(
+            f"{name:<18} {stats['ops_per_sec']:>10,.0f} "
+            f"{stats['p50_ms']:>9.3f} {stats['p99_ms']:>9.3f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("-u", "--users", type=int, default=10)
+    parser.add_argument("-a", "--assets", type=int, default=3)
+    parser.add_argument(
+        "-p", "--purchases", type=int, default=10_000, help="Покупок на актив"
+    )
+    parser.add_argument("--ops", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Файл для результатов JSON")
+    args = parser.parse_args()
+    if not 0 < args.assets <= len(SUPPORTED_CRYPTOS):
+        parser.error(
+            f"Число активов должно быть от 1 до {len(SUPPORTED_CRYPTOS)}"
+        )
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as workdir:
+        report = run(args, workdir)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
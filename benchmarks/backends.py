@@ -0,0 +1,285 @@
+"""
+Сравнение хранилищ StorageFactory на синтетических данных.
+
+Для каждой конфигурации хранилища и каждого размера набора данных
+(пользователи x активы x покупки на актив) бенчмарк запускается в
+отдельном процессе и измеряет пропускную способность и задержки p50/p99
+операций DataManager, время загрузки хранилища с диска и RSS процесса.
+Результаты записываются в JSON.
+
+Запуск: ``python -m benchmarks.backends -s 10x3x10 50x5x20 -o out.json``
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import tempfile
+import time
+import typing  # noqa: skip
+
+from faker import Faker
+
+from .utils import current_rss_bytes, summarize
+from core.constants import SUPPORTED_CRYPTOS
+from data.factory import StorageFactory
+from data.manager import DataManager
+
+# Имя конфигурации -> тип хранилища и параметры фабрики
+CONFIGURATIONS: dict[str, tuple[str, dict[str, typing.Any]]] = {
+    "memory": ("memory", {"compact": False}),
+    "memory_compact": ("memory", {"compact": True}),
+    "sqlite": ("sqlite", {}),
+    "json": ("json", {"journal": False}),
+    "json_journal": ("json", {"journal": True}),
+}
+DEFAULT_SIZES: tuple[str, ...] = ("10x3x10", "50x5x20")
+DEFAULT_OPS: int = 1000
+
+Dataset = list[tuple[int, str, float, float]]
+
+
+def parse_size(size: str) -> tuple[int, int, int]:
+    """Разбирает размер вида ``users x assets x purchases``."""
+    try:
+        users, assets, purchases = (int(part) for part in size.split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Размер {size!r} должен иметь вид USERSxASSETSxPURCHASES"
+        )
+    if not 0 < assets <= len(SUPPORTED_CRYPTOS):
+        raise argparse.ArgumentTypeError(
+            f"Число активов должно быть от 1 до {len(SUPPORTED_CRYPTOS)}"
+        )
+    if users <= 0 or purchases <= 0:
+        raise argparse.ArgumentTypeError("Размеры должны быть больше 0")
+    return users, assets, purchases
+
+
+def generate_dataset(
+    users: int, assets: int, purchases: int, seed: int
+) -> Dataset:
+    """Генерирует покупки в случайном порядке с помощью faker."""
+    fake = Faker()
+    fake.seed_instance(seed)
+    user_ids = [fake.unique.random_int(min=1, max=10**9) for _ in range(users)]
+    dataset: Dataset = []
+    for user_id in user_ids:
+        user_assets = fake.random_elements(
+            list(SUPPORTED_CRYPTOS), length=assets, unique=True
+        )
+        for asset in user_assets:
+            for _ in range(purchases):
+                dataset.append(
+                    (
+                        user_id,
+                        asset,
+                        fake.pyfloat(
+                            right_digits=2, min_value=1, max_value=100_000
+                        ),
+                        fake.pyfloat(
+                            right_digits=6, min_value=0.0001, max_value=10
+                        ),
+                    )
+                )
+    fake.random.shuffle(dataset)
+    return dataset
+
+
+def timed(
+    samples: list[int], func: typing.Callable, *args: typing.Any
+) -> typing.Any:
+    start = time.perf_counter_ns()
+    result = func(*args)
+    samples.append(time.perf_counter_ns() - start)
+    return result
+
+
+def sample(items: list, limit: int, fake: Faker) -> list:
+    if len(items) <= limit:
+        return items
+    return fake.random.sample(items, limit)
+
+
+def create_manager(
+    configuration: str, workdir: str
+) -> tuple[DataManager, typing.Any]:
+    storage_type, kwargs = CONFIGURATIONS[configuration]
+    storage = StorageFactory.create_storage(
+        storage_type,
+        db_path=os.path.join(workdir, "bench.db"),
+        file_path=os.path.join(workdir, "bench.json"),
+        cache=False,
+        **kwargs,
+    )
+    return DataManager(storage), storage
+
+
+def measure_reads(
+    manager: DataManager,
+    samples: dict[str, list[int]],
+    dataset: Dataset,
+    ops: int,
+    fake: Faker,
+) -> None:
+    user_ids = sorted({user_id for user_id, *_ in dataset})
+    pairs = sorted({(user_id, asset) for user_id, asset, *_ in dataset})
+    for user_id, asset in sample(pairs, ops, fake):
+        timed(samples["get_stats"], manager.get_stats, user_id, asset)
+    for user_id in sample(user_ids, ops, fake):
+        timed(samples["get_user_assets"], manager.get_user_assets, user_id)
+    for user_id in sample(user_ids, ops, fake):
+        timed(samples["export_to_csv"], manager.export_to_csv, user_id)
+
+
+def measure_deletes(
+    manager: DataManager,
+    samples: dict[str, list[int]],
+    dataset: Dataset,
+    ops: int,
+    fake: Faker,
+) -> None:
+    user_ids = sorted({user_id for user_id, *_ in dataset})
+    pairs = sorted({(user_id, asset) for user_id, asset, *_ in dataset})
+    for user_id, asset in sample(pairs, ops, fake):
+        purchase_id = manager.get_purchases(user_id, asset)[0]["id"]
+        timed(
+            samples["delete_purchase"],
+            manager.delete_purchase,
+            user_id,
+            asset,
+            purchase_id,
+        )
+    for user_id in sample(user_ids, ops, fake):
+        timed(samples["clear"], manager.clear, user_id)
+
+
+def run_case(
+    configuration: str, size: str, seed: int, ops: int
+) -> dict[str, typing.Any]:
+    """Прогоняет один бенчмарк. Выполняется в отдельном процессе."""
+    logging.disable(logging.CRITICAL)
+    users, assets, purchases = parse_size(size)
+    dataset = generate_dataset(users, assets, purchases, seed)
+    fake = Faker()
+    fake.seed_instance(seed)
+    rss_before = current_rss_bytes()
+    samples: dict[str, list[int]] = {
+        operation: []
+        for operation in (
+            "add_purchase",
+            "get_stats",
+            "get_user_assets",
+            "export_to_csv",
+            "delete_purchase",
+            "clear",
+        )
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        manager, storage = create_manager(configuration, workdir)
+        for purchase in dataset:
+            timed(samples["add_purchase"], manager.add_purchase, *purchase)
+        rss_after = current_rss_bytes()
+
+        load_seconds = None
+        if CONFIGURATIONS[configuration][0] != "memory":
+            storage.close()
+            start = time.perf_counter()
+            manager, storage = create_manager(configuration, workdir)
+            load_seconds = time.perf_counter() - start
+
+        measure_reads(manager, samples, dataset, ops, fake)
+        measure_deletes(manager, samples, dataset, ops, fake)
+        storage.close()
+
+    return {
+        "configuration": configuration,
+        "storage_type": CONFIGURATIONS[configuration][0],
+        "users": users,
+        "assets": assets,
+        "purchases_per_asset": purchases,
+        "total_purchases": len(dataset),
+        "load_seconds": load_seconds,
+        "rss_bytes": rss_after,
+        "rss_delta_bytes": rss_after - rss_before,
+        "operations": {
+            operation: summarize(durations)
+            for operation, durations in samples.items()
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "-c",
+        "--configurations",
+        nargs="+",
+        choices=list(CONFIGURATIONS),
+        default=list(CONFIGURATIONS),
+        help="Конфигурации хранилищ (по умолчанию все)",
+    )
+    parser.add_argument(
+        "-s",
+        "--sizes",
+        nargs="+",
+        type=str,
+        default=list(DEFAULT_SIZES),
+        help="Размеры USERSxASSETSxPURCHASES (по умолчанию: %(default)s)",
+    )
+    parser.add_argument(
+        "--ops",
+        type=int,
+        default=DEFAULT_OPS,
+        help="Максимум замеров чтения, удаления и очистки на операцию",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    args = parser.parse_args()
+    for size in args.sizes:
+        try:
+            parse_size(size)
+        except argparse.ArgumentTypeError as error:
+            parser.error(str(error))
+
+    results: list[dict[str, typing.Any]] = []
+    context = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        for configuration in args.configurations:
+            # Новый процесс на каждый прогон, чтобы RSS не смешивался
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=context
+            ) as executor:
+                result = executor.submit(
+                    run_case, configuration, size, args.seed, args.ops
+                ).result()
+            results.append(result)
+            add = result["operations"]["add_purchase"]
+            print(
+                f"{configuration:<15} {size:<12} "
+                f"add {add['ops_per_sec']:>10.0f} ops/s, "
+                f"p99 {add['p99_ms']:.3f} ms, "
+                f"RSS {result['rss_bytes'] / 2**20:.1f} MB"
+            )
+
+    report = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="UTF-8") as file:
+        json.dump(report, file, indent=4, ensure_ascii=False)
+    print(f"Результаты записаны в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Нагрузочный тест бота целиком: диспетчер, хендлеры, FSM и хранилище.
+
+Виртуальные пользователи параллельно проходят сценарий /add -> актив ->
+цена -> количество -> подтверждение, /view, /delete -> актив -> покупка
+-> подтверждение, /import -> CSV-файл и /export. Обновления подаются
+через ``Dispatcher.feed_update``, а запросы к Telegram перехватывает
+локальная сессия без сети, которая отдает для /import CSV-файл из
+``IMPORT_ROWS`` покупок. Отчет: обновлений в секунду, задержки по
+хендлерам и задержка цикла событий. Несколько хранилищ и повторы
+прогоняются в одном запуске, каждый на новой базе.
+
+Запуск: ``python -m benchmarks.load -u 50 -i 20 -s memory sqlite -r 3``
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+import typing  # noqa: skip
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetFile, TelegramMethod
+from aiogram.types import (
+    CallbackQuery,
+    Chat,
+    Document,
+    File,
+    InlineKeyboardMarkup,
+    Message,
+    Update,
+    User,
+)
+
+from main import create_dispatcher
+
+from .utils import current_rss_bytes, summarize
+from core.constants import SUPPORTED_CRYPTOS
+from data.csv_io import write_csv
+from data.factory import StorageFactory
+from data.manager import AsyncDataManager
+
+LAG_INTERVAL: float = 0.01
+IMPORT_ROWS: int = 10
+
+
+def build_import_csv(rows: int = IMPORT_ROWS) -> bytes:
+    """CSV-файл для /import в формате экспорта бота."""
+    assets = sorted(SUPPORTED_CRYPTOS)
+    return write_csv(
+        {
+            "user_id": "0",
+            "asset": assets[i % len(assets)],
+            "price": str(100.0 + i),
+            "amount": "0.5",
+        }
+        for i in range(rows)
+    )
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия бота без сети.
+
+    Отвечает на методы Bot API правдоподобными объектами и запоминает
+    последнюю inline клавиатуру в каждом чате, чтобы сценарий мог нажать
+    на ее кнопку. Любой скачиваемый файл – ``import_file``.
+    """
+
+    def __init__(self, latency: float = 0.0, import_file: bytes = b"") -> None:
+        super().__init__()
+        self.latency = latency
+        self.import_file = import_file
+        self.requests = 0
+        self.keyboards: dict[int, InlineKeyboardMarkup] = {}
+        self._message_ids = itertools.count(1)
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod,
+        timeout: int | None = None,
+    ) -> typing.Any:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        chat_id = getattr(method, "chat_id", None)
+        markup = getattr(method, "reply_markup", None)
+        if chat_id is not None and isinstance(markup, InlineKeyboardMarkup):
+            self.keyboards[chat_id] = markup
+
+        if isinstance(method, GetFile):
+            return File(
+                file_id=method.file_id,
+                file_unique_id=method.file_id,
+                file_size=len(self.import_file),
+                file_path=f"documents/{method.file_id}.csv",
+            )
+        if method.__returning__ is bool or chat_id is None:
+            return True
+        return Message(
+            message_id=next(self._message_ids),
+            date=datetime.datetime.now(),
+            chat=Chat(id=chat_id, type="private"),
+            text=getattr(method, "text", None),
+        )
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: dict[str, typing.Any] | None = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> typing.AsyncGenerator[bytes, None]:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for start in range(0, len(self.import_file), chunk_size):
+            yield self.import_file[start : start + chunk_size]
+
+    async def close(self) -> None:
+        pass
+
+
+class VirtualUser:
+    """Пользователь, отправляющий обновления в диспетчер."""
+
+    _update_ids = itertools.count(1)
+
+    def __init__(
+        self,
+        user_id: int,
+        dp: Dispatcher,
+        bot: Bot,
+        session: FakeSession,
+        samples: dict[str, list[int]],
+    ) -> None:
+        self.dp = dp
+        self.bot = bot
+        self.session = session
+        self.samples = samples
+        self.user = User(id=user_id, is_bot=False, first_name="Load")
+        self.chat = Chat(id=user_id, type="private")
+
+    def _message(
+        self, text: str | None = None, **fields: typing.Any
+    ) -> Message:
+        return Message(
+            message_id=next(self._update_ids),
+            date=datetime.datetime.now(),
+            chat=self.chat,
+            from_user=self.user,
+            text=text,
+            **fields,
+        )
+
+    async def _feed(self, step: str, **event: typing.Any) -> None:
+        update = Update(update_id=next(self._update_ids), **event)
+        start = time.perf_counter_ns()
+        await self.dp.feed_update(self.bot, update)
+        self.samples.setdefault(step, []).append(
+            time.perf_counter_ns() - start
+        )
+
+    async def send(self, step: str, text: str) -> None:
+        await self._feed(step, message=self._message(text))
+
+    async def send_document(self, step: str, content: bytes) -> None:
+        document = Document(
+            file_id="import",
+            file_unique_id="import",
+            file_name="purchases.csv",
+            file_size=len(content),
+        )
+        await self._feed(step, message=self._message(document=document))
+
+    async def press(self, step: str, data: str) -> None:
+        callback = CallbackQuery(
+            id=str(next(self._update_ids)),
+            from_user=self.user,
+            chat_instance=str(self.chat.id),
+            message=self._message("keyboard"),
+            data=data,
+        )
+        await self._feed(step, callback_query=callback)
+
+    def first_button(self) -> str:
+        markup = self.session.keyboards[self.chat.id]
+        return markup.inline_keyboard[0][0].callback_data
+
+    async def run_iteration(self, asset: str, price: float) -> None:
+        await self.send("/add", "/add")
+        await self.press("add_asset", f"add_asset:{asset}")
+        await self.send("price", str(price))
+        await self.send("amount", "1.5")
+        await self.press("confirm_add", "confirm_add")
+        await self.send("/view", "/view")
+        await self.send("/delete", "/delete")
+        await self.press("delete_asset", f"delete_asset:{asset}")
+        await self.press("delete_purchase", self.first_button())
+        await self.press("confirm_delete", "confirm_delete")
+        await self.send("/import", "/import")
+        await self.send_document("document", self.session.import_file)
+        await self.send("/export", "/export")
+
+
+async def monitor_loop_lag(lags: list[int], stop: asyncio.Event) -> None:
+    """Замеряет, насколько позже срока просыпается задача в цикле."""
+    while not stop.is_set():
+        start = time.perf_counter_ns()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append(
+            max(0, time.perf_counter_ns() - start - int(LAG_INTERVAL * 1e9))
+        )
+
+
+async def run_load(
+    storage_type: str,
+    users: int,
+    iterations: int,
+    latency: float,
+    workdir: str,
+) -> dict[str, typing.Any]:
+    storage = StorageFactory.create_async_storage(
+        storage_type,
+        db_path=os.path.join(workdir, "load.db"),
+        file_path=os.path.join(workdir, "load.json"),
+    )
+    data_manager = AsyncDataManager(storage)
+    await data_manager.start()
+    dp = create_dispatcher(data_manager)
+    session = FakeSession(latency, build_import_csv())
+    bot = Bot(token="42:LOAD-TEST", session=session)
+
+    samples: dict[str, list[int]] = {}
+    assets = list(SUPPORTED_CRYPTOS)
+
+    async def scenario(user: VirtualUser) -> None:
+        for i in range(iterations):
+            await user.run_iteration(assets[i % len(assets)], 100.0 + i)
+
+    virtual_users = [
+        VirtualUser(user_id, dp, bot, session, samples)
+        for user_id in range(1, users + 1)
+    ]
+    lags: list[int] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(lags, stop))
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(scenario(user) for user in virtual_users))
+    finally:
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await lag_task
+        await dp.storage.close()
+        await data_manager.close()
+        await bot.session.close()
+
+    updates = sum(len(durations) for durations in samples.values())
+    return {
+        "storage": storage_type,
+        "users": users,
+        "iterations": iterations,
+        "api_latency_ms": latency * 1000,
+        "updates": updates,
+        "api_requests": session.requests,
+        "elapsed_seconds": elapsed,
+        "updates_per_sec": updates / elapsed,
+        "rss_bytes": current_rss_bytes(),
+        "loop_lag": summarize(lags or [0]),
+        "handlers": {
+            step: summarize(durations) for step, durations in samples.items()
+        },
+    }
+
+
+def print_report(report: dict[str, typing.Any]) -> None:
+    print(
+        f"{report['storage']}: {report['updates']} обновлений за "
+        f"{report['elapsed_seconds']:.2f} с: "
+        f"{report['updates_per_sec']:.0f} обновлений/с, "
+        f"{report['users']} пользователей"
+    )
+    lag = report["loop_lag"]
+    print(
+        f"Задержка цикла событий: p50 {lag['p50_ms']:.2f} мс, "
+        f"p99 {lag['p99_ms']:.2f} мс, max {lag['max_ms']:.2f} мс"
+    )
+    print(f"{'хендлер':<16} {'p50, мс':>10} {'p99, мс':>10} {'max, мс':>10}")
+    for step, stats in report["handlers"].items():
+        print(
+            f"{step:<16} {stats['p50_ms']:>10.3f} "
+            f"{stats['p99_ms']:>10.3f} {stats['max_ms']:>10.3f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "-s",
+        "--storage",
+        nargs="+",
+        choices=["memory", "sqlite", "json"],
+        default=["memory"],
+        help="Типы хранилищ (по умолчанию: memory)",
+    )
+    parser.add_argument(
+        "-u",
+        "--users",
+        type=int,
+        default=50,
+        help="Число параллельных пользователей (по умолчанию: 50)",
+    )
+    parser.add_argument(
+        "-i",
+        "--iterations",
+        type=int,
+        default=10,
+        help="Число сценариев на пользователя (по умолчанию: 10)",
+    )
+    parser.add_argument(
+        "--api-latency-ms",
+        type=float,
+        default=0.0,
+        help="Искусственная задержка ответа Bot API в мс",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=1,
+        help="Число прогонов каждого хранилища (по умолчанию: 1)",
+    )
+    parser.add_argument("-o", "--output", help="Файл для отчетов в JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    reports = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for storage_type, run in itertools.product(
+            args.storage, range(args.repeat)
+        ):
+            run_dir = os.path.join(workdir, f"{storage_type}{run}")
+            os.mkdir(run_dir)
+            report = asyncio.run(
+                run_load(
+                    storage_type,
+                    args.users,
+                    args.iterations,
+                    args.api_latency_ms / 1000,
+                    run_dir,
+                )
+            )
+            print_report(report)
+            reports.append(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as file:
+            json.dump(reports, file, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Сравнение расхода памяти на одну покупку для хранилищ в памяти.
+
+Запуск: ``python -m benchmarks.memory_footprint [-n 100000]``
+"""
+
+import argparse
+import gc
+import logging
+import random
+import tracemalloc
+
+from core.constants import SUPPORTED_CRYPTOS
+from data.compact import CompactMemoryStorage
+from data.storage import MemoryStorage
+
+USERS = 100
+
+
+def measure(storage_cls: type, purchases: int) -> float:
+    """Возвращает прирост памяти в байтах на одну покупку."""
+    rng = random.Random(0)
+    assets = sorted(SUPPORTED_CRYPTOS)
+
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    storage = storage_cls()
+    for i in range(purchases):
+        storage.add_purchase(
+            i % USERS,
+            rng.choice(assets),
+            rng.uniform(1, 100_000),
+            rng.uniform(0.001, 10),
+        )
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (current - start) / purchases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--purchases", type=int, default=100_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    for storage_cls in (MemoryStorage, CompactMemoryStorage):
+        per_purchase = measure(storage_cls, args.purchases)
+        print(f"{storage_cls.__name__:<22} {per_purchase:8.1f} B/покупку")
+
+
+if __name__ == "__main__":
+    main()
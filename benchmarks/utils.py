@@ -0,0 +1,34 @@
+import os
+import sys
+
+
+def current_rss_bytes() -> int:
+    """Текущий RSS процесса, на системах без /proc – пиковый."""
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+def percentile(samples: list[int], fraction: float) -> int:
+    """Перцентиль по методу ближайшего ранга для отсортированной выборки."""
+    index = max(0, min(len(samples) - 1, round(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+def summarize(samples: list[int]) -> dict[str, float]:
+    """Сводка по длительностям операций в наносекундах."""
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        "count": len(samples),
+        "ops_per_sec": len(samples) / (total / 1e9) if total else 0.0,
+        "p50_ms": percentile(samples, 0.50) / 1e6,
+        "p99_ms": percentile(samples, 0.99) / 1e6,
+        "max_ms": samples[-1] / 1e6,
+    }
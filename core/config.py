@@ -4,5 +4,74 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def get_bool_env(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
 BOT_API_TOKEN = os.getenv("BOT_TOKEN")
 DATABASE_PATH = os.getenv("DATABASE_PATH", "cab.db")
+LOG_LEVEL = (os.getenv("LOG_LEVEL") or "INFO").upper()
+
+MEMORY_COMPACT = get_bool_env("MEMORY_COMPACT")
+
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE") or 4)
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS") or "NORMAL"
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE") or -16000)  # 16 MB
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE") or 0)
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT") or 5.0)
+SQLITE_GROUP_COMMIT = get_bool_env("SQLITE_GROUP_COMMIT")
+SQLITE_COMMIT_MAX_BATCH = int(os.getenv("SQLITE_COMMIT_MAX_BATCH") or 64)
+SQLITE_COMMIT_MAX_DELAY = float(
+    os.getenv("SQLITE_COMMIT_MAX_DELAY") or 0.002  # 2 мс
+)
+SQLITE_SHARDS = int(os.getenv("SQLITE_SHARDS") or 1)  # 1 – один файл
+
+BACKUP_DIR = os.getenv("BACKUP_DIR") or "backups"
+BACKUP_INTERVAL = float(os.getenv("BACKUP_INTERVAL") or 0)  # 0 – выключено
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP") or 7)
+BACKUP_STEP_PAGES = int(os.getenv("BACKUP_STEP_PAGES") or 1024)
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP") or 0.01)  # 10 мс
+
+JSON_JOURNAL = get_bool_env("JSON_JOURNAL")
+JSON_JOURNAL_MAX_BYTES = int(
+    os.getenv("JSON_JOURNAL_MAX_BYTES") or 4 * 1024 * 1024  # 4 MB
+)
+
+JSON_WRITE_BEHIND = get_bool_env("JSON_WRITE_BEHIND")
+JSON_FLUSH_INTERVAL = float(os.getenv("JSON_FLUSH_INTERVAL") or 5.0)
+JSON_FLUSH_THRESHOLD = int(os.getenv("JSON_FLUSH_THRESHOLD") or 100)
+
+STORAGE_CACHE = get_bool_env("STORAGE_CACHE")
+STORAGE_CACHE_MAX_BYTES = int(
+    os.getenv("STORAGE_CACHE_MAX_BYTES") or 32 * 1024 * 1024  # 32 MB
+)
+
+ADMIN_IDS: frozenset[int] = frozenset(
+    int(user_id)
+    for user_id in (os.getenv("ADMIN_IDS") or "").split(",")
+    if user_id.strip()
+)
+FSM_TTL = float(os.getenv("FSM_TTL") or 3600.0)  # 1 час
+FSM_MAX_ENTRIES = int(os.getenv("FSM_MAX_ENTRIES") or 100_000)
+FSM_SWEEP_INTERVAL = float(os.getenv("FSM_SWEEP_INTERVAL") or 60.0)
+FSM_SHARED = get_bool_env("FSM_SHARED")  # Без кэша для нескольких процессов
+
+SCHEDULER_MAX_ACTIVE_USERS = int(
+    os.getenv("SCHEDULER_MAX_ACTIVE_USERS") or 100
+)
+
+METRICS_HOST = os.getenv("METRICS_HOST") or "127.0.0.1"
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 0)  # 0 – сервер выключен
+
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST") or "127.0.0.1"
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT") or 8080)
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH") or "/webhook"
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Публичный адрес для setWebhook
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY") or 100)
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT") or 30.0)
+WEBHOOK_MAX_USER_UPDATES = int(os.getenv("WEBHOOK_MAX_USER_UPDATES") or 4)
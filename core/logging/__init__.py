@@ -1,3 +1,3 @@
 from .logger import *
 
-__all__ = ["LoggerConfig"]
+__all__ = ["LoggerConfig", "stop_logging"]
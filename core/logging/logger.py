@@ -1,8 +1,73 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from core.config import LOG_LEVEL
 
 LOG_FILE_MAX_BYTES: int = 50 * 1024 * 1024  # 50 MB
 LOG_FILE_BACKUP_MAX_COUNT: int = 10
+LOG_FORMAT = logging.Formatter(
+    "%(asctime)s [%(levelname)s] [%(name)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+_sinks: dict[str, QueueHandler] = {}
+_listeners: list[QueueListener] = []
+_sinks_lock = threading.Lock()
+
+
+def _get_queue_handler(
+    log_file: str,
+    max_bytes: int,
+    backup_count: int,
+    console_output: bool,
+) -> QueueHandler:
+    """
+    Возвращает общий QueueHandler для файла логов.
+
+    Для каждого файла создается одна очередь и один QueueListener в
+    отдельном потоке, который пишет записи в файл и консоль. Все логгеры
+    с этим файлом только кладут записи в очередь и не блокируются на
+    вводе-выводе.
+    """
+    with _sinks_lock:
+        if log_file in _sinks:
+            return _sinks[log_file]
+
+        handlers: list[logging.Handler] = [
+            RotatingFileHandler(
+                log_file,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding="UTF-8",
+            )
+        ]
+        if console_output:
+            handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setFormatter(LOG_FORMAT)
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        listener = QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        listener.start()
+        _listeners.append(listener)
+
+        queue_handler = QueueHandler(log_queue)
+        _sinks[log_file] = queue_handler
+        return queue_handler
+
+
+@atexit.register
+def stop_logging() -> None:
+    """Дописывает оставшиеся в очередях записи и останавливает потоки."""
+    with _sinks_lock:
+        while _listeners:
+            _listeners.pop().stop()
+        _sinks.clear()
 
 
 class LoggerConfig:
@@ -12,7 +77,7 @@ class LoggerConfig:
         self,
         logger_name: str = "default_logger",
         log_file: str = "default.log",
-        log_level: int = logging.INFO,
+        log_level: int | str = LOG_LEVEL,
         max_bytes: int = LOG_FILE_MAX_BYTES,
         backup_count: int = LOG_FILE_BACKUP_MAX_COUNT,
         console_output: bool = True,
@@ -22,7 +87,7 @@ class LoggerConfig:
 
         :param logger_name: Имя логгера.
         :param log_file: Путь к файлу логов.
-        :param log_level: Уровень логирования (по умолчанию INFO).
+        :param log_level: Уровень логирования (по умолчанию LOG_LEVEL).
         :param max_bytes: Максимальный размер файла логов в байтах.
         :param backup_count: Количество резервных копий логов.
         :param console_output: Выводить ли логи в консоль.
@@ -30,24 +95,11 @@ class LoggerConfig:
         self.logger = logging.getLogger(logger_name)
         self.logger.setLevel(log_level)
 
-        log_format = logging.Formatter(
-            "%(asctime)s [%(levelname)s] [%(name)s] %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
+        queue_handler = _get_queue_handler(
+            log_file, max_bytes, backup_count, console_output
         )
-
-        file_handler = RotatingFileHandler(
-            log_file,
-            maxBytes=max_bytes,
-            backupCount=backup_count,
-            encoding="UTF-8",
-        )
-        file_handler.setFormatter(log_format)
-        self.logger.addHandler(file_handler)
-
-        if console_output:
-            console_handler = logging.StreamHandler()
-            console_handler.setFormatter(log_format)
-            self.logger.addHandler(console_handler)
+        if queue_handler not in self.logger.handlers:
+            self.logger.addHandler(queue_handler)
 
     def get_logger(self) -> logging.Logger:
         return self.logger
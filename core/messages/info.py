@@ -14,7 +14,8 @@ HELP: str = (
     "\n\t- выберите актив\n\t- конкретную покупку\n"
     "/clear – Очистить все данные\n"
     "/list – Показать список поддерживаемых криптовалют\n"
-    "/export – Экспортировать Ваши покупки в CSV-файл\n\n"
+    "/export – Экспортировать Ваши покупки в CSV-файл\n"
+    "/import – Импортировать покупки из CSV-файла\n\n"
     "💡 Используйте /add, чтобы начать добавлять покупки!"
 )
 
@@ -68,3 +69,24 @@ SUPPORTED_CRYPTOS: str = "Поддерживаемые криптовалюты:
 CRYPTO_ITEM: str = "{index}. {name} ({ticker})"
 
 ACTION_CANCELLED: str = "Операция отменена!"
+
+PURCHASE_NOT_SAVED: str = "❌ Не удалось сохранить покупку. Попробуйте позже"
+
+IMPORT_NOT_SAVED: str = "❌ Не удалось сохранить покупки. Попробуйте позже"
+
+SESSION_EXPIRED: str = "⌛ Сессия устарела. Начните заново командой из /help"
+
+IMPORT_SEND_FILE: str = (
+    "Отправьте CSV-файл с колонками asset, price, amount "
+    "(формат как в /export)"
+)
+
+IMPORT_WRONG_FILE: str = "Отправьте CSV-файл документом"
+
+IMPORT_FILE_TOO_LARGE: str = "Файл слишком большой (максимум {max_size} KB)"
+
+IMPORT_RESULT: str = "📥 Импортировано покупок: {count}"
+
+IMPORT_ERRORS: str = "\n\n⚠️ Ошибки ({count}):\n{errors}"
+
+IMPORT_MORE_ERRORS: str = "\n… и еще {count}"
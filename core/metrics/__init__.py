@@ -0,0 +1,30 @@
+from .instruments import *
+from .registry import *
+from .server import *
+
+__all__ = [
+    "REGISTRY",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "BACKUP_DURATION",
+    "BACKUP_PAGES",
+    "BACKUP_PAGES_PER_SECOND",
+    "COMMIT_BATCH_SIZE",
+    "FSM_EVICTIONS",
+    "FSM_LIVE_CONVERSATIONS",
+    "HANDLER_ERRORS",
+    "HANDLER_LATENCY",
+    "OPERATION_ERRORS",
+    "OPERATION_LATENCY",
+    "OPERATION_ROWS",
+    "SCHEDULER_ACTIVE_USERS",
+    "SCHEDULER_QUEUED_UPDATES",
+    "SCHEDULER_QUEUE_DEPTH",
+    "SCHEDULER_WAIT",
+    "create_metrics_app",
+    "instrumented",
+    "record_error",
+    "start_metrics_server",
+]
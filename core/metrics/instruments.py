@@ -0,0 +1,188 @@
+import functools
+import inspect
+import time
+import typing  # noqa: skip
+from collections.abc import Sequence
+
+from .registry import REGISTRY
+
+OPERATION_LATENCY = REGISTRY.histogram(
+    "cab_operation_duration_seconds",
+    "Длительность операций хранилищ и DataManager.",
+    labels=("component", "operation"),
+)
+OPERATION_ROWS = REGISTRY.counter(
+    "cab_operation_rows_total",
+    "Число строк, прочитанных или записанных операциями.",
+    labels=("component", "operation"),
+)
+OPERATION_ERRORS = REGISTRY.counter(
+    "cab_operation_errors_total",
+    "Число ошибок операций хранилищ и DataManager.",
+    labels=("component", "operation"),
+)
+HANDLER_LATENCY = REGISTRY.histogram(
+    "cab_handler_duration_seconds",
+    "Длительность обработки команд и нажатий кнопок.",
+    labels=("event", "handler"),
+)
+HANDLER_ERRORS = REGISTRY.counter(
+    "cab_handler_errors_total",
+    "Число исключений в хендлерах.",
+    labels=("event", "handler"),
+)
+
+SCHEDULER_ACTIVE_USERS = REGISTRY.gauge(
+    "cab_scheduler_active_users",
+    "Число пользователей, обновления которых обрабатываются сейчас.",
+)
+SCHEDULER_QUEUED_UPDATES = REGISTRY.gauge(
+    "cab_scheduler_queued_updates",
+    "Число обновлений, ожидающих очереди своего пользователя.",
+)
+SCHEDULER_QUEUE_DEPTH = REGISTRY.histogram(
+    "cab_scheduler_user_queue_depth",
+    "Длина очереди пользователя в момент поступления обновления.",
+    buckets=(0, 1, 2, 4, 8, 16, 32),
+)
+SCHEDULER_WAIT = REGISTRY.histogram(
+    "cab_scheduler_wait_seconds",
+    "Время ожидания обновления до начала обработки.",
+)
+FSM_EVICTIONS = REGISTRY.counter(
+    "cab_fsm_evictions_total",
+    "Число вытесненных из памяти диалогов FSM.",
+    labels=("reason",),
+)
+FSM_LIVE_CONVERSATIONS = REGISTRY.gauge(
+    "cab_fsm_live_conversations",
+    "Число диалогов FSM в памяти.",
+)
+COMMIT_BATCH_SIZE = REGISTRY.histogram(
+    "cab_sqlite_commit_batch_size",
+    "Число операций записи SQLite в одной транзакции.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+BACKUP_DURATION = REGISTRY.histogram(
+    "cab_backup_duration_seconds",
+    "Длительность резервного копирования базы SQLite.",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+BACKUP_PAGES = REGISTRY.counter(
+    "cab_backup_pages_total",
+    "Число страниц базы SQLite, скопированных в резервные копии.",
+)
+BACKUP_PAGES_PER_SECOND = REGISTRY.gauge(
+    "cab_backup_pages_per_second",
+    "Скорость последнего резервного копирования в страницах в секунду.",
+)
+
+
+def count_rows(result: typing.Any) -> int | None:
+    """Число строк в результате операции или None, если это не строки."""
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict) or (
+        isinstance(result, Sequence)
+        and not isinstance(result, (str, bytes, tuple))
+    ):
+        return len(result)
+    return None
+
+
+def record_error(component: str, operation: str) -> None:
+    """Учитывает ошибку, которая была обработана внутри операции."""
+    OPERATION_ERRORS.inc(component=component, operation=operation)
+
+
+def _observe(component: str, operation: str, start: float, rows) -> None:
+    OPERATION_LATENCY.observe(
+        time.perf_counter() - start, component=component, operation=operation
+    )
+    if rows is not None:
+        OPERATION_ROWS.inc(rows, component=component, operation=operation)
+
+
+def _wrap_coroutine(
+    method: typing.Callable, component: str, operation: str
+) -> typing.Callable:
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await method(*args, **kwargs)
+        except Exception:
+            record_error(component, operation)
+            raise
+        _observe(component, operation, start, count_rows(result))
+        return result
+
+    return wrapper
+
+
+def _wrap_generator(
+    method: typing.Callable, component: str, operation: str
+) -> typing.Callable:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        rows = 0
+        try:
+            for item in method(*args, **kwargs):
+                rows += 1
+                yield item
+        except Exception:
+            record_error(component, operation)
+            raise
+        _observe(component, operation, start, rows)
+
+    return wrapper
+
+
+def _wrap_function(
+    method: typing.Callable, component: str, operation: str
+) -> typing.Callable:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            record_error(component, operation)
+            raise
+        _observe(component, operation, start, count_rows(result))
+        return result
+
+    return wrapper
+
+
+def _wrap(method: typing.Callable, component: str) -> typing.Callable:
+    if inspect.iscoroutinefunction(method):
+        return _wrap_coroutine(method, component, method.__name__)
+    if inspect.isgeneratorfunction(method):
+        return _wrap_generator(method, component, method.__name__)
+    return _wrap_function(method, component, method.__name__)
+
+
+def instrumented(
+    component: str, operations: typing.Iterable[str]
+) -> typing.Callable[[type], type]:
+    """
+    Декоратор класса, измеряющий его публичные операции.
+
+    Для каждой операции учитываются длительность, число строк в
+    результате и число исключений. Операции, которые не реализованы
+    классом, пропускаются.
+    """
+
+    def decorate(cls: type) -> type:
+        for operation in operations:
+            method = getattr(cls, operation, None)
+            if method is None or getattr(method, "__isabstractmethod__", 0):
+                continue
+            setattr(cls, operation, _wrap(method, component))
+        return cls
+
+    return decorate
@@ -0,0 +1,35 @@
+from aiohttp import web
+
+from .registry import REGISTRY, MetricsRegistry
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def create_metrics_app(
+    registry: MetricsRegistry = REGISTRY,
+) -> web.Application:
+    """Создает aiohttp приложение с эндпоинтом ``/metrics``."""
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode(),
+            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+async def start_metrics_server(
+    host: str, port: int, registry: MetricsRegistry = REGISTRY
+) -> web.AppRunner:
+    """
+    Запускает HTTP сервер метрик в текущем цикле событий.
+
+    :return: AppRunner, который нужно остановить через ``cleanup()``.
+    """
+    runner = web.AppRunner(create_metrics_app(registry))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -1,3 +1,10 @@
 from .keyboards import *
 
-__all__ = ["create_paginated_keyboard"]
+__all__ = [
+    "KeyboardRegistry",
+    "create_confirm_keyboard",
+    "create_keyboard_registry",
+    "create_paginated_keyboard",
+    "create_purchases_keyboard",
+    "PURCHASES_PER_PAGE",
+]
@@ -1,7 +1,15 @@
+import functools
 from typing import Any
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from core import messages
+from core.constants import SUPPORTED_CRYPTOS
+
+DYNAMIC_KEYBOARD_CACHE_SIZE: int = 1024
+ASSETS_PER_PAGE: int = 5
+PURCHASES_PER_PAGE: int = 10
+
 
 def calculate_pagination(
     total_items: int, items_per_page: int, page: int
@@ -145,3 +153,132 @@ def create_paginated_keyboard(
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
 
     return keyboard, total_pages
+
+
+def create_confirm_keyboard(
+    confirm_data: str, cancel_data: str
+) -> InlineKeyboardMarkup:
+    """Создает клавиатуру с кнопками Подтвердить/Отменить."""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="Подтвердить", callback_data=confirm_data
+                ),
+                InlineKeyboardButton(
+                    text="Отменить", callback_data=cancel_data
+                ),
+            ]
+        ]
+    )
+
+
+def create_purchases_keyboard(
+    purchases: list[dict[str, float]],
+    page: int,
+    total_pages: int,
+    items_per_page: int = PURCHASES_PER_PAGE,
+    callback_prefix: str = "delete_purchase",
+    page_prefix: str = "purchases_page",
+) -> InlineKeyboardMarkup:
+    """
+    Создает клавиатуру выбора покупки для одной страницы.
+
+    :param purchases: Покупки текущей страницы.
+    :param page: Номер страницы.
+    :param total_pages: Общее количество страниц.
+    :param items_per_page: Количество покупок на странице.
+    :param callback_prefix: Префикс callback_data кнопки покупки.
+    :param page_prefix: Префикс callback_data навигационных кнопок.
+    :return: Клавиатура с покупками и навигацией.
+    """
+    first_index = page * items_per_page + 1
+    buttons: list[list[InlineKeyboardButton]] = [
+        [
+            InlineKeyboardButton(
+                text=messages.PURCHASE_INFO.format(
+                    index=first_index + i,
+                    price=purchase["price"],
+                    amount=purchase["amount"],
+                ),
+                callback_data=f"{callback_prefix}_{purchase['id']}",
+            )
+        ]
+        for i, purchase in enumerate(purchases)
+    ]
+    nav_buttons = create_navigation_buttons(page_prefix, page, total_pages)
+    if nav_buttons:
+        buttons.append(nav_buttons)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+class KeyboardRegistry:
+    """
+    Реестр заранее построенных клавиатур.
+
+    Статические клавиатуры и все страницы статических списков строятся
+    один раз и отдаются по ключу. Клавиатуры для списков, которые
+    зависят от пользователя, строятся через ``paginated`` и кэшируются по
+    кортежу элементов. Клавиатуры aiogram неизменяемы, поэтому один
+    объект можно отправлять разным пользователям.
+    """
+
+    def __init__(self, cache_size: int = DYNAMIC_KEYBOARD_CACHE_SIZE) -> None:
+        self._static: dict[str, InlineKeyboardMarkup] = {}
+        self._pages: dict[str, tuple[InlineKeyboardMarkup, ...]] = {}
+        self.paginated = functools.lru_cache(maxsize=cache_size)(
+            self._build_paginated
+        )
+
+    def register(self, key: str, keyboard: InlineKeyboardMarkup) -> None:
+        self._static[key] = keyboard
+
+    def register_paginated(
+        self,
+        key: str,
+        items: list[str | dict[str, Any]],
+        items_per_page: int = ASSETS_PER_PAGE,
+    ) -> None:
+        """Строит все страницы списка, callback_data начинается с key."""
+        first_page, total_pages = create_paginated_keyboard(
+            items, key, items_per_page=items_per_page
+        )
+        self._pages[key] = (first_page,) + tuple(
+            create_paginated_keyboard(
+                items, key, items_per_page=items_per_page, page=page
+            )[0]
+            for page in range(1, total_pages)
+        )
+
+    def get(self, key: str) -> InlineKeyboardMarkup:
+        return self._static[key]
+
+    def get_page(self, key: str, page: int = 0) -> InlineKeyboardMarkup:
+        pages = self._pages[key]
+        return pages[max(0, min(page, len(pages) - 1))]
+
+    def total_pages(self, key: str) -> int:
+        return len(self._pages[key])
+
+    @staticmethod
+    def _build_paginated(
+        items: tuple[str, ...],
+        callback_prefix: str,
+        items_per_page: int = ASSETS_PER_PAGE,
+        page: int = 0,
+    ) -> tuple[InlineKeyboardMarkup, int]:
+        return create_paginated_keyboard(
+            list(items), callback_prefix, items_per_page, page
+        )
+
+
+def create_keyboard_registry() -> KeyboardRegistry:
+    """Создает реестр со всеми статическими клавиатурами бота."""
+    registry = KeyboardRegistry()
+    registry.register_paginated("add_asset", list(SUPPORTED_CRYPTOS))
+    for action in ("add", "clear", "delete"):
+        registry.register(
+            f"confirm_{action}",
+            create_confirm_keyboard(f"confirm_{action}", f"cancel_{action}"),
+        )
+    return registry
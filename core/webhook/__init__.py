@@ -0,0 +1,3 @@
+from .server import *
+
+__all__ = ["WebhookServer"]
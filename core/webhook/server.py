@@ -0,0 +1,200 @@
+import asyncio
+import hmac
+import typing  # noqa: skip
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+from core.logging import LoggerConfig
+
+logger = LoggerConfig(
+    logger_name="webhook",
+    log_file="cab.log",
+).get_logger()
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Прием обновлений Telegram через webhook на aiohttp.
+
+    Запрос подтверждается сразу после того, как обновление принято в
+    обработку, а сама обработка идет в фоновой задаче. Одновременно
+    обрабатывается не больше ``max_concurrency`` обновлений: при
+    заполнении лимита запрос ждет свободного места, и Telegram
+    притормаживает доставку. Обновления одного пользователя выполняются
+    по очереди, поэтому их в обработке не больше ``max_user_updates``:
+    следующие ждут, не занимая общих мест, и пользователь, присылающий
+    обновления быстрее обработки, не блокирует остальных. При остановке
+    новые запросы и запросы, еще ждущие места, получают 503, а начатые
+    обработки дожидаются завершения в течение ``drain_timeout`` секунд.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        path: str,
+        secret_token: str | None = None,
+        max_concurrency: int = 100,
+        drain_timeout: float = 30.0,
+        max_user_updates: int = 4,
+    ) -> None:
+        if max_concurrency <= 0 or max_user_updates <= 0:
+            raise ValueError("Лимит обработки обновлений должен быть больше 0")
+
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.max_concurrency = max_concurrency
+        self.drain_timeout = drain_timeout
+        self.max_user_updates = max_user_updates
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Пользователь -> лимит его обновлений и число ожидающих и
+        # обрабатываемых обновлений
+        self._user_slots: dict[int, asyncio.Semaphore] = {}
+        self._user_pending: dict[int, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._draining = False
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def _check_secret(self, request: web.Request) -> bool:
+        if not self.secret_token:
+            return True
+        token = request.headers.get(SECRET_TOKEN_HEADER, "")
+        return hmac.compare_digest(token, self.secret_token)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self._check_secret(request):
+            logger.warning("Отклонен webhook с неверным секретным токеном")
+            return web.Response(status=401)
+        if self._draining:
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(
+                await request.json(), context={"bot": self.bot}
+            )
+        except (ValueError, ValidationError) as err_msg:
+            logger.warning("Некорректное обновление в webhook: %s", err_msg)
+            return web.Response(status=400)
+
+        user_id = self._user_id(update)
+        await self._acquire(user_id)
+        if self._draining:
+            # Остановка началась, пока запрос ждал места: drain уже не
+            # дождется новой обработки, Telegram повторит доставку
+            self._semaphore.release()
+            self._release_user(user_id)
+            return web.Response(status=503)
+
+        task = asyncio.create_task(self._process(update, user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    @staticmethod
+    def _user_id(update: Update) -> int | None:
+        try:
+            user = getattr(update.event, "from_user", None)
+        except LookupError:
+            # Неизвестный тип обновления
+            return None
+        return user.id if user is not None else None
+
+    async def _acquire(self, user_id: int | None) -> None:
+        """
+        Занимает место пользователя, затем общее место.
+
+        Пока пользователь ждет своего места, общее место не занято.
+        """
+        if user_id is not None:
+            self._user_pending[user_id] = (
+                self._user_pending.get(user_id, 0) + 1
+            )
+            slot = self._user_slots.setdefault(
+                user_id, asyncio.Semaphore(self.max_user_updates)
+            )
+            try:
+                await slot.acquire()
+            except BaseException:
+                self._release_user(user_id, acquired=False)
+                raise
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            self._release_user(user_id)
+            raise
+
+    def _release_user(
+        self, user_id: int | None, acquired: bool = True
+    ) -> None:
+        if user_id is None:
+            return
+        if acquired:
+            self._user_slots[user_id].release()
+        pending = self._user_pending[user_id] - 1
+        if pending:
+            self._user_pending[user_id] = pending
+        else:
+            del self._user_pending[user_id]
+            del self._user_slots[user_id]
+
+    async def _process(self, update: Update, user_id: int | None) -> None:
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            logger.exception(
+                "Ошибка при обработке обновления %s", update.update_id
+            )
+        finally:
+            self._semaphore.release()
+            self._release_user(user_id)
+
+    async def drain(self, *args: typing.Any) -> None:
+        """Перестает принимать обновления и дожидается начатых обработок."""
+        self._draining = True
+        if not self._tasks:
+            return
+
+        logger.info("Ожидание обработки %s обновлений", len(self._tasks))
+        done, pending = await asyncio.wait(
+            set(self._tasks), timeout=self.drain_timeout
+        )
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(
+                "Прервана обработка %s обновлений после %s с",
+                len(pending),
+                self.drain_timeout,
+            )
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        app.on_shutdown.append(self.drain)
+        return app
+
+    async def start(self, host: str, port: int) -> web.AppRunner:
+        """
+        Запускает HTTP сервер в текущем цикле событий.
+
+        :return: AppRunner; ``cleanup()`` останавливает прием и ждет
+            завершения начатых обработок.
+        """
+        runner = web.AppRunner(self.create_app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(
+            "Webhook сервер запущен на http://%s:%s%s", host, port, self.path
+        )
+        return runner
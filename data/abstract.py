@@ -1,4 +1,20 @@
 import abc
+import typing  # noqa: skip
+
+# Публичные операции хранилищ, которые измеряются метриками
+STORAGE_OPERATIONS: tuple[str, ...] = (
+    "add_purchase",
+    "add_purchases_bulk",
+    "get_purchases",
+    "get_purchases_page",
+    "get_user_assets",
+    "clear",
+    "delete_purchase",
+    "get_asset_totals",
+    "get_portfolio_totals",
+    "verify_totals",
+    "iter_export",
+)
 
 
 class Storage(abc.ABC):
@@ -8,6 +24,24 @@ class Storage(abc.ABC):
     def add_purchase(
         self, user_id: int, asset: str, price: float, amount: float
     ) -> None:
+        """
+        Добавляет покупку пользователя.
+
+        :raises sqlite3.Error: Покупка не сохранена в базе SQLite.
+        """
+        pass
+
+    @abc.abstractmethod
+    def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        """
+        Добавляет пакет покупок пользователя за одну операцию записи.
+
+        :param purchases: Список (актив, цена, количество).
+        :return: Количество добавленных покупок.
+        :raises sqlite3.Error: Покупки не сохранены в базе SQLite.
+        """
         pass
 
     @abc.abstractmethod
@@ -16,6 +50,17 @@ class Storage(abc.ABC):
     ) -> list[dict[str, float]]:
         pass
 
+    @abc.abstractmethod
+    def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        """
+        Возвращает не более ``limit`` покупок актива, начиная с ``offset``.
+
+        Порядок покупок совпадает с ``get_purchases``.
+        """
+        pass
+
     @abc.abstractmethod
     def get_user_assets(self, user_id: int) -> list[str]:
         pass
@@ -29,14 +74,146 @@ class Storage(abc.ABC):
         self,
         user_id: int,
         asset: str,
-        purchase_index: int,
+        purchase_id: int,
     ) -> None:
         pass
 
+    @abc.abstractmethod
+    def get_asset_totals(
+        self, user_id: int, asset: str
+    ) -> tuple[float, float, int]:
+        """
+        Возвращает агрегаты по активу пользователя.
+
+        :return: Общая стоимость, общее количество, число покупок.
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_portfolio_totals(
+        self, user_id: int
+    ) -> dict[str, tuple[float, float, int]]:
+        """
+        Возвращает агрегаты по всем активам пользователя за один запрос.
+
+        :return: Актив -> (общая стоимость, общее количество, число покупок).
+        """
+        pass
+
+    @abc.abstractmethod
+    def verify_totals(self, rebuild: bool = False) -> list[tuple[int, str]]:
+        """
+        Сверяет агрегаты с покупками.
+
+        :param rebuild: Пересчитать агрегаты по покупкам.
+        :return: Пары (user_id, asset), для которых агрегаты расходились.
+        """
+        pass
+
+    def start(self) -> None:
+        """
+        Запускает фоновые задачи хранилища.
+
+        Вызывается внутри работающего цикла событий.
+        """
+        pass
+
+    def close(self) -> None:
+        """Освобождает ресурсы хранилища (соединения, файлы)."""
+        pass
+
 
 class ExportData(abc.ABC):
     """Абстрактный базовый класс для экспорта данных в файл."""
 
     @abc.abstractmethod
+    def iter_export(self, user_id: int) -> typing.Iterator[dict[str, str]]:
+        """Построчно отдает покупки пользователя для экспорта."""
+        pass
+
     def export_to_csv(self, user_id: int) -> list[dict[str, str]]:
+        return list(self.iter_export(user_id))
+
+
+class AsyncStorage(abc.ABC):
+    """Абстрактный базовый класс для асинхронных хранилищ данных."""
+
+    @abc.abstractmethod
+    async def add_purchase(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        pass
+
+    @abc.abstractmethod
+    async def get_purchases(
+        self, user_id: int, asset: str
+    ) -> list[dict[str, float]]:
+        pass
+
+    @abc.abstractmethod
+    async def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        pass
+
+    @abc.abstractmethod
+    async def get_user_assets(self, user_id: int) -> list[str]:
+        pass
+
+    @abc.abstractmethod
+    async def clear(self, user_id: int, asset: str = None) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def delete_purchase(
+        self,
+        user_id: int,
+        asset: str,
+        purchase_id: int,
+    ) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def get_asset_totals(
+        self, user_id: int, asset: str
+    ) -> tuple[float, float, int]:
+        pass
+
+    @abc.abstractmethod
+    async def get_portfolio_totals(
+        self, user_id: int
+    ) -> dict[str, tuple[float, float, int]]:
+        pass
+
+    @abc.abstractmethod
+    async def verify_totals(
+        self, rebuild: bool = False
+    ) -> list[tuple[int, str]]:
+        pass
+
+    async def start(self) -> None:
+        """Запускает фоновые задачи хранилища."""
+        pass
+
+    async def close(self) -> None:
+        """Освобождает ресурсы хранилища (соединения, файлы, потоки)."""
+        pass
+
+
+class AsyncExportData(abc.ABC):
+    """Абстрактный базовый класс для асинхронного экспорта данных в файл."""
+
+    @abc.abstractmethod
+    async def export_csv(self, user_id: int) -> bytes:
+        """
+        Формирует CSV-файл с покупками пользователя.
+
+        :return: Содержимое файла или пустые байты, если покупок нет.
+        """
         pass
@@ -0,0 +1,200 @@
+import asyncio
+import functools
+import typing  # noqa: skip
+from concurrent.futures import ThreadPoolExecutor
+
+from .abstract import AsyncExportData, AsyncStorage, ExportData, Storage
+from .csv_io import write_csv
+from core.logging import LoggerConfig
+
+logger = LoggerConfig(
+    logger_name="async_storage",
+    log_file="cab.log",
+).get_logger()
+
+T = typing.TypeVar("T")
+
+
+class InlineAsyncStorage(AsyncStorage, AsyncExportData):
+    """
+    Асинхронный интерфейс к хранилищу без блокирующего ввода-вывода.
+
+    Методы синхронного хранилища вызываются прямо в цикле событий:
+    для хранилища в памяти это дешевле, чем передача в пул потоков.
+    """
+
+    def __init__(self, storage: Storage) -> None:
+        self.storage = storage
+        logger.info(
+            "Инициализировано асинхронное хранилище: %s (inline)",
+            type(storage).__name__,
+        )
+
+    async def add_purchase(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        self.storage.add_purchase(user_id, asset, price, amount)
+
+    async def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        return self.storage.add_purchases_bulk(user_id, purchases)
+
+    async def get_purchases(
+        self, user_id: int, asset: str
+    ) -> list[dict[str, float]]:
+        return self.storage.get_purchases(user_id, asset)
+
+    async def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        return self.storage.get_purchases_page(user_id, asset, offset, limit)
+
+    async def get_user_assets(self, user_id: int) -> list[str]:
+        return self.storage.get_user_assets(user_id)
+
+    async def clear(self, user_id: int, asset: str = None) -> None:
+        self.storage.clear(user_id, asset)
+
+    async def delete_purchase(
+        self,
+        user_id: int,
+        asset: str,
+        purchase_id: int,
+    ) -> None:
+        self.storage.delete_purchase(user_id, asset, purchase_id)
+
+    async def get_asset_totals(
+        self, user_id: int, asset: str
+    ) -> tuple[float, float, int]:
+        return self.storage.get_asset_totals(user_id, asset)
+
+    async def get_portfolio_totals(
+        self, user_id: int
+    ) -> dict[str, tuple[float, float, int]]:
+        return self.storage.get_portfolio_totals(user_id)
+
+    async def verify_totals(
+        self, rebuild: bool = False
+    ) -> list[tuple[int, str]]:
+        return self.storage.verify_totals(rebuild)
+
+    async def export_csv(self, user_id: int) -> bytes:
+        if not isinstance(self.storage, ExportData):
+            return b""
+        return write_csv(self.storage.iter_export(user_id))
+
+    async def start(self) -> None:
+        self.storage.start()
+
+    async def close(self) -> None:
+        self.storage.close()
+
+
+class ExecutorAsyncStorage(AsyncStorage, AsyncExportData):
+    """
+    Асинхронный интерфейс к хранилищу с блокирующим вводом-выводом.
+
+    Каждый вызов выполняется в отдельном пуле потоков, поэтому запросы
+    к SQLite и запись файлов не останавливают цикл событий.
+    """
+
+    def __init__(self, storage: Storage, max_workers: int = 1) -> None:
+        """
+        Инициализация асинхронной обертки.
+
+        :param storage: Синхронное хранилище.
+        :param max_workers: Количество потоков. Для хранилищ, не
+        рассчитанных на параллельный доступ (JSON), должно быть равно 1.
+        """
+        self.storage = storage
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="storage",
+        )
+        logger.info(
+            "Инициализировано асинхронное хранилище: %s (workers=%s)",
+            type(storage).__name__,
+            max_workers,
+        )
+
+    async def _run(
+        self, func: typing.Callable[..., T], *args: typing.Any
+    ) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args)
+        )
+
+    async def add_purchase(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        await self._run(
+            self.storage.add_purchase, user_id, asset, price, amount
+        )
+
+    async def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        return await self._run(
+            self.storage.add_purchases_bulk, user_id, purchases
+        )
+
+    async def get_purchases(
+        self, user_id: int, asset: str
+    ) -> list[dict[str, float]]:
+        return await self._run(self.storage.get_purchases, user_id, asset)
+
+    async def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        return await self._run(
+            self.storage.get_purchases_page, user_id, asset, offset, limit
+        )
+
+    async def get_user_assets(self, user_id: int) -> list[str]:
+        return await self._run(self.storage.get_user_assets, user_id)
+
+    async def clear(self, user_id: int, asset: str = None) -> None:
+        await self._run(self.storage.clear, user_id, asset)
+
+    async def delete_purchase(
+        self,
+        user_id: int,
+        asset: str,
+        purchase_id: int,
+    ) -> None:
+        await self._run(
+            self.storage.delete_purchase, user_id, asset, purchase_id
+        )
+
+    async def get_asset_totals(
+        self, user_id: int, asset: str
+    ) -> tuple[float, float, int]:
+        return await self._run(self.storage.get_asset_totals, user_id, asset)
+
+    async def get_portfolio_totals(
+        self, user_id: int
+    ) -> dict[str, tuple[float, float, int]]:
+        return await self._run(self.storage.get_portfolio_totals, user_id)
+
+    async def verify_totals(
+        self, rebuild: bool = False
+    ) -> list[tuple[int, str]]:
+        return await self._run(self.storage.verify_totals, rebuild)
+
+    async def export_csv(self, user_id: int) -> bytes:
+        if not isinstance(self.storage, ExportData):
+            return b""
+        # Чтение из хранилища и запись CSV идут в одном потоке пула
+        return await self._run(
+            lambda: write_csv(self.storage.iter_export(user_id))
+        )
+
+    async def start(self) -> None:
+        # Фоновые задачи создаются в цикле событий, а не в потоке пула
+        self.storage.start()
+
+    async def close(self) -> None:
+        await self._run(self.storage.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,337 @@
+"""
+Резервные копии баз SQLite без остановки бота.
+
+Копия создается через sqlite3 backup API порциями по ``step_pages``
+страниц с паузой между порциями. На время копирования в исходной базе
+открыта транзакция чтения, поэтому копия согласована на момент начала,
+а запись в режиме WAL продолжается. Копии называются по времени
+создания (``backups/cab.20261018-120000.db``), для каждой базы хранятся
+последние ``keep`` копий.
+
+Запуск:
+  python -m data.backup create
+  python -m data.backup list
+  python -m data.backup restore latest --force
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import re
+import sqlite3
+import time
+
+from .reshard import remove_databases
+from .sharded import shard_paths
+from core.config import (
+    BACKUP_DIR,
+    BACKUP_INTERVAL,
+    BACKUP_KEEP,
+    BACKUP_STEP_PAGES,
+    BACKUP_STEP_SLEEP,
+    DATABASE_PATH,
+    SQLITE_SHARDS,
+)
+from core.logging import LoggerConfig
+from core.metrics import (
+    BACKUP_DURATION,
+    BACKUP_PAGES,
+    BACKUP_PAGES_PER_SECOND,
+    record_error,
+)
+
+logger = LoggerConfig(
+    logger_name="backup",
+    log_file="cab.log",
+).get_logger()
+
+STAMP_FORMAT: str = "%Y%m%d-%H%M%S"
+
+# Путь копии, число страниц и длительность в секундах
+BackupReport = tuple[str, int, float]
+
+
+def database_paths(db_path: str, shards: int) -> list[str]:
+    """Файлы базы: сама база или все ее шарды."""
+    if shards > 1:
+        return shard_paths(db_path, shards)
+    return [db_path]
+
+
+def snapshot_path(db_path: str, backup_dir: str, stamp: str) -> str:
+    """Путь копии базы: ``cab.db`` -> ``backups/cab.<stamp>.db``."""
+    root, ext = os.path.splitext(os.path.basename(db_path))
+    return os.path.join(backup_dir, f"{root}.{stamp}{ext}")
+
+
+def list_snapshots(db_path: str, backup_dir: str) -> list[str]:
+    """Отметки времени копий базы от старых к новым."""
+    root, ext = os.path.splitext(os.path.basename(db_path))
+    pattern = re.compile(
+        rf"{re.escape(root)}\.(\d{{8}}-\d{{6}}){re.escape(ext)}"
+    )
+    if not os.path.isdir(backup_dir):
+        return []
+    return sorted(
+        match.group(1)
+        for match in map(pattern.fullmatch, os.listdir(backup_dir))
+        if match
+    )
+
+
+def copy_database(
+    source: str, target: str, step_pages: int, step_sleep: float
+) -> int:
+    """
+    Копирует базу ``source`` в новый файл ``target`` через backup API.
+
+    :return: Число скопированных страниц.
+    """
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"База {source} не найдена")
+
+    pages = 0
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal pages
+        pages = total
+        if remaining:
+            # Пауза отдает диск и GIL остальным потокам бота
+            time.sleep(step_sleep)
+
+    remove_databases([target])
+    source_conn = sqlite3.connect(source, isolation_level=None)
+    try:
+        # Транзакция чтения фиксирует снимок базы: без нее запись
+        # бота между порциями заставляла бы копирование начинаться заново
+        source_conn.execute("BEGIN")
+        source_conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        with contextlib.closing(sqlite3.connect(target)) as target_conn:
+            source_conn.backup(
+                target_conn, pages=step_pages, progress=progress
+            )
+        source_conn.execute("COMMIT")
+    finally:
+        source_conn.close()
+    return pages
+
+
+def backup_database(
+    db_path: str,
+    backup_dir: str,
+    stamp: str,
+    step_pages: int = BACKUP_STEP_PAGES,
+    step_sleep: float = BACKUP_STEP_SLEEP,
+) -> BackupReport:
+    """Создает копию одной базы."""
+    target = snapshot_path(db_path, backup_dir, stamp)
+    start = time.perf_counter()
+    pages = copy_database(db_path, target + ".tmp", step_pages, step_sleep)
+    os.replace(target + ".tmp", target)
+
+    duration = time.perf_counter() - start
+    pages_per_second = pages / duration if duration else 0.0
+    BACKUP_DURATION.observe(duration)
+    BACKUP_PAGES.inc(pages)
+    BACKUP_PAGES_PER_SECOND.set(pages_per_second)
+    logger.info(
+        "Создана резервная копия %s: %s страниц за %.2f с (%.0f страниц/с)",
+        target,
+        pages,
+        duration,
+        pages_per_second,
+    )
+    return target, pages, duration
+
+
+def rotate(db_path: str, backup_dir: str, keep: int) -> list[str]:
+    """Удаляет копии базы, кроме последних ``keep``."""
+    stamps = list_snapshots(db_path, backup_dir)
+    removed = [
+        snapshot_path(db_path, backup_dir, stamp)
+        for stamp in stamps[: max(len(stamps) - keep, 0)]
+    ]
+    for path in removed:
+        os.remove(path)
+        logger.debug("Удалена устаревшая резервная копия %s", path)
+    return removed
+
+
+def create_snapshot(
+    db_paths: list[str],
+    backup_dir: str = BACKUP_DIR,
+    keep: int = BACKUP_KEEP,
+    step_pages: int = BACKUP_STEP_PAGES,
+    step_sleep: float = BACKUP_STEP_SLEEP,
+) -> list[BackupReport]:
+    """
+    Копирует все базы с общей отметкой времени и удаляет старые копии.
+
+    Шарды копируются по очереди, поэтому их снимки относятся к немного
+    разным моментам, но каждый пользователь целиком лежит в одном шарде.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = time.strftime(STAMP_FORMAT, time.gmtime())
+    reports = []
+    for db_path in db_paths:
+        reports.append(
+            backup_database(db_path, backup_dir, stamp, step_pages, step_sleep)
+        )
+        rotate(db_path, backup_dir, keep)
+    return reports
+
+
+def restore_snapshot(
+    stamp: str, db_paths: list[str], backup_dir: str, force: bool = False
+) -> None:
+    """
+    Восстанавливает базы из копии ``stamp``. Бот должен быть остановлен.
+
+    Существующие базы заменяются только при ``force=True``.
+    """
+    snapshots = [
+        snapshot_path(db_path, backup_dir, stamp) for db_path in db_paths
+    ]
+    missing = [path for path in snapshots if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Копии не найдены: {', '.join(missing)}")
+    existing = [path for path in db_paths if os.path.exists(path)]
+    if existing and not force:
+        raise FileExistsError(f"Базы уже существуют: {', '.join(existing)}")
+
+    for snapshot, db_path in zip(snapshots, db_paths):
+        copy_database(snapshot, db_path + ".tmp", -1, 0)
+        # Старый WAL нельзя применять к восстановленной базе
+        remove_databases([db_path])
+        os.replace(db_path + ".tmp", db_path)
+        logger.info("База %s восстановлена из %s", db_path, snapshot)
+
+
+class BackupScheduler:
+    """
+    Фоновая задача, создающая резервные копии раз в ``interval`` секунд.
+
+    Копирование выполняется в отдельном потоке и не блокирует цикл
+    событий. При остановке начатое копирование завершается.
+    """
+
+    def __init__(
+        self,
+        db_paths: list[str],
+        backup_dir: str = BACKUP_DIR,
+        interval: float = BACKUP_INTERVAL,
+        keep: int = BACKUP_KEEP,
+        step_pages: int = BACKUP_STEP_PAGES,
+        step_sleep: float = BACKUP_STEP_SLEEP,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError("Интервал копирования должен быть больше 0")
+        if keep < 1:
+            raise ValueError("Число копий должно быть больше 0")
+
+        self.db_paths = db_paths
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.keep = keep
+        self.step_pages = step_pages
+        self.step_sleep = step_sleep
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(
+                "Резервное копирование каждые %s с в %s",
+                self.interval,
+                self.backup_dir,
+            )
+
+    async def backup(self) -> list[BackupReport]:
+        """Создает копию сейчас. При ошибке возвращает пустой список."""
+        try:
+            return await asyncio.to_thread(
+                create_snapshot,
+                self.db_paths,
+                self.backup_dir,
+                self.keep,
+                self.step_pages,
+                self.step_sleep,
+            )
+        except (OSError, sqlite3.Error) as err_msg:
+            record_error("backup", "create_snapshot")
+            logger.error("Ошибка резервного копирования: %s", err_msg)
+            return []
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                await self.backup()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._stop.set()
+            await self._task
+            self._task = None
+
+
+def run_command(args: argparse.Namespace) -> None:
+    db_paths = database_paths(args.db, args.shards)
+    if args.command == "create":
+        reports = create_snapshot(db_paths, args.backup_dir, args.keep)
+        for path, pages, duration in reports:
+            print(
+                f"{path}: {pages} страниц за {duration:.2f} с "
+                f"({pages / max(duration, 1e-9):.0f} страниц/с)"
+            )
+    elif args.command == "list":
+        for stamp in reversed(list_snapshots(db_paths[0], args.backup_dir)):
+            print(stamp)
+    else:
+        stamps = list_snapshots(db_paths[0], args.backup_dir)
+        stamp = stamps[-1] if args.stamp == "latest" and stamps else args.stamp
+        restore_snapshot(stamp, db_paths, args.backup_dir, args.force)
+        print(f"Восстановлена копия {stamp}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "--db", default=DATABASE_PATH, help="Путь к базе (DATABASE_PATH)"
+    )
+    parser.add_argument(
+        "-n", "--shards", type=int, default=SQLITE_SHARDS, help="Число шардов"
+    )
+    parser.add_argument(
+        "-d", "--backup-dir", default=BACKUP_DIR, help="Каталог копий"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="Создать копию")
+    create.add_argument("--keep", type=int, default=BACKUP_KEEP)
+    commands.add_parser("list", help="Показать копии, новые первыми")
+    restore = commands.add_parser(
+        "restore", help="Восстановить базу из копии (бот остановлен)"
+    )
+    restore.add_argument("stamp", help="Отметка времени копии или latest")
+    restore.add_argument(
+        "--force", action="store_true", help="Заменить существующую базу"
+    )
+    args = parser.parse_args()
+    if args.command == "create" and args.keep < 1:
+        parser.error("Число копий должно быть больше 0")
+
+    logging.disable(logging.INFO)
+    try:
+        run_command(args)
+    except (OSError, sqlite3.Error) as error:
+        parser.exit(1, f"Ошибка: {error}\n")
+
+
+if __name__ == "__main__":
+    main()
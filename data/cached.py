@@ -0,0 +1,282 @@
+import sys
+import threading
+import typing  # noqa: skip
+from collections import OrderedDict
+
+from .abstract import STORAGE_OPERATIONS, ExportData, Storage
+from core.config import STORAGE_CACHE_MAX_BYTES
+from core.logging import LoggerConfig
+from core.metrics import instrumented
+
+logger = LoggerConfig(
+    logger_name="cache",
+    log_file="cab.log",
+).get_logger()
+
+CacheKey = tuple[int, str, typing.Hashable]
+
+
+def estimate_size(value: typing.Any) -> int:
+    """Приблизительный размер значения в памяти вместе с вложенными."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(
+            estimate_size(key) + estimate_size(item)
+            for key, item in value.items()
+        )
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+@instrumented("cache", STORAGE_OPERATIONS)
+class CachedStorage(Storage, ExportData):
+    """
+    Кэширующая обертка над любым хранилищем.
+
+    Кэширует чтения (активы, покупки и агрегаты) по пользователю и
+    вытесняет давно не использованные записи, когда их суммарный размер
+    превышает бюджет памяти. Любое изменение данных пользователя
+    сбрасывает все его записи.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        max_bytes: int = STORAGE_CACHE_MAX_BYTES,
+    ) -> None:
+        """
+        Инициализация кэша.
+
+        :param storage: Хранилище, к которому идут промахи кэша.
+        :param max_bytes: Бюджет памяти кэша в байтах.
+        """
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[CacheKey, tuple[typing.Any, int]] = (
+            OrderedDict()
+        )
+        self._user_keys: dict[int, set[CacheKey]] = {}
+        # Результат чтения, начатого до изменения, не должен попасть в
+        # кэш после него. Эпоха меняется при сбросе всего кэша, поколение
+        # пользователя – при изменении его данных. Поколения хранятся,
+        # только пока у пользователя есть незавершенные чтения
+        self._epoch = 0
+        self._generations: dict[int, int] = {}
+        self._loads: dict[int, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        logger.info(
+            "Инициализирован кэш для %s: max_bytes=%s",
+            type(storage).__name__,
+            max_bytes,
+        )
+
+    def _get(
+        self,
+        user_id: int,
+        kind: str,
+        arg: typing.Hashable,
+        loader: typing.Callable[[], typing.Any],
+    ) -> typing.Any:
+        key = (user_id, kind, arg)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            version = self._begin_load(user_id)
+
+        try:
+            value = loader()
+        except BaseException:
+            with self._lock:
+                self._end_load(user_id, version)
+            raise
+
+        size = estimate_size(value)
+        with self._lock:
+            if self._end_load(user_id, version) and size <= self.max_bytes:
+                self._store(key, value, size)
+        return value
+
+    def _begin_load(self, user_id: int) -> tuple[int, int]:
+        """Отмечает начатое чтение, возвращает эпоху и поколение."""
+        self._loads[user_id] = self._loads.get(user_id, 0) + 1
+        return self._epoch, self._generations.setdefault(user_id, 0)
+
+    def _end_load(self, user_id: int, version: tuple[int, int]) -> bool:
+        """
+        Снимает отметку чтения.
+
+        :return: True, если данные не менялись, пока шло чтение.
+        """
+        unchanged = version == (self._epoch, self._generations[user_id])
+        loads = self._loads[user_id] - 1
+        if loads:
+            self._loads[user_id] = loads
+        else:
+            del self._loads[user_id]
+            del self._generations[user_id]
+        return unchanged
+
+    def _store(self, key: CacheKey, value: typing.Any, size: int) -> None:
+        if key in self._entries:
+            self._size -= self._entries[key][1]
+        self._entries[key] = (value, size)
+        self._user_keys.setdefault(key[0], set()).add(key)
+        self._size += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            key, (_, size) = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            user_keys = self._user_keys.get(key[0])
+            if user_keys is not None:
+                user_keys.discard(key)
+                if not user_keys:
+                    del self._user_keys[key[0]]
+
+    def invalidate(self, user_id: int) -> None:
+        """Сбрасывает все записи кэша для пользователя."""
+        with self._lock:
+            if user_id in self._generations:
+                self._generations[user_id] += 1
+            for key in self._user_keys.pop(user_id, set()):
+                _, size = self._entries.pop(key)
+                self._size -= size
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._user_keys.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        """Счетчики попаданий, промахов и вытеснений кэша."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def add_purchase(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        try:
+            self.storage.add_purchase(user_id, asset, price, amount)
+        finally:
+            self.invalidate(user_id)
+
+    def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        try:
+            return self.storage.add_purchases_bulk(user_id, purchases)
+        finally:
+            self.invalidate(user_id)
+
+    def get_purchases(
+        self, user_id: int, asset: str
+    ) -> list[dict[str, float]]:
+        asset = asset.upper()
+        purchases = self._get(
+            user_id,
+            "purchases",
+            asset,
+            lambda: list(self.storage.get_purchases(user_id, asset)),
+        )
+        # Покупки копируются: изменение словаря не должно менять кэш
+        return [dict(purchase) for purchase in purchases]
+
+    def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        asset = asset.upper()
+        purchases = self._get(
+            user_id,
+            "purchases_page",
+            (asset, offset, limit),
+            lambda: list(
+                self.storage.get_purchases_page(user_id, asset, offset, limit)
+            ),
+        )
+        return [dict(purchase) for purchase in purchases]
+
+    def get_user_assets(self, user_id: int) -> list[str]:
+        assets = self._get(
+            user_id,
+            "assets",
+            None,
+            lambda: list(self.storage.get_user_assets(user_id)),
+        )
+        return list(assets)
+
+    def get_asset_totals(
+        self, user_id: int, asset: str
+    ) -> tuple[float, float, int]:
+        asset = asset.upper()
+        return self._get(
+            user_id,
+            "totals",
+            asset,
+            lambda: self.storage.get_asset_totals(user_id, asset),
+        )
+
+    def get_portfolio_totals(
+        self, user_id: int
+    ) -> dict[str, tuple[float, float, int]]:
+        portfolio = self._get(
+            user_id,
+            "portfolio",
+            None,
+            lambda: self.storage.get_portfolio_totals(user_id),
+        )
+        return dict(portfolio)
+
+    def clear(self, user_id: int, asset: str = None) -> None:
+        try:
+            self.storage.clear(user_id, asset)
+        finally:
+            self.invalidate(user_id)
+
+    def delete_purchase(
+        self,
+        user_id: int,
+        asset: str,
+        purchase_id: int,
+    ) -> None:
+        try:
+            self.storage.delete_purchase(user_id, asset, purchase_id)
+        finally:
+            self.invalidate(user_id)
+
+    def verify_totals(self, rebuild: bool = False) -> list[tuple[int, str]]:
+        mismatched = self.storage.verify_totals(rebuild)
+        if rebuild:
+            self.invalidate_all()
+        return mismatched
+
+    def iter_export(self, user_id: int) -> typing.Iterator[dict[str, str]]:
+        if not isinstance(self.storage, ExportData):
+            return iter(())
+        return self.storage.iter_export(user_id)
+
+    def start(self) -> None:
+        self.storage.start()
+
+    def close(self) -> None:
+        logger.info("Статистика кэша: %s", self.stats())
+        self.storage.close()
@@ -0,0 +1,290 @@
+import typing  # noqa: skip
+from array import array
+from collections.abc import Sequence
+
+from .abstract import STORAGE_OPERATIONS, ExportData, Storage
+from .storage import (
+    EMPTY_TOTALS,
+    AssetTotals,
+    normalize_bulk_purchases,
+    totals_match,
+)
+from core.constants import SUPPORTED_CRYPTOS
+from core.logging import LoggerConfig
+from core.metrics import instrumented
+
+logger = LoggerConfig(
+    logger_name="compact_storage",
+    log_file="cab.log",
+).get_logger()
+
+
+class PurchaseColumns:
+    """
+    Покупки одного актива пользователя в виде параллельных массивов.
+
+    Вместо словаря на каждую покупку хранятся три массива машинных чисел
+    и накопленные итоги.
+    """
+
+    __slots__ = ("ids", "prices", "amounts", "total_cost", "total_amount")
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.prices = array("d")
+        self.amounts = array("d")
+        self.total_cost = 0.0
+        self.total_amount = 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, purchase_id: int, price: float, amount: float) -> None:
+        self.ids.append(purchase_id)
+        self.prices.append(price)
+        self.amounts.append(amount)
+        self.total_cost += price * amount
+        self.total_amount += amount
+
+    def remove(self, purchase_id: int) -> bool:
+        try:
+            index = self.ids.index(purchase_id)
+        except ValueError:
+            return False
+
+        price = self.prices[index]
+        amount = self.amounts[index]
+        del self.ids[index]
+        del self.prices[index]
+        del self.amounts[index]
+        self.total_cost -= price * amount
+        self.total_amount -= amount
+        return True
+
+    def totals(self) -> AssetTotals:
+        return self.total_cost, self.total_amount, len(self.ids)
+
+    def recount(self) -> AssetTotals:
+        """Пересчитывает итоги по массивам, не меняя накопленные."""
+        total_cost = sum(p * a for p, a in zip(self.prices, self.amounts))
+        return total_cost, sum(self.amounts), len(self.ids)
+
+
+class PurchasesView(Sequence):
+    """
+    Представление покупок актива в виде списка словарей.
+
+    Словарь ``{"id", "price", "amount"}`` создается только при обращении
+    к элементу.
+    """
+
+    __slots__ = ("_columns",)
+
+    def __init__(self, columns: PurchaseColumns) -> None:
+        self._columns = columns
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        columns = self._columns
+        return {
+            "id": columns.ids[index],
+            "price": columns.prices[index],
+            "amount": columns.amounts[index],
+        }
+
+
+@instrumented("compact", STORAGE_OPERATIONS)
+class CompactMemoryStorage(Storage, ExportData):
+    """Компактное хранилище данных в памяти на массивах."""
+
+    def __init__(self) -> None:
+        self.data: dict[int, dict[str, PurchaseColumns]] = {}
+        self._next_id = 1
+        logger.info("Инициализировано компактное хранилище в памяти")
+
+    def _append(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        user_data = self.data.setdefault(user_id, {})
+        columns = user_data.get(asset)
+        if columns is None:
+            columns = user_data[asset] = PurchaseColumns()
+        columns.append(self._next_id, price, amount)
+        self._next_id += 1
+
+    def add_purchase(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        asset = asset.upper()
+        if asset not in SUPPORTED_CRYPTOS:
+            logger.error("Попытка добавить неподдерживаемый актив: %s", asset)
+            raise ValueError(f"Актив {asset} не поддерживается")
+
+        self._append(user_id, asset, price, amount)
+        logger.debug(
+            "Добавлена покупка: user_id=%s, asset=%s, price=%s, amount=%s",
+            user_id,
+            asset,
+            price,
+            amount,
+        )
+
+    def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        purchases = normalize_bulk_purchases(purchases)
+        for asset, price, amount in purchases:
+            self._append(user_id, asset, price, amount)
+
+        logger.debug(
+            "Добавлены покупки пакетом: user_id=%s, count=%s",
+            user_id,
+            len(purchases),
+        )
+        return len(purchases)
+
+    def get_purchases(
+        self, user_id: int, asset: str
+    ) -> typing.Sequence[dict[str, float]]:
+        asset = asset.upper()
+        columns = self.data.get(user_id, {}).get(asset)
+        if columns is None:
+            return []
+
+        logger.debug(
+            "Получены покупки: user_id=%s, asset=%s, count=%s",
+            user_id,
+            asset,
+            len(columns),
+        )
+        return PurchasesView(columns)
+
+    def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        asset = asset.upper()
+        columns = self.data.get(user_id, {}).get(asset)
+        if columns is None:
+            return []
+
+        page = PurchasesView(columns)[offset : offset + limit]
+        logger.debug(
+            "Получена страница покупок: user_id=%s, asset=%s, "
+            "offset=%s, count=%s",
+            user_id,
+            asset,
+            offset,
+            len(page),
+        )
+        return page
+
+    def get_user_assets(self, user_id: int) -> list[str]:
+        assets = list(self.data.get(user_id, {}).keys())
+        logger.debug("Получены активы: user_id=%s, assets=%s", user_id, assets)
+        return assets
+
+    def get_asset_totals(self, user_id: int, asset: str) -> AssetTotals:
+        columns = self.data.get(user_id, {}).get(asset.upper())
+        if columns is None:
+            return EMPTY_TOTALS
+        return columns.totals()
+
+    def get_portfolio_totals(self, user_id: int) -> dict[str, AssetTotals]:
+        return {
+            asset: columns.totals()
+            for asset, columns in self.data.get(user_id, {}).items()
+        }
+
+    def verify_totals(self, rebuild: bool = False) -> list[tuple[int, str]]:
+        mismatched: list[tuple[int, str]] = []
+        for user_id, assets in self.data.items():
+            for asset, columns in assets.items():
+                expected = columns.recount()
+                if not totals_match(expected, columns.totals()):
+                    mismatched.append((user_id, asset))
+                if rebuild:
+                    columns.total_cost, columns.total_amount, _ = expected
+
+        if mismatched:
+            logger.error(
+                "Расхождение агрегатов с покупками: %s",
+                len(mismatched),
+            )
+        return mismatched
+
+    def clear(self, user_id: int, asset: str = None) -> None:
+        if user_id not in self.data:
+            logger.debug(
+                "Попытка очистки для несуществующего user_id=%s",
+                user_id,
+            )
+            return
+
+        if asset is None:
+            self.data[user_id] = {}
+            logger.info("Очищены все данные для user_id=%s", user_id)
+        else:
+            asset = asset.upper()
+            self.data[user_id].pop(asset, None)
+            logger.info(
+                "Очищены данные для user_id=%s, asset=%s",
+                user_id,
+                asset,
+            )
+
+    def delete_purchase(
+        self,
+        user_id: int,
+        asset: str,
+        purchase_id: int,
+    ) -> None:
+        asset = asset.upper()
+        columns = self.data.get(user_id, {}).get(asset)
+        if columns is None:
+            logger.debug(
+                "Попытка удаления покупки для несуществующего user_id=%s или "
+                "asset=%s",
+                user_id,
+                asset,
+            )
+            return
+
+        if columns.remove(purchase_id):
+            if not columns:
+                self.data[user_id].pop(asset)
+            logger.info(
+                "Удалена покупка: user_id=%s, asset=%s, id=%s",
+                user_id,
+                asset,
+                purchase_id,
+            )
+        else:
+            logger.error(
+                "Некорректный id покупки: user_id=%s, asset=%s, id=%s",
+                user_id,
+                asset,
+                purchase_id,
+            )
+
+    def iter_export(self, user_id: int) -> typing.Iterator[dict[str, str]]:
+        rows = 0
+        for asset, columns in self.data.get(user_id, {}).items():
+            for price, amount in zip(columns.prices, columns.amounts):
+                rows += 1
+                yield {
+                    "user_id": str(user_id),
+                    "asset": asset,
+                    "price": str(price),
+                    "amount": str(amount),
+                }
+
+        logger.debug(
+            "Экспортированы данные для user_id=%s, rows=%s",
+            user_id,
+            rows,
+        )
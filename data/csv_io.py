@@ -0,0 +1,115 @@
+import csv
+import io
+import math
+import typing  # noqa: skip
+
+from core.constants import SUPPORTED_CRYPTOS
+
+CSV_FIELDNAMES: list[str] = ["user_id", "asset", "price", "amount"]
+CSV_IMPORT_REQUIRED_FIELDS: tuple[str, ...] = ("asset", "price", "amount")
+CSV_IMPORT_MAX_ROWS: int = 10_000
+CSV_IMPORT_MAX_BYTES: int = 2 * 1024 * 1024  # 2 MB
+
+
+def write_csv(rows: typing.Iterable[dict[str, str]]) -> bytes:
+    """
+    Записывает строки экспорта в CSV по мере их чтения из хранилища.
+
+    :param rows: Итератор строк экспорта.
+    :return: Содержимое CSV-файла или пустые байты, если строк нет.
+    """
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding="UTF-8", newline="")
+    writer = csv.DictWriter(text, fieldnames=CSV_FIELDNAMES)
+
+    has_rows = False
+    for row in rows:
+        if not has_rows:
+            writer.writeheader()
+            has_rows = True
+        writer.writerow(row)
+
+    text.flush()
+    content = buffer.getvalue() if has_rows else b""
+    text.close()
+    return content
+
+
+def parse_positive_number(value: str | None) -> float:
+    number = float((value or "").strip().replace(",", "."))
+    if not math.isfinite(number) or number <= 0:
+        raise ValueError
+    return number
+
+
+def parse_purchase_row(row: dict[str, str]) -> tuple[str, float, float]:
+    """
+    Проверяет строку импорта.
+
+    :return: Актив, цена, количество.
+    :raises ValueError: Текст ошибки для отчета пользователю.
+    """
+    asset = (row.get("asset") or "").strip().upper()
+    if asset not in SUPPORTED_CRYPTOS:
+        raise ValueError(f"актив «{asset}» не поддерживается")
+
+    try:
+        price = parse_positive_number(row.get("price"))
+    except ValueError:
+        raise ValueError("цена должна быть числом больше 0")
+
+    try:
+        amount = parse_positive_number(row.get("amount"))
+    except ValueError:
+        raise ValueError("количество должно быть числом больше 0")
+
+    return asset, price, amount
+
+
+def read_rows(
+    reader: csv.DictReader,
+    max_rows: int,
+) -> tuple[list[tuple[str, float, float]], list[str]]:
+    purchases: list[tuple[str, float, float]] = []
+    errors: list[str] = []
+    for count, row in enumerate(reader, start=1):
+        if count > max_rows:
+            errors.append(f"Импортированы только первые {max_rows} строк")
+            break
+        try:
+            purchases.append(parse_purchase_row(row))
+        except ValueError as err_msg:
+            errors.append(f"Строка {reader.line_num}: {err_msg}")
+    return purchases, errors
+
+
+def read_csv(
+    stream: typing.BinaryIO,
+    max_rows: int = CSV_IMPORT_MAX_ROWS,
+) -> tuple[list[tuple[str, float, float]], list[str]]:
+    """
+    Построчно читает CSV в формате экспорта и проверяет каждую строку.
+
+    Колонка user_id не используется: покупки импортируются
+    пользователю, отправившему файл.
+
+    :param stream: Бинарный поток с содержимым файла.
+    :param max_rows: Максимальное количество строк с данными.
+    :return: Корректные покупки и список ошибок по номерам строк.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        fieldnames = reader.fieldnames or []
+        missing = [
+            field
+            for field in CSV_IMPORT_REQUIRED_FIELDS
+            if field not in fieldnames
+        ]
+        if missing:
+            return [], [f"Нет колонок: {', '.join(missing)}"]
+        return read_rows(reader, max_rows)
+    except (UnicodeDecodeError, csv.Error) as err_msg:
+        return [], [f"Файл не удалось прочитать как CSV: {err_msg}"]
+    finally:
+        text.detach()
@@ -1,13 +1,40 @@
-import logging
+from aiogram.fsm.storage.base import BaseStorage
 
-from .abstract import Storage
+from .abstract import AsyncStorage, Storage
+from .async_storage import ExecutorAsyncStorage, InlineAsyncStorage
+from .cached import CachedStorage
+from .compact import CompactMemoryStorage
+from .fsm import SQLiteFSMStorage, TTLMemoryFSMStorage
+from .sharded import ShardedSQLiteStorage
 from .storage import JSONStorage, MemoryStorage, SQLiteStorage
+from core.config import (
+    FSM_MAX_ENTRIES,
+    FSM_SHARED,
+    FSM_SWEEP_INTERVAL,
+    FSM_TTL,
+    JSON_FLUSH_INTERVAL,
+    JSON_FLUSH_THRESHOLD,
+    JSON_JOURNAL,
+    JSON_JOURNAL_MAX_BYTES,
+    JSON_WRITE_BEHIND,
+    MEMORY_COMPACT,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_CACHE_SIZE,
+    SQLITE_COMMIT_MAX_BATCH,
+    SQLITE_COMMIT_MAX_DELAY,
+    SQLITE_GROUP_COMMIT,
+    SQLITE_MMAP_SIZE,
+    SQLITE_READ_POOL_SIZE,
+    SQLITE_SHARDS,
+    SQLITE_SYNCHRONOUS,
+    STORAGE_CACHE,
+    STORAGE_CACHE_MAX_BYTES,
+)
 from core.logging import LoggerConfig
 
 logger = LoggerConfig(
     logger_name="factory",
     log_file="cab.log",
-    log_level=logging.DEBUG,
 ).get_logger()
 
 
@@ -16,12 +43,131 @@ class StorageFactory:
 
     @staticmethod
     def create_storage(storage_type: str, **kwargs) -> Storage:
+        """
+        Создает хранилище заданного типа.
+
+        При ``cache=True`` хранилище оборачивается в CachedStorage с
+        бюджетом памяти ``cache_max_bytes``.
+        """
+        storage = StorageFactory._create_backend(storage_type, **kwargs)
+        if kwargs.get("cache", STORAGE_CACHE):
+            return CachedStorage(
+                storage,
+                max_bytes=kwargs.get(
+                    "cache_max_bytes", STORAGE_CACHE_MAX_BYTES
+                ),
+            )
+        return storage
+
+    @staticmethod
+    def _create_backend(storage_type: str, **kwargs) -> Storage:
         if storage_type == "memory":
+            if kwargs.get("compact", MEMORY_COMPACT):
+                return CompactMemoryStorage()
             return MemoryStorage()
         elif storage_type == "sqlite":
-            return SQLiteStorage(db_path=kwargs.get("db_path", "cab.db"))
+            return StorageFactory._create_sqlite(**kwargs)
         elif storage_type == "json":
-            return JSONStorage(file_path=kwargs.get("file_path", "cab.json"))
+            return JSONStorage(
+                file_path=kwargs.get("file_path", "cab.json"),
+                journal=kwargs.get("journal", JSON_JOURNAL),
+                journal_max_bytes=kwargs.get(
+                    "journal_max_bytes", JSON_JOURNAL_MAX_BYTES
+                ),
+                write_behind=kwargs.get("write_behind", JSON_WRITE_BEHIND),
+                flush_interval=kwargs.get(
+                    "flush_interval", JSON_FLUSH_INTERVAL
+                ),
+                flush_threshold=kwargs.get(
+                    "flush_threshold", JSON_FLUSH_THRESHOLD
+                ),
+            )
 
-        logger.error(f"Неизвестный тип хранилища: {storage_type}")
+        logger.error("Неизвестный тип хранилища: %s", storage_type)
         raise TypeError(f"Неизвестный тип хранилища: {storage_type}")
+
+    @staticmethod
+    def _create_sqlite(**kwargs) -> Storage:
+        options = {
+            "db_path": kwargs.get("db_path", "cab.db"),
+            "read_pool_size": kwargs.get(
+                "read_pool_size", SQLITE_READ_POOL_SIZE
+            ),
+            "synchronous": kwargs.get("synchronous", SQLITE_SYNCHRONOUS),
+            "cache_size": kwargs.get("cache_size", SQLITE_CACHE_SIZE),
+            "mmap_size": kwargs.get("mmap_size", SQLITE_MMAP_SIZE),
+            "busy_timeout": kwargs.get("busy_timeout", SQLITE_BUSY_TIMEOUT),
+            "group_commit": kwargs.get("group_commit", SQLITE_GROUP_COMMIT),
+            "commit_max_batch": kwargs.get(
+                "commit_max_batch", SQLITE_COMMIT_MAX_BATCH
+            ),
+            "commit_max_delay": kwargs.get(
+                "commit_max_delay", SQLITE_COMMIT_MAX_DELAY
+            ),
+        }
+        shards = kwargs.get("shards", SQLITE_SHARDS)
+        if shards > 1:
+            return ShardedSQLiteStorage(shards=shards, **options)
+        return SQLiteStorage(**options)
+
+    @staticmethod
+    def create_async_storage(storage_type: str, **kwargs) -> AsyncStorage:
+        """
+        Создает асинхронное хранилище поверх синхронного.
+
+        Хранилище в памяти вызывается прямо в цикле событий, SQLite и JSON
+        выполняются в пуле потоков. При ``shards > 1`` SQLite разделяется
+        по пользователям на несколько файлов. JSON не поддерживает параллельный
+        доступ, поэтому для него используется один поток.
+        """
+        storage = StorageFactory.create_storage(storage_type, **kwargs)
+        if storage_type == "memory":
+            return InlineAsyncStorage(storage)
+        elif storage_type == "sqlite":
+            return ExecutorAsyncStorage(
+                storage, max_workers=StorageFactory._sqlite_workers(**kwargs)
+            )
+        return ExecutorAsyncStorage(storage, max_workers=1)
+
+    @staticmethod
+    def _sqlite_workers(**kwargs) -> int:
+        """
+        Пул чтения и потоки, ожидающие запись, для каждого шарда.
+
+        При групповом коммите запись ждут до ``commit_max_batch`` потоков,
+        иначе в транзакцию нечего объединять.
+        """
+        writers = 1
+        if kwargs.get("group_commit", SQLITE_GROUP_COMMIT):
+            writers = kwargs.get("commit_max_batch", SQLITE_COMMIT_MAX_BATCH)
+        shards = max(kwargs.get("shards", SQLITE_SHARDS), 1)
+        read_pool_size = kwargs.get("read_pool_size", SQLITE_READ_POOL_SIZE)
+        return shards * (read_pool_size + writers)
+
+    @staticmethod
+    def create_fsm_storage(fsm_type: str, **kwargs) -> BaseStorage:
+        """
+        Создает хранилище состояний FSM для диспетчера.
+
+        ``memory`` – хранилище в памяти, забывающее брошенные диалоги
+        через ``ttl`` секунд, ``sqlite`` – таблица fsm_states в базе
+        ``db_path`` с кэшем, выключаемым ``shared=True``.
+        """
+        if fsm_type == "memory":
+            return TTLMemoryFSMStorage(
+                ttl=kwargs.get("ttl", FSM_TTL),
+                max_entries=kwargs.get("max_entries", FSM_MAX_ENTRIES),
+                sweep_interval=kwargs.get(
+                    "sweep_interval", FSM_SWEEP_INTERVAL
+                ),
+            )
+        elif fsm_type == "sqlite":
+            return SQLiteFSMStorage(
+                db_path=kwargs.get("db_path", "cab.db"),
+                busy_timeout=kwargs.get("busy_timeout", SQLITE_BUSY_TIMEOUT),
+                max_entries=kwargs.get("max_entries", FSM_MAX_ENTRIES),
+                shared=kwargs.get("shared", FSM_SHARED),
+            )
+
+        logger.error("Неизвестный тип хранилища FSM: %s", fsm_type)
+        raise TypeError(f"Неизвестный тип хранилища FSM: {fsm_type}")
@@ -0,0 +1,347 @@
+import asyncio
+import contextlib
+import json
+import sqlite3
+import time
+import typing  # noqa: skip
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from core.config import (
+    FSM_MAX_ENTRIES,
+    FSM_SHARED,
+    FSM_SWEEP_INTERVAL,
+    FSM_TTL,
+    SQLITE_BUSY_TIMEOUT,
+)
+from core.logging import LoggerConfig
+from core.metrics import FSM_EVICTIONS, FSM_LIVE_CONVERSATIONS
+
+logger = LoggerConfig(
+    logger_name="fsm_storage",
+    log_file="cab.log",
+).get_logger()
+
+FSMRecord = tuple[str | None, dict[str, typing.Any]]
+EMPTY_RECORD: FSMRecord = (None, {})
+# Состояние, данные и момент истечения по time.monotonic()
+TTLRecord = tuple[str | None, dict[str, typing.Any], float]
+
+
+def trim_lru(records: OrderedDict, max_entries: int) -> int:
+    """
+    Удаляет давно не использованные записи сверх ``max_entries``.
+
+    :return: Число удаленных записей.
+    """
+    removed = 0
+    while len(records) > max_entries:
+        records.popitem(last=False)
+        removed += 1
+    return removed
+
+
+def build_key(key: StorageKey) -> str:
+    """Строковый ключ FSM из всех полей StorageKey."""
+    return ":".join(
+        str(part) if part is not None else ""
+        for part in (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id,
+            key.business_connection_id,
+            key.destiny,
+        )
+    )
+
+
+class SQLiteFSMStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в таблице fsm_states базы SQLite.
+
+    Записи читаются из кэша в памяти процесса, а изменения записываются
+    в базу и затем в кэш (write-through). В кэше не больше
+    ``max_entries`` записей, давно не использованные вытесняются и при
+    следующем обращении читаются из базы. При ``shared=True`` кэш
+    выключен и каждое чтение обращается к базе, поэтому ее могут
+    разделять несколько процессов бота.
+
+    Запросы к базе выполняются в одном отдельном потоке по порядку
+    вызовов и не блокируют цикл событий, а их результаты попадают в кэш
+    в том же порядке. Пустые записи (без состояния и данных) удаляются.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        busy_timeout: float = SQLITE_BUSY_TIMEOUT,
+        max_entries: int = FSM_MAX_ENTRIES,
+        shared: bool = FSM_SHARED,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("Число записей в кэше должно быть больше 0")
+
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.shared = shared
+        self._cache: OrderedDict[str, FSMRecord] = OrderedDict()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="fsm-sqlite"
+        )
+        self._conn = sqlite3.connect(
+            db_path, timeout=busy_timeout, check_same_thread=False
+        )
+        self._init_db()
+        logger.info(
+            "Инициализировано SQLite хранилище FSM: %s, shared=%s",
+            db_path,
+            shared,
+        )
+
+    def _init_db(self) -> None:
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fsm_states (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT NOT NULL DEFAULT '{}'
+                )
+                """
+            )
+
+    async def _run(self, func: typing.Callable, *args: typing.Any):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _load(self, key: str) -> FSMRecord:
+        row = self._conn.execute(
+            "SELECT state, data FROM fsm_states WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return EMPTY_RECORD
+        return row[0], json.loads(row[1])
+
+    def _save(self, key: str, column: str, value: str | None) -> FSMRecord:
+        """
+        Изменяет одну колонку записи в одной транзакции.
+
+        Вторая колонка не перезаписывается, поэтому ``set_state`` и
+        ``set_data`` из разных процессов не затирают друг друга.
+
+        :return: Запись после изменения.
+        """
+        with self._conn:
+            self._conn.execute(
+                f"""
+                INSERT INTO fsm_states (key, {column}) VALUES (?, ?)
+                ON CONFLICT (key) DO UPDATE SET {column} = excluded.{column}
+                """,
+                (key, value),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM fsm_states
+                WHERE key = ? AND state IS NULL AND data = '{}'
+                """,
+                (key,),
+            )
+            return self._load(key)
+
+    def _remember(self, key: str, record: FSMRecord) -> None:
+        if self.shared:
+            return
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        trim_lru(self._cache, self.max_entries)
+
+    async def _get_record(self, key: str) -> FSMRecord:
+        record = self._cache.get(key)
+        if record is not None:
+            self._cache.move_to_end(key)
+            return record
+
+        record = await self._run(self._load, key)
+        self._remember(key, record)
+        return record
+
+    async def _set_column(
+        self, key: str, column: str, value: str | None
+    ) -> None:
+        try:
+            record = await self._run(self._save, key, column, value)
+        except sqlite3.Error as err_msg:
+            self._cache.pop(key, None)
+            logger.error("Ошибка при сохранении состояния FSM: %s", err_msg)
+            raise
+        self._remember(key, record)
+
+    async def set_state(
+        self, key: StorageKey, state: StateType = None
+    ) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._set_column(build_key(key), "state", value)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = await self._get_record(build_key(key))
+        return state
+
+    async def set_data(
+        self, key: StorageKey, data: dict[str, typing.Any]
+    ) -> None:
+        await self._set_column(
+            build_key(key), "data", json.dumps(data, ensure_ascii=False)
+        )
+
+    async def get_data(self, key: StorageKey) -> dict[str, typing.Any]:
+        _, data = await self._get_record(build_key(key))
+        return dict(data)
+
+    async def close(self) -> None:
+        # Диспетчер закрывает хранилище при остановке, main() – еще раз
+        if self._closed:
+            return
+
+        self._closed = True
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
+        logger.info("SQLite хранилище FSM закрыто: %s", self.db_path)
+
+
+class TTLMemoryFSMStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в памяти с ограниченным сроком жизни.
+
+    Диалог, к которому не обращались дольше ``ttl`` секунд, удаляется
+    при следующем обращении или фоновой очисткой раз в
+    ``sweep_interval`` секунд. Если диалогов больше ``max_entries``,
+    вытесняется давно не использованный. Записи упорядочены по времени
+    последнего обращения, поэтому очистка просматривает только
+    истекшие записи в начале.
+    """
+
+    def __init__(
+        self,
+        ttl: float = FSM_TTL,
+        max_entries: int = FSM_MAX_ENTRIES,
+        sweep_interval: float = FSM_SWEEP_INTERVAL,
+    ) -> None:
+        if ttl <= 0 or sweep_interval <= 0:
+            raise ValueError("Срок жизни и интервал очистки должны быть > 0")
+        if max_entries < 1:
+            raise ValueError("Число диалогов должно быть больше 0")
+
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._records: OrderedDict[StorageKey, TTLRecord] = OrderedDict()
+        self._sweeper: asyncio.Task | None = None
+        logger.info(
+            "Инициализировано хранилище FSM в памяти: ttl=%s, "
+            "max_entries=%s",
+            ttl,
+            max_entries,
+        )
+
+    @property
+    def conversations(self) -> int:
+        """Число диалогов в памяти, включая еще не удаленные истекшие."""
+        return len(self._records)
+
+    def _get_record(self, key: StorageKey) -> FSMRecord:
+        record = self._records.get(key)
+        if record is None:
+            return EMPTY_RECORD
+
+        state, data, expires_at = record
+        now = time.monotonic()
+        if expires_at <= now:
+            self._evict(key, "ttl")
+            return EMPTY_RECORD
+
+        # Обращение продлевает жизнь диалога
+        self._records[key] = (state, data, now + self.ttl)
+        self._records.move_to_end(key)
+        return state, data
+
+    def _set_record(self, key: StorageKey, record: FSMRecord) -> None:
+        state, data = record
+        if state is None and not data:
+            self._records.pop(key, None)
+        else:
+            self._records[key] = (state, data, time.monotonic() + self.ttl)
+            self._records.move_to_end(key)
+            evicted = trim_lru(self._records, self.max_entries)
+            if evicted:
+                FSM_EVICTIONS.inc(evicted, reason="lru")
+            self._start_sweeper()
+        FSM_LIVE_CONVERSATIONS.set(len(self._records))
+
+    def _evict(self, key: StorageKey, reason: str) -> None:
+        del self._records[key]
+        FSM_EVICTIONS.inc(reason=reason)
+        FSM_LIVE_CONVERSATIONS.set(len(self._records))
+
+    def sweep(self) -> int:
+        """Удаляет истекшие диалоги и возвращает их число."""
+        now = time.monotonic()
+        removed = 0
+        while self._records:
+            key, (_, _, expires_at) = next(iter(self._records.items()))
+            if expires_at > now:
+                break
+            del self._records[key]
+            removed += 1
+
+        if removed:
+            FSM_EVICTIONS.inc(removed, reason="ttl")
+            FSM_LIVE_CONVERSATIONS.set(len(self._records))
+        return removed
+
+    def _start_sweeper(self) -> None:
+        if self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(
+                self._sweep_loop()
+            )
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            removed = self.sweep()
+            if removed:
+                logger.debug("Удалено устаревших диалогов FSM: %s", removed)
+
+    async def set_state(
+        self, key: StorageKey, state: StateType = None
+    ) -> None:
+        _, data = self._get_record(key)
+        value = state.state if isinstance(state, State) else state
+        self._set_record(key, (value, data))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = self._get_record(key)
+        return state
+
+    async def set_data(
+        self, key: StorageKey, data: dict[str, typing.Any]
+    ) -> None:
+        state, _ = self._get_record(key)
+        self._set_record(key, (state, dict(data)))
+
+    async def get_data(self, key: StorageKey) -> dict[str, typing.Any]:
+        _, data = self._get_record(key)
+        return dict(data)
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._sweeper
+            self._sweeper = None
@@ -0,0 +1,168 @@
+import queue
+import sqlite3
+import threading
+import time
+import typing  # noqa: skip
+from concurrent.futures import Future
+
+from core.logging import LoggerConfig
+from core.metrics import COMMIT_BATCH_SIZE
+
+logger = LoggerConfig(
+    logger_name="group_commit",
+    log_file="cab.log",
+).get_logger()
+
+WriteOperation = typing.Callable[..., typing.Any]
+PendingWrite = tuple[Future, WriteOperation, tuple[typing.Any, ...]]
+
+
+class GroupCommitWriter:
+    """
+    Поток, владеющий соединением для записи SQLite.
+
+    Операции записи ставятся в очередь, а поток выполняет накопившиеся
+    операции одной транзакцией: после первой операции он ждет следующие
+    не дольше ``max_delay`` секунд и берет не больше ``max_batch``
+    операций. Каждая операция выполняется в своей точке сохранения,
+    поэтому ошибка одной операции не отменяет остальные. Future операции
+    завершается только после COMMIT.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        lock: threading.Lock,
+        max_batch: int,
+        max_delay: float,
+        name: str = "sqlite-writer",
+    ) -> None:
+        """
+        :param conn: Соединение для записи.
+        :param lock: Блокировка соединения, которую поток держит на время
+        транзакции.
+        :param max_batch: Максимум операций в одной транзакции.
+        :param max_delay: Сколько секунд ждать операции в транзакцию
+        после первой.
+        """
+        if max_batch < 1:
+            raise ValueError("Размер пакета должен быть больше 0")
+
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._conn = conn
+        self._lock = lock
+        self._queue: queue.SimpleQueue[PendingWrite | None] = (
+            queue.SimpleQueue()
+        )
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name=name, daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, operation: WriteOperation, *args: typing.Any) -> Future:
+        """
+        Ставит операцию в очередь.
+
+        ``operation`` вызывается в потоке записи с курсором первым
+        аргументом, ее результат становится результатом Future.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("Поток записи SQLite остановлен")
+
+        future: Future = Future()
+        self._queue.put((future, operation, args))
+        return future
+
+    def close(self) -> None:
+        """Выполняет уже поставленные операции и останавливает поток."""
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._commit(batch)
+            if stop:
+                return
+
+    def _collect(self) -> tuple[list[PendingWrite], bool]:
+        """Собирает пакет операций. Второе значение – пора остановиться."""
+        item = self._queue.get()
+        if item is None:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(
+                    timeout=max(deadline - time.monotonic(), 0)
+                )
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit(self, batch: list[PendingWrite]) -> None:
+        try:
+            results = self._execute(batch)
+        except sqlite3.Error as err_msg:
+            logger.error("Ошибка фиксации пакета записей: %s", err_msg)
+            self._fail(batch, err_msg)
+            return
+
+        COMMIT_BATCH_SIZE.observe(len(results))
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _fail(self, batch: list[PendingWrite], error: sqlite3.Error) -> None:
+        """Откатывает транзакцию и завершает операции пакета ошибкой."""
+        with self._lock:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+        for future, _, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _execute(
+        self, batch: list[PendingWrite]
+    ) -> list[tuple[Future, typing.Any, BaseException | None]]:
+        """Выполняет пакет одной транзакцией, не завершая Future."""
+        results = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for future, operation, args in batch:
+                # Отмененные до начала выполнения операции пропускаются
+                if future.set_running_or_notify_cancel():
+                    results.append(self._apply(future, operation, args))
+            self._conn.execute("COMMIT")
+        return results
+
+    def _apply(
+        self,
+        future: Future,
+        operation: WriteOperation,
+        args: tuple[typing.Any, ...],
+    ) -> tuple[Future, typing.Any, BaseException | None]:
+        cursor = self._conn.cursor()
+        cursor.execute("SAVEPOINT operation")
+        try:
+            result = operation(cursor, *args)
+        except Exception as error:
+            cursor.execute("ROLLBACK TO operation")
+            cursor.execute("RELEASE operation")
+            return future, None, error
+        cursor.execute("RELEASE operation")
+        return future, result, None
@@ -1,15 +1,162 @@
-import logging
-
-from .abstract import Storage
+from .abstract import AsyncExportData, AsyncStorage, Storage
+from .csv_io import write_csv
 from core.logging import LoggerConfig
+from core.metrics import instrumented
 
 logger = LoggerConfig(
     logger_name="data_manager",
     log_file="cab.log",
-    log_level=logging.DEBUG,
 ).get_logger()
 
 
+MANAGER_OPERATIONS: tuple[str, ...] = (
+    "add_purchase",
+    "add_purchases_bulk",
+    "get_purchases",
+    "get_purchases_page",
+    "get_stats",
+    "get_portfolio_stats",
+    "get_user_assets",
+    "clear",
+    "delete_purchase",
+    "verify_totals",
+    "export_to_csv",
+    "export_csv",
+)
+
+
+def get_avg_price(cost: float, amount: float) -> float:
+    if amount > 0:
+        return cost / amount
+    return 0.0
+
+
+def get_page_bounds(count: int, per_page: int, page: int) -> tuple[int, int]:
+    """Возвращает число страниц и номер страницы в допустимых границах."""
+    total_pages = max(1, (count + per_page - 1) // per_page)
+    return total_pages, max(0, min(page, total_pages - 1))
+
+
+def build_portfolio_stats(
+    totals: dict[str, tuple[float, float, int]],
+) -> dict[str, tuple[float, float, float]]:
+    return {
+        asset: (get_avg_price(cost, amount), amount, cost)
+        for asset, (cost, amount, count) in totals.items()
+        if count
+    }
+
+
+def build_stats(
+    user_id: int, asset: str, totals: tuple[float, float, int]
+) -> tuple[float, float, float]:
+    """Средняя цена, общее количество и стоимость по агрегатам актива."""
+    total_cost, total_amount, count = totals
+    if not count:
+        logger.debug("Нет покупок для user_id=%s, asset=%s", user_id, asset)
+        return 0.0, 0.0, 0.0
+
+    avg_price = get_avg_price(total_cost, total_amount)
+    logger.debug(
+        "Рассчитаны статистики: user_id=%s, asset=%s, avg_price=%s, "
+        "total_amount=%s, total_cost=%s",
+        user_id,
+        asset,
+        avg_price,
+        total_amount,
+        total_cost,
+    )
+    return avg_price, total_amount, total_cost
+
+
+def build_portfolio(
+    user_id: int, totals: dict[str, tuple[float, float, int]]
+) -> dict[str, tuple[float, float, float]]:
+    """
+    Статистика по всем активам пользователя.
+
+    :return: Актив -> (средняя цена, общее количество, общая стоимость).
+    """
+    portfolio = build_portfolio_stats(totals)
+    logger.debug(
+        "Рассчитаны статистики портфеля: user_id=%s, assets=%s",
+        user_id,
+        len(portfolio),
+    )
+    return portfolio
+
+
+def log_purchases(user_id: int, asset: str, count: int) -> None:
+    logger.debug(
+        "Получены покупки для user_id=%s, asset=%s, count=%s",
+        user_id,
+        asset,
+        count,
+    )
+
+
+def log_assets(user_id: int, assets: list[str]) -> None:
+    logger.debug("Получены активы для user_id=%s: %s", user_id, assets)
+
+
+def log_page(user_id: int, asset: str, page: int, total_pages: int) -> None:
+    logger.debug(
+        "Получена страница покупок для user_id=%s, asset=%s, page=%s/%s",
+        user_id,
+        asset,
+        page + 1,
+        total_pages,
+    )
+
+
+def log_added(user_id: int, asset: str, price: float, amount: float) -> None:
+    logger.info(
+        "Добавлена покупка: user_id=%s, asset=%s, price=%s, amount=%s",
+        user_id,
+        asset,
+        price,
+        amount,
+    )
+
+
+def log_bulk_added(user_id: int, added: int) -> None:
+    logger.info(
+        "Добавлены покупки пакетом: user_id=%s, count=%s", user_id, added
+    )
+
+
+def log_cleared(user_id: int, asset: str | None) -> None:
+    logger.info(
+        "Очищены данные: user_id=%s, asset=%s",
+        user_id,
+        asset if asset else "все",
+    )
+
+
+def log_deleted(user_id: int, asset: str, purchase_id: int) -> None:
+    logger.info(
+        "Удалена покупка: user_id=%s, asset=%s, id=%s",
+        user_id,
+        asset,
+        purchase_id,
+    )
+
+
+def log_verified(mismatched: list[tuple[int, str]], rebuild: bool) -> None:
+    logger.info(
+        "Сверка агрегатов: расхождений=%s, rebuild=%s",
+        len(mismatched),
+        rebuild,
+    )
+
+
+def log_exported(user_id: int, size: int, unit: str = "bytes") -> None:
+    logger.info(
+        "Экспортированы данные для user_id=%s, %s=%s", user_id, unit, size
+    )
+
+
+@instrumented("data_manager", MANAGER_OPERATIONS)
 class DataManager:
     """Класс для управления данными о покупках."""
 
@@ -21,80 +168,194 @@ class DataManager:
         self, user_id: int, asset: str, price: float, amount: float
     ) -> None:
         self.storage.add_purchase(user_id, asset, price, amount)
-        logger.info(
-            f"Добавлена покупка: user_id={user_id}, "
-            f"asset={asset}, price={price}, amount={amount}"
-        )
+        log_added(user_id, asset, price, amount)
+
+    def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        added = self.storage.add_purchases_bulk(user_id, purchases)
+        log_bulk_added(user_id, added)
+        return added
 
     def get_purchases(
         self, user_id: int, asset: str
     ) -> list[dict[str, float]]:
         purchases = self.storage.get_purchases(user_id, asset)
-        logger.debug(
-            f"Получены покупки для user_id={user_id}, "
-            f"asset={asset}, count={len(purchases)}"
-        )
+        log_purchases(user_id, asset, len(purchases))
         return purchases
 
-    def __get_total_cost(self, purchases) -> float:
-        return sum(p["price"] * p["amount"] for p in purchases)
+    def get_purchases_page(
+        self, user_id: int, asset: str, page: int, per_page: int
+    ) -> tuple[list[dict[str, float]], int, int]:
+        """
+        Возвращает страницу покупок актива.
 
-    def __get_total_amount(self, purchases) -> float:
-        return sum(p["amount"] for p in purchases)
+        Номер страницы ограничивается допустимым диапазоном.
 
-    def __get_avg_price(self, cost: float, amount: float) -> float:
-        if amount > 0:
-            return cost / amount
-        return 0.0
+        :return: Покупки на странице, номер страницы и число страниц.
+        """
+        _, _, count = self.storage.get_asset_totals(user_id, asset)
+        total_pages, page = get_page_bounds(count, per_page, page)
+        purchases = []
+        if count:
+            purchases = self.storage.get_purchases_page(
+                user_id, asset, page * per_page, per_page
+            )
+        log_page(user_id, asset, page, total_pages)
+        return purchases, page, total_pages
 
     def get_stats(
         self, user_id: int, asset: str
     ) -> tuple[float, float, float]:
-        purchases: list[dict[str, float]] = self.storage.get_purchases(
-            user_id, asset
+        return build_stats(
+            user_id, asset, self.storage.get_asset_totals(user_id, asset)
         )
-        if not purchases:
-            logger.debug(f"Нет покупок для user_id={user_id}, asset={asset}")
-            return 0.0, 0.0, 0.0
-
-        total_cost = self.__get_total_cost(purchases)
-        total_amount = self.__get_total_amount(purchases)
-        avg_price = self.__get_avg_price(total_cost, total_amount)
-
-        logger.debug(
-            f"Рассчитаны статистики: user_id={user_id}, "
-            f"asset={asset}, avg_price={avg_price}, "
-            f"total_amount={total_amount}, total_cost={total_cost}"
+
+    def get_portfolio_stats(
+        self, user_id: int
+    ) -> dict[str, tuple[float, float, float]]:
+        return build_portfolio(
+            user_id, self.storage.get_portfolio_totals(user_id)
         )
-        return avg_price, total_amount, total_cost
 
     def get_user_assets(self, user_id: int) -> list[str]:
         assets = self.storage.get_user_assets(user_id)
-        logger.debug(f"Получены активы для user_id={user_id}: {assets}")
+        log_assets(user_id, assets)
         return assets
 
     def clear(self, user_id: int, asset: str = None) -> None:
         self.storage.clear(user_id, asset)
-        logger.info(
-            f"Очищены данные: user_id={user_id}, "
-            f"asset={asset if asset else 'все'}"
-        )
+        log_cleared(user_id, asset)
 
     def delete_purchase(
         self,
         user_id: int,
         asset: str,
-        purchase_index: int,
+        purchase_id: int,
     ) -> None:
-        self.storage.delete_purchase(user_id, asset, purchase_index)
-        logger.info(
-            f"Удалена покупка: user_id={user_id}, "
-            f"asset={asset}, index={purchase_index}"
-        )
+        self.storage.delete_purchase(user_id, asset, purchase_id)
+        log_deleted(user_id, asset, purchase_id)
+
+    def verify_totals(self, rebuild: bool = False) -> list[tuple[int, str]]:
+        """
+        Сверяет агрегаты хранилища с покупками.
+
+        :param rebuild: Пересчитать агрегаты по покупкам.
+        :return: Пары (user_id, asset) с расхождениями.
+        """
+        mismatched = self.storage.verify_totals(rebuild)
+        log_verified(mismatched, rebuild)
+        return mismatched
 
     def export_to_csv(self, user_id: int) -> list[dict[str, str]]:
         rows = self.storage.export_to_csv(user_id)
-        logger.info(
-            f"Экспортированы данные для user_id={user_id}, rows={len(rows)}",
-        )
+        log_exported(user_id, len(rows), "rows")
         return rows
+
+    def export_csv(self, user_id: int) -> bytes:
+        content = write_csv(self.storage.iter_export(user_id))
+        log_exported(user_id, len(content))
+        return content
+
+
+@instrumented("async_data_manager", MANAGER_OPERATIONS)
+class AsyncDataManager:
+    """Класс для асинхронного управления данными о покупках."""
+
+    def __init__(self, storage: AsyncStorage) -> None:
+        self.storage = storage
+        logger.info("Инициализирован AsyncDataManager")
+
+    async def add_purchase(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        await self.storage.add_purchase(user_id, asset, price, amount)
+        log_added(user_id, asset, price, amount)
+
+    async def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        added = await self.storage.add_purchases_bulk(user_id, purchases)
+        log_bulk_added(user_id, added)
+        return added
+
+    async def get_purchases(
+        self, user_id: int, asset: str
+    ) -> list[dict[str, float]]:
+        purchases = await self.storage.get_purchases(user_id, asset)
+        log_purchases(user_id, asset, len(purchases))
+        return purchases
+
+    async def get_purchases_page(
+        self, user_id: int, asset: str, page: int, per_page: int
+    ) -> tuple[list[dict[str, float]], int, int]:
+        """
+        Возвращает страницу покупок актива.
+
+        Номер страницы ограничивается допустимым диапазоном.
+
+        :return: Покупки на странице, номер страницы и число страниц.
+        """
+        _, _, count = await self.storage.get_asset_totals(user_id, asset)
+        total_pages, page = get_page_bounds(count, per_page, page)
+        purchases = []
+        if count:
+            purchases = await self.storage.get_purchases_page(
+                user_id, asset, page * per_page, per_page
+            )
+        log_page(user_id, asset, page, total_pages)
+        return purchases, page, total_pages
+
+    async def get_stats(
+        self, user_id: int, asset: str
+    ) -> tuple[float, float, float]:
+        return build_stats(
+            user_id, asset, await self.storage.get_asset_totals(user_id, asset)
+        )
+
+    async def get_portfolio_stats(
+        self, user_id: int
+    ) -> dict[str, tuple[float, float, float]]:
+        return build_portfolio(
+            user_id, await self.storage.get_portfolio_totals(user_id)
+        )
+
+    async def get_user_assets(self, user_id: int) -> list[str]:
+        assets = await self.storage.get_user_assets(user_id)
+        log_assets(user_id, assets)
+        return assets
+
+    async def clear(self, user_id: int, asset: str = None) -> None:
+        await self.storage.clear(user_id, asset)
+        log_cleared(user_id, asset)
+
+    async def delete_purchase(
+        self,
+        user_id: int,
+        asset: str,
+        purchase_id: int,
+    ) -> None:
+        await self.storage.delete_purchase(user_id, asset, purchase_id)
+        log_deleted(user_id, asset, purchase_id)
+
+    async def verify_totals(
+        self, rebuild: bool = False
+    ) -> list[tuple[int, str]]:
+        mismatched = await self.storage.verify_totals(rebuild)
+        log_verified(mismatched, rebuild)
+        return mismatched
+
+    async def export_csv(self, user_id: int) -> bytes:
+        if not isinstance(self.storage, AsyncExportData):
+            return b""
+
+        content = await self.storage.export_csv(user_id)
+        log_exported(user_id, len(content))
+        return content
+
+    async def start(self) -> None:
+        await self.storage.start()
+
+    async def close(self) -> None:
+        await self.storage.close()
+        logger.info("AsyncDataManager остановлен")
@@ -0,0 +1,64 @@
+"""
+Сверка и пересчет агрегатов asset_totals базы SQLite.
+
+Агрегаты обновляют триггеры таблицы ``purchases``. Команда сверяет их с
+суммами по покупкам и пересчитывает заново, например после изменения
+покупок в обход триггеров. С ``--check`` только выводит расхождения.
+Число шардов берется из ``SQLITE_SHARDS``, если не задано ``-n``.
+
+Запуск: ``python -m data.rebuild_totals cab.db``
+"""
+
+import argparse
+import logging
+import sqlite3
+import time
+
+from .factory import StorageFactory
+from core.config import SQLITE_SHARDS
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "db_path",
+        nargs="?",
+        default="cab.db",
+        help="Путь к базе (по умолчанию: cab.db)",
+    )
+    parser.add_argument(
+        "-n", "--shards", type=int, default=SQLITE_SHARDS, help="Число шардов"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="Только сверить агрегаты"
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    start = time.perf_counter()
+    try:
+        storage = StorageFactory.create_storage(
+            "sqlite", db_path=args.db_path, shards=args.shards, cache=False
+        )
+    except (OSError, ValueError, sqlite3.Error) as error:
+        parser.exit(1, f"Ошибка: {error}\n")
+    try:
+        mismatched = storage.verify_totals(rebuild=not args.check)
+    finally:
+        storage.close()
+
+    for user_id, asset in mismatched:
+        print(f"  user_id={user_id} asset={asset}")
+    action = "Проверено" if args.check else "Пересчитано"
+    print(
+        f"{action} за {time.perf_counter() - start:.2f} с, "
+        f"расхождений: {len(mismatched)}"
+    )
+    if args.check and mismatched:
+        parser.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Перенос покупок SQLite в новый набор шардов.
+
+Источник – обычная база (``cab.db``) или все файлы прежнего набора
+шардов. Покупки распределяются по ``shard_index`` с сохранением времени
+покупки и порядка, агрегаты шардов обновляют триггеры ``purchases``.
+Исходные базы старой схемы предварительно мигрируются на месте.
+Существующие файлы назначения не перезаписываются. Бот на время переноса
+нужно остановить.
+
+Запуск: ``python -m data.reshard cab.db -n 4``
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import time
+
+from .sharded import ShardedSQLiteStorage, shard_index, shard_paths
+from .storage import SQLiteStorage
+
+BATCH_SIZE: int = 10_000
+
+
+def copy_purchases(
+    source: str, targets: list[sqlite3.Connection], batch_size: int
+) -> int:
+    """Раскладывает покупки одной базы по шардам, возвращает их число."""
+    copied = 0
+    conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(
+            """
+            SELECT user_id, asset, price, amount, created_at
+            FROM purchases
+            ORDER BY created_at, id
+            """
+        )
+        while rows := cursor.fetchmany(batch_size):
+            batches: list[list[tuple]] = [[] for _ in targets]
+            for row in rows:
+                batches[shard_index(row[0], len(targets))].append(row)
+            for target, batch in zip(targets, batches):
+                target.executemany(
+                    """
+                    INSERT INTO purchases (
+                        user_id, asset, price, amount, created_at
+                    )
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    batch,
+                )
+            copied += len(rows)
+    finally:
+        conn.close()
+    return copied
+
+
+def check_paths(sources: list[str], paths: list[str]) -> None:
+    for source in sources:
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"База {source} не найдена")
+    existing = [path for path in paths if os.path.exists(path)]
+    if existing:
+        raise FileExistsError(f"Шарды уже существуют: {', '.join(existing)}")
+
+
+def migrate_sources(sources: list[str]) -> None:
+    """
+    Приводит схему исходных баз к текущей.
+
+    В базах, созданных до появления ``id`` и ``created_at``, покупки
+    нельзя прочитать в порядке добавления.
+    """
+    for source in sources:
+        SQLiteStorage(source, read_pool_size=1).close()
+
+
+def remove_databases(paths: list[str]) -> None:
+    """Удаляет базы вместе с файлами WAL."""
+    for path in paths:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def fill_shards(
+    sources: list[str], targets: list[sqlite3.Connection], batch_size: int
+) -> int:
+    """Заполняет шарды одной транзакцией на шард."""
+    for target in targets:
+        target.execute("BEGIN")
+    copied = sum(
+        copy_purchases(source, targets, batch_size) for source in sources
+    )
+    for target in targets:
+        target.commit()
+    return copied
+
+
+def reshard(
+    sources: list[str],
+    db_path: str,
+    shards: int,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """
+    Переносит покупки из ``sources`` в ``shards`` шардов ``db_path``.
+
+    При ошибке созданные шарды удаляются.
+
+    :return: Число перенесенных покупок.
+    """
+    paths = shard_paths(db_path, shards)
+    check_paths(sources, paths)
+    migrate_sources(sources)
+
+    # Создает схему и отметки шардов
+    ShardedSQLiteStorage(db_path, shards).close()
+    targets = [sqlite3.connect(path) for path in paths]
+    try:
+        return fill_shards(sources, targets, batch_size)
+    except BaseException:
+        for target in targets:
+            target.close()
+        remove_databases(paths)
+        raise
+    finally:
+        for target in targets:
+            target.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "sources", nargs="+", help="Исходная база или файлы прежних шардов"
+    )
+    parser.add_argument(
+        "-n", "--shards", type=int, required=True, help="Число новых шардов"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="cab.db",
+        help="Базовый путь новых шардов (по умолчанию: cab.db)",
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("Число шардов должно быть больше 0")
+
+    logging.disable(logging.INFO)
+    start = time.perf_counter()
+    try:
+        copied = reshard(
+            args.sources, args.output, args.shards, args.batch_size
+        )
+    except (OSError, sqlite3.Error) as error:
+        parser.exit(1, f"Ошибка: {error}\n")
+
+    print(
+        f"Перенесено {copied} покупок в {args.shards} шардов за "
+        f"{time.perf_counter() - start:.2f} с:"
+    )
+    for path in shard_paths(args.output, args.shards):
+        print(f"  {path}")
+
+
+if __name__ == "__main__":
+    main()
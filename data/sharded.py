@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import typing  # noqa: skip
+import zlib
+
+from .abstract import STORAGE_OPERATIONS, ExportData, Storage
+from .storage import AssetTotals, SQLiteStorage
+from core.logging import LoggerConfig
+from core.metrics import instrumented
+
+logger = LoggerConfig(
+    logger_name="sharded_storage",
+    log_file="cab.log",
+).get_logger()
+
+
+def shard_index(user_id: int, shards: int) -> int:
+    """Номер шарда пользователя. Не зависит от процесса и PYTHONHASHSEED."""
+    return zlib.crc32(str(user_id).encode()) % shards
+
+
+def shard_paths(db_path: str, shards: int) -> list[str]:
+    """Пути к файлам шардов: ``cab.db`` -> ``cab.shard0.db``, ..."""
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{index}{ext}" for index in range(shards)]
+
+
+@instrumented("sqlite_sharded", STORAGE_OPERATIONS)
+class ShardedSQLiteStorage(Storage, ExportData):
+    """
+    Хранилище SQLite, разделенное по пользователям на несколько файлов.
+
+    Каждый шард – отдельное SQLiteStorage со своим соединением для записи
+    и пулом чтения, поэтому записи разных пользователей не ждут одну
+    блокировку базы. Все данные пользователя лежат в одном шарде.
+    """
+
+    def __init__(
+        self, db_path: str = "cab.db", shards: int = 2, **kwargs
+    ) -> None:
+        """
+        :param db_path: Базовый путь, от которого строятся имена шардов.
+        :param shards: Число шардов.
+        :param kwargs: Параметры SQLiteStorage для каждого шарда.
+        """
+        if shards < 1:
+            raise ValueError("Число шардов должно быть больше 0")
+
+        self.db_path = db_path
+        self.shards: list[SQLiteStorage] = []
+        try:
+            for index, path in enumerate(shard_paths(db_path, shards)):
+                shard = SQLiteStorage(db_path=path, **kwargs)
+                self.shards.append(shard)
+                self._check_layout(shard, index, shards)
+        except (sqlite3.Error, ValueError):
+            self.close()
+            raise
+        logger.info(
+            "Инициализировано шардированное SQLite хранилище: %s, шардов: %s",
+            db_path,
+            shards,
+        )
+
+    @staticmethod
+    def _check_layout(shard: SQLiteStorage, index: int, shards: int) -> None:
+        """
+        Проверяет, что файл создан для той же схемы шардирования.
+
+        Иначе пользователи попали бы не в свой шард и их покупки
+        «пропали» бы.
+        """
+        with shard._write_cursor() as cursor:
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS shard_info (
+                    shard_index INTEGER NOT NULL,
+                    shard_count INTEGER NOT NULL
+                )
+                """
+            )
+            row = cursor.execute(
+                "SELECT shard_index, shard_count FROM shard_info"
+            ).fetchone()
+            if row is None:
+                cursor.execute(
+                    "INSERT INTO shard_info VALUES (?, ?)", (index, shards)
+                )
+                return
+
+        if tuple(row) != (index, shards):
+            raise ValueError(
+                f"Файл {shard.db_path} является шардом {row[0]} из {row[1]}, "
+                f"ожидался шард {index} из {shards}. "
+                f"Используйте python -m data.reshard"
+            )
+
+    def _shard(self, user_id: int) -> SQLiteStorage:
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+
+    def add_purchase(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        self._shard(user_id).add_purchase(user_id, asset, price, amount)
+
+    def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        return self._shard(user_id).add_purchases_bulk(user_id, purchases)
+
+    def get_purchases(
+        self, user_id: int, asset: str
+    ) -> list[dict[str, float]]:
+        return self._shard(user_id).get_purchases(user_id, asset)
+
+    def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        return self._shard(user_id).get_purchases_page(
+            user_id, asset, offset, limit
+        )
+
+    def get_user_assets(self, user_id: int) -> list[str]:
+        return self._shard(user_id).get_user_assets(user_id)
+
+    def clear(self, user_id: int, asset: str = None) -> None:
+        self._shard(user_id).clear(user_id, asset)
+
+    def delete_purchase(
+        self, user_id: int, asset: str, purchase_id: int
+    ) -> None:
+        self._shard(user_id).delete_purchase(user_id, asset, purchase_id)
+
+    def get_asset_totals(self, user_id: int, asset: str) -> AssetTotals:
+        return self._shard(user_id).get_asset_totals(user_id, asset)
+
+    def get_portfolio_totals(self, user_id: int) -> dict[str, AssetTotals]:
+        return self._shard(user_id).get_portfolio_totals(user_id)
+
+    def verify_totals(self, rebuild: bool = False) -> list[tuple[int, str]]:
+        mismatched: list[tuple[int, str]] = []
+        for shard in self.shards:
+            mismatched.extend(shard.verify_totals(rebuild=rebuild))
+        return sorted(mismatched)
+
+    def iter_export(self, user_id: int) -> typing.Iterator[dict[str, str]]:
+        yield from self._shard(user_id).iter_export(user_id)
@@ -1,25 +1,175 @@
+import asyncio
+import contextlib
 import json
-import logging
+import math
 import os
+import queue
 import sqlite3
+import threading
+import time
 import typing  # noqa: skip
 
-from .abstract import ExportData, Storage
+from .abstract import STORAGE_OPERATIONS, ExportData, Storage
+from .group_commit import GroupCommitWriter, WriteOperation
+from core.config import (
+    JSON_FLUSH_INTERVAL,
+    JSON_FLUSH_THRESHOLD,
+    JSON_JOURNAL_MAX_BYTES,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_CACHE_SIZE,
+    SQLITE_COMMIT_MAX_BATCH,
+    SQLITE_COMMIT_MAX_DELAY,
+    SQLITE_GROUP_COMMIT,
+    SQLITE_MMAP_SIZE,
+    SQLITE_READ_POOL_SIZE,
+    SQLITE_SYNCHRONOUS,
+)
 from core.constants import SUPPORTED_CRYPTOS
 from core.logging import LoggerConfig
+from core.metrics import instrumented, record_error
 
 logger = LoggerConfig(
     logger_name="storage",
     log_file="cab.log",
-    log_level=logging.DEBUG,
 ).get_logger()
 
+SQLITE_SYNCHRONOUS_MODES: tuple[str, ...] = ("OFF", "NORMAL", "FULL", "EXTRA")
 
-class MemoryStorage(Storage, ExportData):
+AssetTotals = tuple[float, float, int]
+EMPTY_TOTALS: AssetTotals = (0.0, 0.0, 0)
+
+
+def sum_purchases(purchases: list[dict[str, float]]) -> AssetTotals:
+    """Считает общую стоимость, общее количество и число покупок."""
+    total_cost = 0.0
+    total_amount = 0.0
+    for purchase in purchases:
+        total_cost += purchase["price"] * purchase["amount"]
+        total_amount += purchase["amount"]
+    return total_cost, total_amount, len(purchases)
+
+
+def normalize_bulk_purchases(
+    purchases: list[tuple[str, float, float]],
+) -> list[tuple[str, float, float]]:
+    """Приводит тикеры к верхнему регистру и проверяет их поддержку."""
+    normalized = [
+        (asset.upper(), price, amount) for asset, price, amount in purchases
+    ]
+    for asset, _, _ in normalized:
+        if asset not in SUPPORTED_CRYPTOS:
+            logger.error("Попытка добавить неподдерживаемый актив: %s", asset)
+            raise ValueError(f"Актив {asset} не поддерживается")
+    return normalized
+
+
+def find_purchase_index(
+    purchases: list[dict[str, float]], purchase_id: int
+) -> int | None:
+    for index, purchase in enumerate(purchases):
+        if purchase["id"] == purchase_id:
+            return index
+    return None
+
+
+def totals_match(left: AssetTotals, right: AssetTotals) -> bool:
+    return (
+        left[2] == right[2]
+        and math.isclose(left[0], right[0], rel_tol=1e-9, abs_tol=1e-9)
+        and math.isclose(left[1], right[1], rel_tol=1e-9, abs_tol=1e-9)
+    )
+
+
+class _TotalsMixin:
+    """
+    Агрегаты по активам для хранилищ, держащих покупки в памяти процесса.
+
+    Агрегаты обновляются при каждом изменении покупок, поэтому статистика
+    по активу считывается за O(1), без обхода всех покупок.
+    """
+
+    data: dict[int, dict[str, list[dict[str, float]]]]
+    totals: dict[int, dict[str, AssetTotals]]
+
+    def _rebuild_totals(self) -> None:
+        self.totals = {
+            user_id: {
+                asset: sum_purchases(purchases)
+                for asset, purchases in assets.items()
+            }
+            for user_id, assets in self.data.items()
+        }
+
+    def _add_to_totals(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        user_totals = self.totals.setdefault(user_id, {})
+        cost, total_amount, count = user_totals.get(asset, EMPTY_TOTALS)
+        user_totals[asset] = (
+            cost + price * amount,
+            total_amount + amount,
+            count + 1,
+        )
+
+    def _subtract_from_totals(
+        self, user_id: int, asset: str, price: float, amount: float
+    ) -> None:
+        user_totals = self.totals.get(user_id, {})
+        cost, total_amount, count = user_totals.get(asset, EMPTY_TOTALS)
+        if count <= 1:
+            user_totals.pop(asset, None)
+            return
+        user_totals[asset] = (
+            cost - price * amount,
+            total_amount - amount,
+            count - 1,
+        )
+
+    def _drop_totals(self, user_id: int, asset: str = None) -> None:
+        if asset is None:
+            self.totals.pop(user_id, None)
+        else:
+            self.totals.get(user_id, {}).pop(asset, None)
+
+    def get_asset_totals(self, user_id: int, asset: str) -> AssetTotals:
+        return self.totals.get(user_id, {}).get(asset.upper(), EMPTY_TOTALS)
+
+    def get_portfolio_totals(self, user_id: int) -> dict[str, AssetTotals]:
+        return dict(self.totals.get(user_id, {}))
+
+    def verify_totals(self, rebuild: bool = False) -> list[tuple[int, str]]:
+        mismatched: list[tuple[int, str]] = []
+        keys = {
+            (user_id, asset)
+            for source in (self.data, self.totals)
+            for user_id, assets in source.items()
+            for asset in assets
+        }
+        for user_id, asset in sorted(keys):
+            expected = sum_purchases(self.data.get(user_id, {}).get(asset, []))
+            actual = self.get_asset_totals(user_id, asset)
+            if not totals_match(expected, actual):
+                mismatched.append((user_id, asset))
+
+        if mismatched:
+            logger.error(
+                "Расхождение агрегатов с покупками: %s",
+                len(mismatched),
+            )
+        if rebuild:
+            self._rebuild_totals()
+            logger.info("Агрегаты пересчитаны по покупкам")
+        return mismatched
+
+
+@instrumented("memory", STORAGE_OPERATIONS)
+class MemoryStorage(_TotalsMixin, Storage, ExportData):
     """Хранилище данных в памяти."""
 
     def __init__(self) -> None:
         self.data: dict[int, dict[str, list[dict[str, float]]]] = {}
+        self.totals: dict[int, dict[str, AssetTotals]] = {}
+        self._next_id = 1
         logger.info("Инициализировано хранилище в памяти")
 
     def add_purchase(
@@ -27,7 +177,7 @@ class MemoryStorage(Storage, ExportData):
     ) -> None:
         asset = asset.upper()
         if asset not in SUPPORTED_CRYPTOS:
-            logger.error(f"Попытка добавить неподдерживаемый актив: {asset}")
+            logger.error("Попытка добавить неподдерживаемый актив: %s", asset)
             raise ValueError(f"Актив {asset} не поддерживается")
 
         if user_id not in self.data:
@@ -35,12 +185,38 @@ class MemoryStorage(Storage, ExportData):
         if asset not in self.data[user_id]:
             self.data[user_id][asset] = []
 
-        self.data[user_id][asset].append({"price": price, "amount": amount})
+        self.data[user_id][asset].append(
+            {"id": self._next_id, "price": price, "amount": amount}
+        )
+        self._next_id += 1
+        self._add_to_totals(user_id, asset, price, amount)
         logger.debug(
-            f"Добавлена покупка: user_id={user_id}, "
-            f"asset={asset}, price={price}, amount={amount}"
+            "Добавлена покупка: user_id=%s, asset=%s, price=%s, amount=%s",
+            user_id,
+            asset,
+            price,
+            amount,
         )
 
+    def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        purchases = normalize_bulk_purchases(purchases)
+        user_data = self.data.setdefault(user_id, {})
+        for asset, price, amount in purchases:
+            user_data.setdefault(asset, []).append(
+                {"id": self._next_id, "price": price, "amount": amount}
+            )
+            self._next_id += 1
+            self._add_to_totals(user_id, asset, price, amount)
+
+        logger.debug(
+            "Добавлены покупки пакетом: user_id=%s, count=%s",
+            user_id,
+            len(purchases),
+        )
+        return len(purchases)
+
     def get_purchases(
         self,
         user_id: int,
@@ -49,337 +225,1215 @@ class MemoryStorage(Storage, ExportData):
         asset = asset.upper()
         purchases = self.data.get(user_id, {}).get(asset, [])
         logger.debug(
-            f"Получены покупки: user_id={user_id}, "
-            f"asset={asset}, count={len(purchases)}"
+            "Получены покупки: user_id=%s, asset=%s, count=%s",
+            user_id,
+            asset,
+            len(purchases),
         )
         return purchases
 
+    def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        asset = asset.upper()
+        purchases = self.data.get(user_id, {}).get(asset, [])
+        page = purchases[offset : offset + limit]
+        logger.debug(
+            "Получена страница покупок: user_id=%s, asset=%s, "
+            "offset=%s, count=%s",
+            user_id,
+            asset,
+            offset,
+            len(page),
+        )
+        return page
+
     def get_user_assets(self, user_id: int) -> list[str]:
         assets = list(self.data.get(user_id, {}).keys())
-        logger.debug(f"Получены активы: user_id={user_id}, assets={assets}")
+        logger.debug("Получены активы: user_id=%s, assets=%s", user_id, assets)
         return assets
 
     def clear(self, user_id: int, asset: str = None) -> None:
         if user_id not in self.data:
             logger.debug(
-                f"Попытка очистки для несуществующего user_id={user_id}"
+                "Попытка очистки для несуществующего user_id=%s",
+                user_id,
             )
             return
 
         if asset is None:
             self.data[user_id] = {}
-            logger.info(f"Очищены все данные для user_id={user_id}")
+            self._drop_totals(user_id)
+            logger.info("Очищены все данные для user_id=%s", user_id)
         else:
             asset = asset.upper()
             self.data[user_id].pop(asset, None)
-            logger.info(f"Очищены данные для user_id={user_id}, asset={asset}")
+            self._drop_totals(user_id, asset)
+            logger.info(
+                "Очищены данные для user_id=%s, asset=%s",
+                user_id,
+                asset,
+            )
 
     def delete_purchase(
         self,
         user_id: int,
         asset: str,
-        purchase_index: int,
+        purchase_id: int,
     ) -> None:
         asset = asset.upper()
         if user_id not in self.data or asset not in self.data[user_id]:
             logger.debug(
-                "Попытка удаления покупки для несуществующего "
-                f"user_id={user_id} или asset={asset}"
+                "Попытка удаления покупки для несуществующего user_id=%s или "
+                "asset=%s",
+                user_id,
+                asset,
             )
             return
 
         purchases = self.data[user_id][asset]
-        if 0 <= purchase_index < len(purchases):
-            purchases.pop(purchase_index)
+        index = find_purchase_index(purchases, purchase_id)
+        if index is not None:
+            purchase = purchases.pop(index)
+            self._subtract_from_totals(
+                user_id, asset, purchase["price"], purchase["amount"]
+            )
             if not purchases:
                 self.data[user_id].pop(asset)
             logger.info(
-                f"Удалена покупка: user_id={user_id}, "
-                f"asset={asset}, index={purchase_index}"
+                "Удалена покупка: user_id=%s, asset=%s, id=%s",
+                user_id,
+                asset,
+                purchase_id,
             )
         else:
             logger.error(
-                f"Некорректный индекс покупки: user_id={user_id}, "
-                f"asset={asset}, index={purchase_index}"
+                "Некорректный id покупки: user_id=%s, asset=%s, id=%s",
+                user_id,
+                asset,
+                purchase_id,
             )
 
-    def export_to_csv(self, user_id: int) -> list[dict[str, str]]:
-        if user_id not in self.data:
-            return []
-
-        rows = [
-            {
-                "user_id": str(user_id),
-                "asset": asset,
-                "price": str(purchase["price"]),
-                "amount": str(purchase["amount"]),
-            }
-            for asset, purchases in self.data[user_id].items()
-            for purchase in purchases
-        ]
+    def iter_export(self, user_id: int) -> typing.Iterator[dict[str, str]]:
+        rows = 0
+        for asset, purchases in self.data.get(user_id, {}).items():
+            for purchase in purchases:
+                rows += 1
+                yield {
+                    "user_id": str(user_id),
+                    "asset": asset,
+                    "price": str(purchase["price"]),
+                    "amount": str(purchase["amount"]),
+                }
 
         logger.debug(
-            f"Экспортированы данные для user_id={user_id}, rows={len(rows)}"
+            "Экспортированы данные для user_id=%s, rows=%s",
+            user_id,
+            rows,
         )
 
 
+@instrumented("sqlite", STORAGE_OPERATIONS)
 class SQLiteStorage(Storage, ExportData):
     """Хранилище данных в SQLite."""
 
-    def __init__(self, db_path: str = "cab.db") -> None:
+    def __init__(
+        self,
+        db_path: str = "cab.db",
+        read_pool_size: int = SQLITE_READ_POOL_SIZE,
+        synchronous: str = SQLITE_SYNCHRONOUS,
+        cache_size: int = SQLITE_CACHE_SIZE,
+        mmap_size: int = SQLITE_MMAP_SIZE,
+        busy_timeout: float = SQLITE_BUSY_TIMEOUT,
+        group_commit: bool = SQLITE_GROUP_COMMIT,
+        commit_max_batch: int = SQLITE_COMMIT_MAX_BATCH,
+        commit_max_delay: float = SQLITE_COMMIT_MAX_DELAY,
+    ) -> None:
+        """
+        Инициализация SQLite хранилища.
+
+        Открывает долгоживущее соединение для записи и пул соединений
+        для чтения. База переводится в режим WAL, чтобы чтение не
+        блокировало запись. В режиме группового коммита изменения
+        выполняет отдельный поток, объединяя одновременные записи в одну
+        транзакцию.
+
+        :param db_path: Путь к файлу базы данных.
+        :param read_pool_size: Максимальное число соединений для чтения.
+        :param synchronous: Значение PRAGMA synchronous
+        (OFF, NORMAL, FULL, EXTRA).
+        :param cache_size: Значение PRAGMA cache_size (страницы или,
+        если отрицательное, KiB).
+        :param mmap_size: Значение PRAGMA mmap_size в байтах.
+        :param busy_timeout: Время ожидания блокировки базы в секундах.
+        :param group_commit: Включить групповой коммит.
+        :param commit_max_batch: Максимум операций в одной транзакции.
+        :param commit_max_delay: Сколько секунд ждать следующие операции
+        в транзакцию после первой.
+        """
+        synchronous = synchronous.upper()
+        if synchronous not in SQLITE_SYNCHRONOUS_MODES:
+            raise ValueError(
+                f"Некорректное значение synchronous: {synchronous}"
+            )
+        if read_pool_size < 1:
+            raise ValueError("Размер пула чтения должен быть больше 0")
+
         self.db_path = db_path
+        self.read_pool_size = read_pool_size
+        self.synchronous = synchronous
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self.busy_timeout = busy_timeout
+
+        self._closed = False
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
         self._init_db()
-        logger.info(f"Инициализировано SQLite хранилище: {db_path}")
+        self._group_writer: GroupCommitWriter | None = None
+        if group_commit:
+            self._group_writer = GroupCommitWriter(
+                self._writer,
+                self._write_lock,
+                max_batch=commit_max_batch,
+                max_delay=commit_max_delay,
+            )
+
+        # В базе в памяти каждое соединение видит свою базу,
+        # поэтому читаем через соединение для записи
+        self._shared_memory_db = db_path == ":memory:"
+        self._readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(
+            maxsize=read_pool_size
+        )
+        logger.info("Инициализировано SQLite хранилище: %s", db_path)
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
 
     def _init_db(self) -> None:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        journal_mode = self._writer.execute(
+            "PRAGMA journal_mode = WAL"
+        ).fetchone()[0]
+        with self._write_cursor() as cursor:
+            # Создание схемы и миграция выполняются одной транзакцией
+            cursor.execute("BEGIN")
+            columns = [
+                row[1]
+                for row in cursor.execute("PRAGMA table_info(purchases)")
+            ]
+            if columns and "id" not in columns:
+                self._migrate_purchases(cursor)
             cursor.execute(
                 """
                 CREATE TABLE IF NOT EXISTS purchases (
-                    user_id INTEGER,
-                    asset TEXT,
-                    price REAL,
-                    amount REAL,
-                    PRIMARY KEY (user_id, asset, price, amount)
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    asset TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    amount REAL NOT NULL,
+                    -- NULL: покупка из старой схемы, время неизвестно
+                    created_at REAL
                 )
             """
             )
-            conn.commit()
-            logger.debug(
-                f"Создана таблица purchases в SQLite -> '{self.db_path}'"
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_purchases_user_asset_created
+                ON purchases (user_id, asset, created_at)
+                """
             )
+            self._create_totals(cursor)
+        logger.debug(
+            "Создана таблица purchases в SQLite -> '%s', journal_mode=%s, "
+            "synchronous=%s",
+            self.db_path,
+            journal_mode,
+            self.synchronous,
+        )
+
+    @staticmethod
+    def _create_totals(cursor: sqlite3.Cursor) -> None:
+        """
+        Создает таблицу агрегатов asset_totals и триггеры, которые
+        обновляют ее при добавлении и удалении покупок.
+        """
+        totals_exists = cursor.execute(
+            """
+            SELECT 1 FROM sqlite_master
+            WHERE type = 'table' AND name = 'asset_totals'
+            """
+        ).fetchone()
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS asset_totals (
+                user_id INTEGER,
+                asset TEXT,
+                total_cost REAL NOT NULL,
+                total_amount REAL NOT NULL,
+                purchase_count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, asset)
+            )
+        """
+        )
+        if not totals_exists:
+            # Таблица агрегатов появилась в существующей базе
+            SQLiteStorage._rebuild_totals(cursor)
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS purchases_insert_totals
+            AFTER INSERT ON purchases
+            BEGIN
+                INSERT INTO asset_totals (
+                    user_id, asset, total_cost, total_amount, purchase_count
+                )
+                VALUES (
+                    NEW.user_id, NEW.asset, NEW.price * NEW.amount,
+                    NEW.amount, 1
+                )
+                ON CONFLICT (user_id, asset) DO UPDATE SET
+                    total_cost = total_cost + excluded.total_cost,
+                    total_amount = total_amount + excluded.total_amount,
+                    purchase_count = purchase_count + 1;
+            END
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS purchases_delete_totals
+            AFTER DELETE ON purchases
+            BEGIN
+                UPDATE asset_totals
+                SET total_cost = total_cost - OLD.price * OLD.amount,
+                    total_amount = total_amount - OLD.amount,
+                    purchase_count = purchase_count - 1
+                WHERE user_id = OLD.user_id AND asset = OLD.asset;
+                DELETE FROM asset_totals
+                WHERE user_id = OLD.user_id AND asset = OLD.asset
+                    AND purchase_count <= 0;
+            END
+            """
+        )
+
+    @staticmethod
+    def _migrate_purchases(cursor: sqlite3.Cursor) -> None:
+        """
+        Переносит покупки из схемы с составным первичным ключом
+        (user_id, asset, price, amount) в схему с суррогатным id.
+
+        Время старых покупок неизвестно, поэтому ``created_at`` у них
+        NULL: при сортировке они идут раньше новых, а между собой – по
+        ``id``, назначенному в порядке rowid старой таблицы.
+        """
+        cursor.execute("ALTER TABLE purchases RENAME TO purchases_legacy")
+        cursor.execute(
+            """
+            CREATE TABLE purchases (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                asset TEXT NOT NULL,
+                price REAL NOT NULL,
+                amount REAL NOT NULL,
+                created_at REAL
+            )
+        """
+        )
+        cursor.execute(
+            """
+            INSERT INTO purchases (user_id, asset, price, amount, created_at)
+            SELECT user_id, asset, price, amount, NULL
+            FROM purchases_legacy
+            ORDER BY rowid
+            """
+        )
+        migrated = cursor.rowcount
+        cursor.execute("DROP TABLE purchases_legacy")
+        logger.info(
+            "Схема purchases мигрирована: перенесено %s строк", migrated
+        )
+
+    @contextlib.contextmanager
+    def _write_cursor(self) -> typing.Iterator[sqlite3.Cursor]:
+        """Курсор соединения для записи внутри одной транзакции."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("SQLite хранилище закрыто")
+
+        with self._write_lock:
+            with self._writer:
+                yield self._writer.cursor()
+
+    def _write(self, operation: WriteOperation, *args: typing.Any):
+        """
+        Выполняет ``operation(cursor, *args)`` в транзакции записи.
+
+        В режиме группового коммита операция уходит в поток записи, а
+        вызов возвращается после фиксации ее транзакции.
+        """
+        if self._group_writer is not None:
+            return self._group_writer.submit(operation, *args).result()
+
+        with self._write_cursor() as cursor:
+            return operation(cursor, *args)
+
+    @contextlib.contextmanager
+    def _read_cursor(self) -> typing.Iterator[sqlite3.Cursor]:
+        """Курсор соединения из пула для чтения."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("SQLite хранилище закрыто")
+
+        if self._shared_memory_db:
+            with self._write_lock:
+                yield self._writer.cursor()
+            return
+
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._connect(read_only=True)
+
+        try:
+            yield conn.cursor()
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                try:
+                    self._readers.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+
+        if self._group_writer is not None:
+            self._group_writer.close()
+        self._closed = True
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+        with self._write_lock:
+            self._writer.close()
+        logger.info("SQLite хранилище закрыто: %s", self.db_path)
 
     def add_purchase(
         self, user_id: int, asset: str, price: float, amount: float
     ) -> None:
         asset = asset.upper()
         if asset not in SUPPORTED_CRYPTOS:
-            logger.error(f"Попытка добавить неподдерживаемый актив: {asset}")
+            logger.error("Попытка добавить неподдерживаемый актив: %s", asset)
             raise ValueError(f"Актив {asset} не поддерживается")
 
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    """
-                    INSERT INTO purchases (user_id, asset, price, amount)
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (user_id, asset, price, amount),
-                )
-                conn.commit()
-                logger.debug(
-                    f"Добавлена покупка в SQLite: user_id={user_id}, "
-                    f"asset={asset}, price={price}, amount={amount}"
-                )
+            self._write(
+                self._insert_purchase,
+                user_id,
+                asset,
+                price,
+                amount,
+                time.time(),
+            )
+            logger.debug(
+                "Добавлена покупка в SQLite: user_id=%s, asset=%s, price=%s, "
+                "amount=%s",
+                user_id,
+                asset,
+                price,
+                amount,
+            )
+        except sqlite3.Error as err_msg:
+            record_error("sqlite", "add_purchase")
+            logger.error("Ошибка при добавлении покупки в SQLite: %s", err_msg)
+            # Покупка не сохранена: вызывающий не должен ее подтверждать
+            raise
+
+    @staticmethod
+    def _insert_purchase(
+        cursor: sqlite3.Cursor,
+        user_id: int,
+        asset: str,
+        price: float,
+        amount: float,
+        created_at: float,
+    ) -> None:
+        cursor.execute(
+            """
+            INSERT INTO purchases (user_id, asset, price, amount, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (user_id, asset, price, amount, created_at),
+        )
+
+    def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        purchases = normalize_bulk_purchases(purchases)
+        try:
+            self._write(
+                self._insert_purchases, user_id, purchases, time.time()
+            )
+            logger.debug(
+                "Добавлены покупки пакетом в SQLite: user_id=%s, count=%s",
+                user_id,
+                len(purchases),
+            )
+            return len(purchases)
         except sqlite3.Error as err_msg:
-            logger.error(f"Ошибка при добавлении покупки в SQLite: {err_msg}")
+            record_error("sqlite", "add_purchases_bulk")
+            logger.error(
+                "Ошибка при пакетном добавлении покупок в SQLite: %s",
+                err_msg,
+            )
+            raise
+
+    @staticmethod
+    def _insert_purchases(
+        cursor: sqlite3.Cursor,
+        user_id: int,
+        purchases: list[tuple[str, float, float]],
+        created_at: float,
+    ) -> None:
+        cursor.executemany(
+            """
+            INSERT INTO purchases (user_id, asset, price, amount, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                (user_id, asset, price, amount, created_at)
+                for asset, price, amount in purchases
+            ),
+        )
 
     def get_purchases(
         self, user_id: int, asset: str
     ) -> list[dict[str, float]]:
         asset = asset.upper()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            with self._read_cursor() as cursor:
                 cursor.execute(
                     """
-                    SELECT price, amount
+                    SELECT id, price, amount
                     FROM purchases
                     WHERE user_id = ? AND asset = ?
+                    ORDER BY created_at, id
                     """,
                     (user_id, asset),
                 )
                 purchases: list[dict[str, float]] = [
-                    {"price": row[0], "amount": row[1]}
+                    {"id": row[0], "price": row[1], "amount": row[2]}
                     for row in cursor.fetchall()
                 ]
-                logger.debug(
-                    f"Получены покупки из SQLite: user_id={user_id}, "
-                    f"asset={asset}, count={len(purchases)}"
-                )
-                return purchases
+            logger.debug(
+                "Получены покупки из SQLite: user_id=%s, asset=%s, count=%s",
+                user_id,
+                asset,
+                len(purchases),
+            )
+            return purchases
         except sqlite3.Error as err_msg:
-            logger.error(f"Ошибка при получении покупок из SQLite: {err_msg}")
+            record_error("sqlite", "get_purchases")
+            logger.error("Ошибка при получении покупок из SQLite: %s", err_msg)
             return []
 
-    def get_user_assets(self, user_id: int) -> list[str]:
+    def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        asset = asset.upper()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            with self._read_cursor() as cursor:
+                # Индекс (user_id, asset, created_at) отдает строки в нужном
+                # порядке, поэтому запрос читает только offset + limit строк
                 cursor.execute(
                     """
-                    SELECT DISTINCT asset
+                    SELECT id, price, amount
                     FROM purchases
-                    WHERE user_id = ?
+                    WHERE user_id = ? AND asset = ?
+                    ORDER BY created_at, id
+                    LIMIT ? OFFSET ?
                     """,
+                    (user_id, asset, limit, offset),
+                )
+                purchases: list[dict[str, float]] = [
+                    {"id": row[0], "price": row[1], "amount": row[2]}
+                    for row in cursor.fetchall()
+                ]
+            logger.debug(
+                "Получена страница покупок из SQLite: user_id=%s, asset=%s, "
+                "offset=%s, count=%s",
+                user_id,
+                asset,
+                offset,
+                len(purchases),
+            )
+            return purchases
+        except sqlite3.Error as err_msg:
+            record_error("sqlite", "get_purchases_page")
+            logger.error(
+                "Ошибка при получении страницы покупок из SQLite: %s", err_msg
+            )
+            return []
+
+    def get_user_assets(self, user_id: int) -> list[str]:
+        try:
+            with self._read_cursor() as cursor:
+                # Одна строка агрегатов на актив, поиск по первичному ключу
+                cursor.execute(
+                    "SELECT asset FROM asset_totals WHERE user_id = ?",
                     (user_id,),
                 )
                 assets = [row[0] for row in cursor.fetchall()]
-                logger.debug(
-                    "Получены активы из SQLite: "
-                    f"user_id={user_id}, assets={assets}"
-                )
-                return assets
+            logger.debug(
+                "Получены активы из SQLite: user_id=%s, assets=%s",
+                user_id,
+                assets,
+            )
+            return assets
         except sqlite3.Error as err_msg:
-            logger.error(f"Ошибка при получении активов из SQLite: {err_msg}")
+            record_error("sqlite", "get_user_assets")
+            logger.error("Ошибка при получении активов из SQLite: %s", err_msg)
             return []
 
     def clear(self, user_id: int, asset: str = None) -> None:
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                if asset is None:
-                    cursor.execute(
-                        """
-                        DELETE FROM purchases WHERE user_id = ?
-                        """,
-                        (user_id,),
-                    )
-                    logger.info(
-                        f"Очищены все данные в SQLite для user_id={user_id}"
-                    )
-                else:
-                    asset = asset.upper()
-                    cursor.execute(
-                        "DELETE FROM purchases "
-                        "WHERE user_id = ? AND asset = ?",
-                        (user_id, asset),
-                    )
-                    logger.info(
-                        "Очищены данные в SQLite для "
-                        f"user_id={user_id}, asset={asset}"
-                    )
-                conn.commit()
+            if asset is None:
+                self._write(self._delete_user_rows, user_id)
+                logger.info(
+                    "Очищены все данные в SQLite для user_id=%s",
+                    user_id,
+                )
+            else:
+                asset = asset.upper()
+                self._write(self._delete_asset_rows, user_id, asset)
+                logger.info(
+                    "Очищены данные в SQLite для user_id=%s, asset=%s",
+                    user_id,
+                    asset,
+                )
         except sqlite3.Error as err_msg:
-            logger.error(f"Ошибка при очистке данных в SQLite: {err_msg}")
+            record_error("sqlite", "clear")
+            logger.error("Ошибка при очистке данных в SQLite: %s", err_msg)
+
+    @staticmethod
+    def _delete_user_rows(cursor: sqlite3.Cursor, user_id: int) -> None:
+        cursor.execute("DELETE FROM purchases WHERE user_id = ?", (user_id,))
+
+    @staticmethod
+    def _delete_asset_rows(
+        cursor: sqlite3.Cursor, user_id: int, asset: str
+    ) -> None:
+        cursor.execute(
+            "DELETE FROM purchases WHERE user_id = ? AND asset = ?",
+            (user_id, asset),
+        )
 
     def delete_purchase(
-        self, user_id: int, asset: str, purchase_index: int
+        self, user_id: int, asset: str, purchase_id: int
     ) -> None:
         asset = asset.upper()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                # Получаем все покупки для актива
-                cursor.execute(
+            deleted = self._write(
+                self._delete_purchase_row, user_id, asset, purchase_id
+            )
+        except sqlite3.Error as err_msg:
+            record_error("sqlite", "delete_purchase")
+            logger.error("Ошибка при удалении покупки из SQLite: %s", err_msg)
+            return
+
+        if deleted:
+            logger.info(
+                "Удалена покупка из SQLite: user_id=%s, asset=%s, id=%s",
+                user_id,
+                asset,
+                purchase_id,
+            )
+        else:
+            logger.error(
+                "Некорректный id покупки: user_id=%s, asset=%s, id=%s",
+                user_id,
+                asset,
+                purchase_id,
+            )
+
+    @staticmethod
+    def _delete_purchase_row(
+        cursor: sqlite3.Cursor, user_id: int, asset: str, purchase_id: int
+    ) -> bool:
+        cursor.execute(
+            "DELETE FROM purchases WHERE id = ? AND user_id = ? AND asset = ?",
+            (purchase_id, user_id, asset),
+        )
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _rebuild_totals(cursor: sqlite3.Cursor) -> None:
+        cursor.execute("DELETE FROM asset_totals")
+        cursor.execute(
+            """
+            INSERT INTO asset_totals (
+                user_id, asset, total_cost, total_amount, purchase_count
+            )
+            SELECT user_id, asset, SUM(price * amount), SUM(amount), COUNT(*)
+            FROM purchases
+            GROUP BY user_id, asset
+            """
+        )
+
+    def get_asset_totals(self, user_id: int, asset: str) -> AssetTotals:
+        asset = asset.upper()
+        try:
+            with self._read_cursor() as cursor:
+                row = cursor.execute(
                     """
-                    SELECT price, amount
-                    FROM purchases
+                    SELECT total_cost, total_amount, purchase_count
+                    FROM asset_totals
                     WHERE user_id = ? AND asset = ?
                     """,
                     (user_id, asset),
+                ).fetchone()
+            return tuple(row) if row else EMPTY_TOTALS
+        except sqlite3.Error as err_msg:
+            record_error("sqlite", "get_asset_totals")
+            logger.error(
+                "Ошибка при получении агрегатов из SQLite: %s",
+                err_msg,
+            )
+            return EMPTY_TOTALS
+
+    def get_portfolio_totals(self, user_id: int) -> dict[str, AssetTotals]:
+        try:
+            with self._read_cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT asset, total_cost, total_amount, purchase_count
+                    FROM asset_totals
+                    WHERE user_id = ?
+                    """,
+                    (user_id,),
                 )
-                purchases = [(row[0], row[1]) for row in cursor.fetchall()]
-                if 0 <= purchase_index < len(purchases):
-                    price, amount = purchases[purchase_index]
-                    cursor.execute(
+                totals = {row[0]: tuple(row[1:]) for row in cursor}
+            logger.debug(
+                "Получены агрегаты портфеля из SQLite: user_id=%s, assets=%s",
+                user_id,
+                len(totals),
+            )
+            return totals
+        except sqlite3.Error as err_msg:
+            record_error("sqlite", "get_portfolio_totals")
+            logger.error(
+                "Ошибка при получении агрегатов портфеля из SQLite: %s",
+                err_msg,
+            )
+            return {}
+
+    def verify_totals(self, rebuild: bool = False) -> list[tuple[int, str]]:
+        try:
+            with self._write_cursor() as cursor:
+                expected: dict[tuple[int, str], AssetTotals] = {
+                    (row[0], row[1]): tuple(row[2:])
+                    for row in cursor.execute(
+                        """
+                        SELECT user_id, asset,
+                            SUM(price * amount), SUM(amount), COUNT(*)
+                        FROM purchases
+                        GROUP BY user_id, asset
                         """
-                        DELETE FROM purchases
-                        WHERE user_id = ?
-                        AND asset = ? AND price = ? AND amount = ?
-                        """,
-                        (user_id, asset, price, amount),
                     )
-                    conn.commit()
-                    logger.info(
-                        f"Удалена покупка из SQLite: user_id={user_id}, "
-                        f"asset={asset}, index={purchase_index}"
+                }
+                actual: dict[tuple[int, str], AssetTotals] = {
+                    (row[0], row[1]): tuple(row[2:])
+                    for row in cursor.execute(
+                        """
+                        SELECT user_id, asset,
+                            total_cost, total_amount, purchase_count
+                        FROM asset_totals
+                        """
                     )
-                else:
-                    logger.error(
-                        f"Некорректный индекс покупки: user_id={user_id}, "
-                        f"asset={asset}, index={purchase_index}"
+                }
+                mismatched = [
+                    key
+                    for key in sorted(expected.keys() | actual.keys())
+                    if not totals_match(
+                        expected.get(key, EMPTY_TOTALS),
+                        actual.get(key, EMPTY_TOTALS),
                     )
+                ]
+                if rebuild:
+                    self._rebuild_totals(cursor)
+                    logger.info("Агрегаты в SQLite пересчитаны по покупкам")
         except sqlite3.Error as err_msg:
-            logger.error(f"Ошибка при удалении покупки из SQLite: {err_msg}")
+            record_error("sqlite", "verify_totals")
+            logger.error("Ошибка при сверке агрегатов в SQLite: %s", err_msg)
+            return []
 
-    def export_to_csv(self, user_id: int) -> list[dict[str, str]]:
+        if mismatched:
+            logger.error(
+                "Расхождение агрегатов с покупками в SQLite: %s",
+                len(mismatched),
+            )
+        return mismatched
+
+    def iter_export(self, user_id: int) -> typing.Iterator[dict[str, str]]:
+        rows = 0
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            # Соединение из пула занято, пока итератор не исчерпан,
+            # строки читаются с курсора по одной
+            with self._read_cursor() as cursor:
                 cursor.execute(
                     """
                     SELECT user_id, asset, price, amount
                     FROM purchases
                     WHERE user_id = ?
+                    ORDER BY asset, created_at, id
                     """,
                     (user_id,),
                 )
-                rows = [
-                    {
+                for row in cursor:
+                    rows += 1
+                    yield {
                         "user_id": str(row[0]),
                         "asset": row[1],
                         "price": str(row[2]),
                         "amount": str(row[3]),
                     }
-                    for row in cursor.fetchall()
-                ]
-                logger.debug(
-                    "Экспортированы данные из SQLite для "
-                    f"user_id={user_id}, rows={len(rows)}"
-                )
-                return rows
+            logger.debug(
+                "Экспортированы данные из SQLite для user_id=%s, rows=%s",
+                user_id,
+                rows,
+            )
         except sqlite3.Error as err_msg:
-            logger.error(f"Ошибка при экспорте данных из SQLite: {err_msg}")
-            return []
+            record_error("sqlite", "iter_export")
+            logger.error("Ошибка при экспорте данных из SQLite: %s", err_msg)
 
 
-class JSONStorage(Storage, ExportData):
+@instrumented("json", STORAGE_OPERATIONS)
+class JSONStorage(_TotalsMixin, Storage, ExportData):
     """Хранилище данных в JSON-файле."""
 
-    def __init__(self, file_path: str = "purchases.json") -> None:
+    def __init__(
+        self,
+        file_path: str = "purchases.json",
+        journal: bool = False,
+        journal_max_bytes: int = JSON_JOURNAL_MAX_BYTES,
+        write_behind: bool = False,
+        flush_interval: float = JSON_FLUSH_INTERVAL,
+        flush_threshold: int = JSON_FLUSH_THRESHOLD,
+    ) -> None:
+        """
+        Инициализация JSON хранилища.
+
+        В режиме журнала изменения дописываются в файл
+        ``<file_path>.journal`` компактными JSON-строками, а снимок всех
+        данных перезаписывается только при сжатии журнала.
+
+        В режиме отложенной записи изменения только помечают хранилище
+        как измененное, а снимок сохраняет фоновая задача (см. ``start``)
+        раз в ``flush_interval`` секунд или после ``flush_threshold``
+        изменений. При закрытии хранилища снимок сохраняется всегда.
+
+        :param file_path: Путь к JSON-файлу (снимку данных).
+        :param journal: Включить режим журнала.
+        :param journal_max_bytes: Размер журнала, после которого он
+        сжимается в новый снимок.
+        :param write_behind: Включить режим отложенной записи.
+        :param flush_interval: Интервал сохранения снимка в секундах.
+        :param flush_threshold: Количество изменений, после которого
+        снимок сохраняется, не дожидаясь интервала.
+        """
+        if journal and write_behind:
+            raise ValueError("Режимы журнала и отложенной записи несовместимы")
+
         self.file_path = file_path
+        self.journal_path = f"{file_path}.journal"
+        self.journal_max_bytes = journal_max_bytes
+        self._seq = 0
+        self._journal: typing.IO[str] | None = None
+        self._journal_size = 0
+
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._dirty = 0
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._flush_event: asyncio.Event | None = None
+        self._flusher: asyncio.Task | None = None
+
         self.data: dict[int, dict[str, list[dict[str, float]]]] = (
             self._load_data()
         )
-        logger.info(f"Инициализировано JSON хранилище: {file_path}")
+        self._next_id = self._assign_ids()
+        self._rebuild_totals()
+        replayed = self._replay_journal()
+
+        if journal:
+            self._journal = open(self.journal_path, "a", encoding="UTF-8")
+            self._journal_size = self._journal.tell()
+        elif replayed:
+            # Журнал остался от запуска в режиме журнала
+            self._save_data()
+            os.remove(self.journal_path)
+
+        logger.info(
+            "Инициализировано JSON хранилище: %s, journal=%s, write_behind=%s",
+            file_path,
+            journal,
+            write_behind,
+        )
 
     def _load_data(self) -> dict[int, dict[str, list[dict[str, float]]]]:
         if not os.path.exists(self.file_path):
             logger.debug(
-                f"JSON файл не существует, создан новый: {self.file_path}"
+                "JSON файл не существует, создан новый: %s",
+                self.file_path,
             )
             return {}
 
         try:
             with open(self.file_path, "r", encoding="UTF-8") as f:
-                return json.load(f)
+                raw_data = json.load(f)
+            if "seq" in raw_data and "data" in raw_data:
+                # Снимок, записанный в режиме журнала
+                self._seq = raw_data["seq"]
+                raw_data = raw_data["data"]
+            # Ключи JSON-объекта всегда строки, а user_id – целое число
+            return {
+                int(user_id): assets for user_id, assets in raw_data.items()
+            }
         except Exception as err_msg:
-            logger.error(f"Ошибка при загрузке JSON: {err_msg}")
+            record_error("json", "load")
+            logger.error("Ошибка при загрузке JSON: %s", err_msg)
             return {}
 
-    def _save_data(self) -> None:
+    def _assign_ids(self) -> int:
+        """
+        Присваивает id покупкам из файлов, записанных до их появления.
+
+        :return: Следующий свободный id.
+        """
+        purchases = [
+            purchase
+            for assets in self.data.values()
+            for asset_purchases in assets.values()
+            for purchase in asset_purchases
+        ]
+        next_id = max((p.get("id", 0) for p in purchases), default=0) + 1
+        for purchase in purchases:
+            if "id" not in purchase:
+                purchase["id"] = next_id
+                next_id += 1
+        return next_id
+
+    def _replay_journal(self) -> int:
+        """
+        Применяет к снимку записи журнала, сделанные после него.
+
+        :return: Количество примененных записей.
+        """
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        replayed = 0
+        valid_bytes = 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                record = self._parse_journal_line(line)
+                if record is None:
+                    break
+                valid_bytes += len(line)
+                if record["seq"] <= self._seq:
+                    continue
+                self._apply_record(record)
+                self._seq = record["seq"]
+                replayed += 1
+
+        self._truncate_journal(valid_bytes)
+        logger.debug(
+            "Журнал применен: %s, records=%s",
+            self.journal_path,
+            replayed,
+        )
+        return replayed
+
+    @staticmethod
+    def _parse_journal_line(line: bytes) -> dict[str, typing.Any] | None:
+        """Разбирает строку журнала. None – строка недописана."""
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            return json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+
+    def _truncate_journal(self, valid_bytes: int) -> None:
+        """
+        Обрезает журнал после последней целой записи.
+
+        Иначе новые записи дописываются после недописанной строки, и при
+        следующем запуске воспроизведение остановится на ней.
+        """
+        if os.path.getsize(self.journal_path) <= valid_bytes:
+            return
+        logger.error(
+            "Поврежденная запись журнала, журнал обрезан до %s байт: %s",
+            valid_bytes,
+            self.journal_path,
+        )
+        os.truncate(self.journal_path, valid_bytes)
+
+    def _apply_record(self, record: dict[str, typing.Any]) -> None:
+        user_id: int = record["user_id"]
+        asset: str | None = record["asset"]
+
+        if record["op"] == "add":
+            self._append_purchase(
+                user_id, record["id"], asset, record["price"], record["amount"]
+            )
+        elif record["op"] == "bulk_add":
+            for purchase in record["purchases"]:
+                self._append_purchase(user_id, *purchase)
+        elif record["op"] == "clear":
+            self._apply_clear(user_id, asset)
+        elif record["op"] == "delete":
+            self._replay_delete(user_id, asset, record["id"])
+
+    def _append_purchase(
+        self,
+        user_id: int,
+        purchase_id: int,
+        asset: str,
+        price: float,
+        amount: float,
+    ) -> None:
+        self.data.setdefault(user_id, {}).setdefault(asset, []).append(
+            {"id": purchase_id, "price": price, "amount": amount}
+        )
+        self._next_id = max(self._next_id, purchase_id + 1)
+        self._add_to_totals(user_id, asset, price, amount)
+
+    def _apply_clear(self, user_id: int, asset: str | None) -> None:
+        if asset is None:
+            self.data[user_id] = {}
+            self._drop_totals(user_id)
+        else:
+            self.data.get(user_id, {}).pop(asset, None)
+            self._drop_totals(user_id, asset)
+
+    def _replay_delete(
+        self, user_id: int, asset: str, purchase_id: int
+    ) -> None:
+        purchases = self.data.get(user_id, {}).get(asset, [])
+        index = find_purchase_index(purchases, purchase_id)
+        if index is not None:
+            self._apply_delete(user_id, asset, index)
+
+    def _apply_delete(self, user_id: int, asset: str, index: int) -> None:
+        purchases = self.data[user_id][asset]
+        purchase = purchases.pop(index)
+        self._subtract_from_totals(
+            user_id, asset, purchase["price"], purchase["amount"]
+        )
+        if not purchases:
+            self.data[user_id].pop(asset)
+
+    def _commit(self, record: dict[str, typing.Any]) -> None:
+        """Сохраняет примененное изменение на диск."""
+        if self.write_behind:
+            self._mark_dirty()
+            return
+
+        if self._journal is None:
+            self._save_data()
+            return
+
+        self._seq += 1
+        line = (
+            json.dumps({"seq": self._seq, **record}, separators=(",", ":"))
+            + "\n"
+        )
+        try:
+            self._journal.write(line)
+            self._journal.flush()
+            self._journal_size += len(line.encode("UTF-8"))
+        except Exception as err_msg:
+            record_error("json", "commit")
+            logger.error("Ошибка при записи журнала JSON: %s", err_msg)
+            return
+
+        if self._journal_size >= self.journal_max_bytes:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Записывает новый снимок и очищает журнал."""
+        if not self._save_data():
+            return
+
+        self._journal.seek(0)
+        self._journal.truncate()
+        self._journal_size = 0
+        logger.info("Журнал JSON сжат в снимок: %s", self.file_path)
+
+    def _serialize(self) -> str:
+        if self._journal is not None:
+            return json.dumps(
+                {"seq": self._seq, "data": self.data}, separators=(",", ":")
+            )
+        if self.write_behind:
+            return json.dumps(self.data, separators=(",", ":"))
+        return json.dumps(self.data, indent=4)
+
+    def _write_snapshot(self, content: str) -> bool:
+        tmp_path = f"{self.file_path}.tmp"
         try:
             with open(
-                self.file_path, "w", encoding="UTF-8"
+                tmp_path, "w", encoding="UTF-8"
             ) as file:  # type: typing.IO[str]
-                json.dump(self.data, file, indent=4)
+                file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+            # Атомарная замена: файл никогда не остается недописанным
+            os.replace(tmp_path, self.file_path)
 
-            logger.debug(f"Данные сохранены в JSON: {self.file_path}")
+            logger.debug("Данные сохранены в JSON: %s", self.file_path)
+            return True
         except Exception as err_msg:
-            logger.error(f"Ошибка при сохранении JSON: {err_msg}")
+            record_error("json", "write_snapshot")
+            logger.error("Ошибка при сохранении JSON: %s", err_msg)
+            return False
+
+    def _save_data(self) -> bool:
+        with self._flush_lock:
+            return self._write_snapshot(self._serialize())
+
+    def _mark_dirty(self) -> None:
+        self._dirty += 1
+        if self._dirty >= self.flush_threshold and self._loop is not None:
+            # Изменения выполняются в потоке пула, а событие
+            # принадлежит циклу событий
+            self._loop.call_soon_threadsafe(self._flush_event.set)
+
+    def flush(self) -> None:
+        """Сохраняет снимок, если есть несохраненные изменения."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                dirty = self._dirty
+                content = self._serialize()
+                self._dirty = 0
+
+            if not self._write_snapshot(content):
+                with self._lock:
+                    self._dirty += dirty
+                return
+        logger.debug("Отложенная запись JSON: changes=%s", dirty)
+
+    async def _run_flusher(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_event.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            if self._dirty:
+                await asyncio.to_thread(self.flush)
+
+    def start(self) -> None:
+        if not self.write_behind or self._flusher is not None:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._flush_event = asyncio.Event()
+        self._flusher = self._loop.create_task(self._run_flusher())
+        logger.info(
+            "Запущена отложенная запись JSON: interval=%s, threshold=%s",
+            self.flush_interval,
+            self.flush_threshold,
+        )
+
+    def close(self) -> None:
+        if self._flusher is not None:
+            # close может вызываться из потока пула
+            self._loop.call_soon_threadsafe(self._flusher.cancel)
+            self._flusher = None
+        if self.write_behind:
+            self.flush()
+
+        if self._journal is None:
+            return
+
+        self._journal.close()
+        self._journal = None
+        logger.info("Журнал JSON закрыт: %s", self.journal_path)
 
     def add_purchase(
         self, user_id: int, asset: str, price: float, amount: float
     ) -> None:
         asset = asset.upper()
         if asset not in SUPPORTED_CRYPTOS:
-            logger.error(f"Попытка добавить неподдерживаемый актив: {asset}")
+            logger.error("Попытка добавить неподдерживаемый актив: %s", asset)
             raise ValueError(f"Актив {asset} не поддерживается")
 
-        if user_id not in self.data:
-            self.data[user_id] = {}
-        if asset not in self.data[user_id]:
-            self.data[user_id][asset] = []
+        with self._lock:
+            record = {
+                "op": "add",
+                "id": self._next_id,
+                "user_id": user_id,
+                "asset": asset,
+                "price": price,
+                "amount": amount,
+            }
+            self._apply_record(record)
+            self._commit(record)
+        logger.debug(
+            "Добавлена покупка в JSON: user_id=%s, asset=%s, price=%s, "
+            "amount=%s",
+            user_id,
+            asset,
+            price,
+            amount,
+        )
+
+    def add_purchases_bulk(
+        self, user_id: int, purchases: list[tuple[str, float, float]]
+    ) -> int:
+        purchases = normalize_bulk_purchases(purchases)
+        if not purchases:
+            return 0
 
-        self.data[user_id][asset].append({"price": price, "amount": amount})
-        self._save_data()
+        with self._lock:
+            record = {
+                "op": "bulk_add",
+                "user_id": user_id,
+                "asset": None,
+                "purchases": [
+                    [self._next_id + offset, asset, price, amount]
+                    for offset, (asset, price, amount) in enumerate(purchases)
+                ],
+            }
+            self._apply_record(record)
+            # Один снимок или одна строка журнала на весь пакет
+            self._commit(record)
         logger.debug(
-            f"Добавлена покупка в JSON: user_id={user_id}, "
-            f"asset={asset}, price={price}, amount={amount}"
+            "Добавлены покупки пакетом в JSON: user_id=%s, count=%s",
+            user_id,
+            len(purchases),
         )
+        return len(purchases)
 
     def get_purchases(
         self, user_id: int, asset: str
@@ -387,83 +1441,122 @@ class JSONStorage(Storage, ExportData):
         asset = asset.upper()
         purchases = self.data.get(user_id, {}).get(asset, [])
         logger.debug(
-            f"Получены покупки из JSON: user_id={user_id}, "
-            f"asset={asset}, count={len(purchases)}"
+            "Получены покупки из JSON: user_id=%s, asset=%s, count=%s",
+            user_id,
+            asset,
+            len(purchases),
         )
         return purchases
 
+    def get_purchases_page(
+        self, user_id: int, asset: str, offset: int, limit: int
+    ) -> list[dict[str, float]]:
+        asset = asset.upper()
+        purchases = self.data.get(user_id, {}).get(asset, [])
+        page = purchases[offset : offset + limit]
+        logger.debug(
+            "Получена страница покупок из JSON: user_id=%s, asset=%s, "
+            "offset=%s, count=%s",
+            user_id,
+            asset,
+            offset,
+            len(page),
+        )
+        return page
+
     def get_user_assets(self, user_id: int) -> list[str]:
         assets = list(self.data.get(user_id, {}).keys())
         logger.debug(
-            f"Получены активы из JSON: user_id={user_id}, assets={assets}"
+            "Получены активы из JSON: user_id=%s, assets=%s",
+            user_id,
+            assets,
         )
         return assets
 
     def clear(self, user_id: int, asset: str = None) -> None:
         if user_id not in self.data:
             logger.debug(
-                f"Попытка очистки для несуществующего user_id={user_id}"
+                "Попытка очистки для несуществующего user_id=%s",
+                user_id,
             )
             return
 
+        if asset is not None:
+            asset = asset.upper()
+
+        record = {"op": "clear", "user_id": user_id, "asset": asset}
+        with self._lock:
+            self._apply_record(record)
+            self._commit(record)
         if asset is None:
-            self.data[user_id] = {}
-            logger.info(f"Очищены все данные в JSON для user_id={user_id}")
+            logger.info("Очищены все данные в JSON для user_id=%s", user_id)
         else:
-            asset = asset.upper()
-            self.data[user_id].pop(asset, None)
             logger.info(
-                f"Очищены данные в JSON для user_id={user_id}, asset={asset}"
+                "Очищены данные в JSON для user_id=%s, asset=%s",
+                user_id,
+                asset,
             )
-        self._save_data()
 
     def delete_purchase(
         self,
         user_id: int,
         asset: str,
-        purchase_index: int,
+        purchase_id: int,
     ) -> None:
         asset = asset.upper()
-        if user_id not in self.data or asset not in self.data[user_id]:
+        record = {
+            "op": "delete",
+            "user_id": user_id,
+            "asset": asset,
+            "id": purchase_id,
+        }
+        # Поиск и удаление под одной блокировкой: иначе другой поток
+        # может удалить ту же покупку между ними
+        with self._lock:
+            purchases = self.data.get(user_id, {}).get(asset)
+            index = None
+            if purchases is not None:
+                index = find_purchase_index(purchases, purchase_id)
+            if index is not None:
+                self._apply_delete(user_id, asset, index)
+                self._commit(record)
+
+        if purchases is None:
             logger.debug(
-                "Попытка удаления покупки для несуществующего "
-                f"user_id={user_id} или asset={asset}"
+                "Попытка удаления покупки для несуществующего user_id=%s или "
+                "asset=%s",
+                user_id,
+                asset,
             )
-            return
-
-        purchases = self.data[user_id][asset]
-        if 0 <= purchase_index < len(purchases):
-            purchases.pop(purchase_index)
-            if not purchases:
-                self.data[user_id].pop(asset)
-            self._save_data()
-            logger.info(
-                f"Удалена покупка из JSON: user_id={user_id}, "
-                f"asset={asset}, index={purchase_index}"
+        elif index is None:
+            logger.error(
+                "Некорректный id покупки: user_id=%s, asset=%s, id=%s",
+                user_id,
+                asset,
+                purchase_id,
             )
         else:
-            logger.error(
-                f"Некорректный индекс покупки: user_id={user_id}, "
-                f"asset={asset}, index={purchase_index}"
+            logger.info(
+                "Удалена покупка из JSON: user_id=%s, asset=%s, id=%s",
+                user_id,
+                asset,
+                purchase_id,
             )
 
-    def export_to_csv(self, user_id: int) -> list[dict[str, str]]:
-        if user_id not in self.data:
-            return []
-
-        rows = [
-            {
-                "user_id": str(user_id),
-                "asset": asset,
-                "price": str(purchase["price"]),
-                "amount": str(purchase["amount"]),
-            }
-            for asset, purchases in self.data[user_id].items()
-            for purchase in purchases
-        ]
+    def iter_export(self, user_id: int) -> typing.Iterator[dict[str, str]]:
+        rows = 0
+        for asset, purchases in self.data.get(user_id, {}).items():
+            for purchase in purchases:
+                rows += 1
+                yield {
+                    "user_id": str(user_id),
+                    "asset": asset,
+                    "price": str(purchase["price"]),
+                    "amount": str(purchase["amount"]),
+                }
 
         logger.debug(
-            "Экспортированы данные из JSON для "
-            f"user_id={user_id}, rows={len(rows)}"
+            "Экспортированы данные из JSON для user_id=%s, rows=%s",
+            user_id,
+            rows,
         )
-        return rows
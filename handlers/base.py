@@ -1,29 +1,42 @@
-import csv
-import os
+import asyncio
+import contextlib
+import sqlite3
 
 from aiogram import Bot, F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.types import (
-    CallbackQuery,
-    FSInputFile,
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
-    Message,
-)
+from aiogram.types import BufferedInputFile, CallbackQuery, Message
 
 from core import messages
-from core.utils import create_paginated_keyboard
-from data.manager import DataManager
+from core.config import ADMIN_IDS
+from core.metrics import REGISTRY
+from core.utils import (
+    PURCHASES_PER_PAGE,
+    create_keyboard_registry,
+    create_purchases_keyboard,
+)
+from data.csv_io import CSV_IMPORT_MAX_BYTES, read_csv
+from data.manager import AsyncDataManager
 from data.storage import SUPPORTED_CRYPTOS
+from handlers.middlewares import MetricsMiddleware
 from states.data import ClearData
-from states.purchases import AddPurchase, DeletePurchase
+from states.purchases import AddPurchase, DeletePurchase, ImportPurchases
 
-router = Router()
+IMPORT_ERRORS_SHOWN: int = 20
 
 
-def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
-    """Настройка хендлеров с передачей DataManager."""
+def setup_handlers(data_manager: AsyncDataManager) -> Router:  # skip: noqa
+    """
+    Настройка хендлеров с передачей DataManager.
+
+    Каждый вызов создает новый роутер, поэтому в одном процессе можно
+    собрать несколько диспетчеров.
+    """
+    router = Router()
+    keyboards = create_keyboard_registry()
+    router.message.middleware(MetricsMiddleware("message"))
+    router.callback_query.middleware(MetricsMiddleware("callback_query"))
 
     @router.message(Command("start"))
     async def cmd_start(msg: Message, bot: Bot) -> None:
@@ -39,12 +52,12 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
 
     @router.message(Command("add"))
     async def cmd_add(msg: Message, state: FSMContext) -> None:
-        assets = list(SUPPORTED_CRYPTOS.keys())
-        keyboard, total_pages = create_paginated_keyboard(
-            assets, "add_asset", items_per_page=5, page=0
+        await state.update_data(
+            page=0, total_pages=keyboards.total_pages("add_asset")
+        )
+        await msg.reply(
+            messages.SELECT_ASSET, reply_markup=keyboards.get_page("add_asset")
         )
-        await state.update_data(page=0, total_pages=total_pages)
-        await msg.reply(messages.SELECT_ASSET, reply_markup=keyboard)
         await state.set_state(AddPurchase.asset)
 
     @router.callback_query(AddPurchase.asset, F.data.startswith("add_asset"))
@@ -56,21 +69,18 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
         total_pages = data.get("total_pages", 1)
         action, value, *_ = callback.data.split(":")
 
-        assets = list(SUPPORTED_CRYPTOS.keys())
         if value == "prev" and page > 0:
             page -= 1
-            keyboard, _ = create_paginated_keyboard(
-                assets, "add_asset", items_per_page=5, page=page
-            )
             await state.update_data(page=page)
-            await callback.message.edit_reply_markup(reply_markup=keyboard)
+            await callback.message.edit_reply_markup(
+                reply_markup=keyboards.get_page("add_asset", page)
+            )
         elif value == "next" and page < total_pages - 1:
             page += 1
-            keyboard, _ = create_paginated_keyboard(
-                assets, "add_asset", items_per_page=5, page=page
-            )
             await state.update_data(page=page)
-            await callback.message.edit_reply_markup(reply_markup=keyboard)
+            await callback.message.edit_reply_markup(
+                reply_markup=keyboards.get_page("add_asset", page)
+            )
         else:
             asset = value
             await state.update_data(asset=asset)
@@ -107,18 +117,7 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
                 amount=data["amount"],
             )
 
-            keyboard = InlineKeyboardMarkup(
-                inline_keyboard=[
-                    [
-                        InlineKeyboardButton(
-                            text="Подтвердить", callback_data="confirm_add"
-                        ),
-                        InlineKeyboardButton(
-                            text="Отменить", callback_data="cancel_add"
-                        ),
-                    ]
-                ]
-            )
+            keyboard = keyboards.get("confirm_add")
             await msg.answer(
                 f"🏁 Все верно?\n{output}\n\n{messages.CONFIRM_ACTION}",
                 reply_markup=keyboard,
@@ -141,8 +140,15 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
         price = data["price"]
         amount = data["amount"]
 
-        data_manager.add_purchase(user_id, asset, price, amount)
-        avg_price, total_amount, total_cost = data_manager.get_stats(
+        try:
+            await data_manager.add_purchase(user_id, asset, price, amount)
+        except sqlite3.Error:
+            await callback.message.edit_text(messages.PURCHASE_NOT_SAVED)
+            await state.clear()
+            await callback.answer()
+            return
+
+        avg_price, total_amount, total_cost = await data_manager.get_stats(
             user_id, asset
         )
 
@@ -172,17 +178,14 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
     @router.message(Command("view"))
     async def cmd_view(msg: Message) -> None:
         user_id = msg.from_user.id
-        assets = data_manager.get_user_assets(user_id)
-        if not assets:
+        portfolio = await data_manager.get_portfolio_stats(user_id)
+        if not portfolio:
             await msg.reply(messages.NO_PURCHASES)
             return
 
         output_data: str = ""
-        for asset in assets:
-            avg_price, total_amount, total_cost = data_manager.get_stats(
-                user_id,
-                asset,
-            )
+        for asset, stats in portfolio.items():
+            avg_price, total_amount, total_cost = stats
             output_data += (
                 messages.AVG_PRICE_INFO.format(
                     asset=asset,
@@ -198,26 +201,13 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
     @router.message(Command("clear"))
     async def cmd_clear(msg: Message, state: FSMContext) -> None:
         user_id = msg.from_user.id
-        assets = data_manager.get_user_assets(user_id)
+        assets = await data_manager.get_user_assets(user_id)
 
         if not assets:
             await msg.reply(messages.NO_PURCHASES_TO_CLEAR)
             return
 
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="Подтвердить",
-                        callback_data="confirm_clear",
-                    ),
-                    InlineKeyboardButton(
-                        text="Отменить",
-                        callback_data="cancel_clear",
-                    ),
-                ]
-            ]
-        )
+        keyboard = keyboards.get("confirm_clear")
         await msg.reply(messages.CONFIRM_ACTION, reply_markup=keyboard)
         await state.set_state(ClearData.confirm)
 
@@ -228,7 +218,7 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
         callback: CallbackQuery, state: FSMContext
     ) -> None:
         user_id = callback.from_user.id
-        data_manager.clear(user_id)
+        await data_manager.clear(user_id)
         await callback.message.edit_text(messages.DATA_CLEARED)
         await state.clear()
         await callback.answer()
@@ -258,16 +248,14 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
     @router.message(Command("delete"))
     async def cmd_delete(msg: Message, state: FSMContext) -> None:
         user_id = msg.from_user.id
-        assets = data_manager.get_user_assets(user_id)
+        assets = await data_manager.get_user_assets(user_id)
 
         if not assets:
             await msg.reply(messages.NO_PURCHASES_TO_DELETE)
             return
 
-        keyboard, total_pages = create_paginated_keyboard(
-            assets,
-            "delete_asset",
-            items_per_page=5,
+        keyboard, total_pages = keyboards.paginated(
+            tuple(assets), "delete_asset", page=0
         )
         await state.update_data(page=0, total_pages=total_pages)
         await msg.reply(messages.SELECT_ASSET, reply_markup=keyboard)
@@ -285,32 +273,30 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
         action, value, *_ = callback.data.split(":")
 
         user_id = callback.from_user.id
-        assets = data_manager.get_user_assets(user_id)
+        assets = await data_manager.get_user_assets(user_id)
 
         if value == "prev" and page > 0:
             page -= 1
-            keyboard, _ = create_paginated_keyboard(
-                assets,
-                "delete_asset",
-                items_per_page=5,
-                page=page,
+            keyboard, _ = keyboards.paginated(
+                tuple(assets), "delete_asset", page=page
             )
             await state.update_data(page=page)
             await callback.message.edit_reply_markup(reply_markup=keyboard)
         elif value == "next" and page < total_pages - 1:
             page += 1
-            keyboard, _ = create_paginated_keyboard(
-                assets,
-                "delete_asset",
-                items_per_page=5,
-                page=page,
+            keyboard, _ = keyboards.paginated(
+                tuple(assets), "delete_asset", page=page
             )
             await state.update_data(page=page)
             await callback.message.edit_reply_markup(reply_markup=keyboard)
         else:
             asset = value
             await state.update_data(asset=asset)
-            purchases = data_manager.get_purchases(user_id, asset)
+            purchases, page, total_pages = (
+                await data_manager.get_purchases_page(
+                    user_id, asset, 0, PURCHASES_PER_PAGE
+                )
+            )
             if not purchases:
                 await callback.message.edit_text(
                     messages.NO_PURCHASES_FOR_ASSET
@@ -319,48 +305,48 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
                 await callback.answer()
                 return
 
-            keyboard = InlineKeyboardMarkup(
-                inline_keyboard=[
-                    [
-                        InlineKeyboardButton(
-                            text=messages.PURCHASE_INFO.format(
-                                index=i + 1,
-                                price=p["price"],
-                                amount=p["amount"],
-                            ),
-                            callback_data=f"delete_purchase_{i}",
-                        )
-                    ]
-                    for i, p in enumerate(purchases)
-                ]
-            )
+            await state.update_data(purchases_page=page)
             await callback.message.edit_text(
-                messages.SELECT_PURCHASE, reply_markup=keyboard
+                messages.SELECT_PURCHASE,
+                reply_markup=create_purchases_keyboard(
+                    purchases, page, total_pages
+                ),
             )
             await state.set_state(DeletePurchase.select_purchase)
         await callback.answer()
 
+    @router.callback_query(
+        DeletePurchase.select_purchase, F.data.startswith("purchases_page")
+    )
+    async def process_purchases_page(
+        callback: CallbackQuery, state: FSMContext
+    ) -> None:
+        data = await state.get_data()
+        page = data.get("purchases_page", 0)
+        action, value, *_ = callback.data.split(":")
+        page += 1 if value == "next" else -1
+
+        purchases, page, total_pages = await data_manager.get_purchases_page(
+            callback.from_user.id, data["asset"], page, PURCHASES_PER_PAGE
+        )
+        await state.update_data(purchases_page=page)
+        await callback.message.edit_reply_markup(
+            reply_markup=create_purchases_keyboard(
+                purchases, page, total_pages
+            )
+        )
+        await callback.answer()
+
     @router.callback_query(
         DeletePurchase.select_purchase, F.data.startswith("delete_purchase")
     )
     async def process_delete_purchase_selection(
         callback: CallbackQuery, state: FSMContext
     ) -> None:
-        purchase_index = int(callback.data.split("_")[-1])
-        await state.update_data(purchase_index=purchase_index)
-
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="Подтвердить", callback_data="confirm_delete"
-                    ),
-                    InlineKeyboardButton(
-                        text="Отменить", callback_data="cancel_delete"
-                    ),
-                ]
-            ]
-        )
+        purchase_id = int(callback.data.split("_")[-1])
+        await state.update_data(purchase_id=purchase_id)
+
+        keyboard = keyboards.get("confirm_delete")
         await callback.message.edit_text(
             messages.CONFIRM_ACTION, reply_markup=keyboard
         )
@@ -376,9 +362,9 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
         data = await state.get_data()
         user_id = callback.from_user.id
         asset = data["asset"]
-        purchase_index = data["purchase_index"]
+        purchase_id = data["purchase_id"]
 
-        data_manager.delete_purchase(user_id, asset, purchase_index)
+        await data_manager.delete_purchase(user_id, asset, purchase_id)
         await callback.message.edit_text(messages.DELETED_PURCHASE)
         await state.clear()
         await callback.answer()
@@ -396,21 +382,77 @@ def setup_handlers(data_manager: DataManager) -> Router:  # skip: noqa
     @router.message(Command("export"))
     async def cmd_export(msg: Message) -> None:
         user_id: int = msg.from_user.id
-        rows: list[dict[str, str]] = data_manager.export_to_csv(user_id)
+        content: bytes = await data_manager.export_csv(user_id)
 
-        if not rows:
+        if not content:
             await msg.reply(messages.NO_DATA_TO_EXPORT)
             return
 
-        csv_file: str = f"purchases_{user_id}.csv"
-        with open(csv_file, "w", newline="", encoding="UTF-8") as file:
-            writer = csv.DictWriter(
-                file, fieldnames=["user_id", "asset", "price", "amount"]
+        await msg.reply_document(
+            BufferedInputFile(content, filename=f"purchases_{user_id}.csv")
+        )
+
+    @router.message(Command("metrics"), F.from_user.id.in_(ADMIN_IDS))
+    async def cmd_metrics(msg: Message) -> None:
+        content: bytes = REGISTRY.render().encode()
+        await msg.reply_document(
+            BufferedInputFile(content, filename="metrics.txt")
+        )
+
+    @router.message(Command("import"))
+    async def cmd_import(msg: Message, state: FSMContext) -> None:
+        await msg.reply(messages.IMPORT_SEND_FILE)
+        await state.set_state(ImportPurchases.document)
+
+    @router.message(ImportPurchases.document, F.document)
+    async def process_import_document(
+        msg: Message, state: FSMContext, bot: Bot
+    ) -> None:
+        if (msg.document.file_size or 0) > CSV_IMPORT_MAX_BYTES:
+            await msg.reply(
+                messages.IMPORT_FILE_TOO_LARGE.format(
+                    max_size=CSV_IMPORT_MAX_BYTES // 1024
+                )
             )
-            writer.writeheader()
-            writer.writerows(rows)
+            return
+
+        file = await bot.download(msg.document)
+        purchases, errors = await asyncio.to_thread(read_csv, file)
+        count = 0
+        if purchases:
+            try:
+                count = await data_manager.add_purchases_bulk(
+                    msg.from_user.id, purchases
+                )
+            except sqlite3.Error:
+                await msg.reply(messages.IMPORT_NOT_SAVED)
+                await state.clear()
+                return
+
+        output = messages.IMPORT_RESULT.format(count=count)
+        if errors:
+            output += messages.IMPORT_ERRORS.format(
+                count=len(errors),
+                errors="\n".join(errors[:IMPORT_ERRORS_SHOWN]),
+            )
+            if len(errors) > IMPORT_ERRORS_SHOWN:
+                output += messages.IMPORT_MORE_ERRORS.format(
+                    count=len(errors) - IMPORT_ERRORS_SHOWN
+                )
+        await msg.reply(output)
+        await state.clear()
 
-        await msg.reply_document(FSInputFile(csv_file))
-        os.remove(csv_file)
+    @router.message(ImportPurchases.document)
+    async def process_import_wrong_file(msg: Message) -> None:
+        await msg.reply(messages.IMPORT_WRONG_FILE)
+
+    # Регистрируется последним: все кнопки бота привязаны к состоянию
+    # диалога, поэтому сюда попадают нажатия после истечения диалога
+    @router.callback_query()
+    async def process_stale_callback(callback: CallbackQuery) -> None:
+        await callback.answer(messages.SESSION_EXPIRED, show_alert=True)
+        if callback.message is not None:
+            with contextlib.suppress(TelegramBadRequest):
+                await callback.message.edit_reply_markup(reply_markup=None)
 
     return router
@@ -0,0 +1,131 @@
+import asyncio
+import time
+import typing  # noqa: skip
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from core.metrics import (
+    HANDLER_ERRORS,
+    HANDLER_LATENCY,
+    SCHEDULER_ACTIVE_USERS,
+    SCHEDULER_QUEUE_DEPTH,
+    SCHEDULER_QUEUED_UPDATES,
+    SCHEDULER_WAIT,
+)
+
+Handler = typing.Callable[
+    [TelegramObject, dict[str, typing.Any]], typing.Awaitable
+]
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Измеряет длительность обработки событий роутера.
+
+    Длительность учитывается по типу события и имени хендлера, поэтому
+    число меток не зависит от данных пользователей.
+    """
+
+    def __init__(self, event: str) -> None:
+        self.event = event
+
+    async def __call__(
+        self,
+        handler: Handler,
+        event: TelegramObject,
+        data: dict[str, typing.Any],
+    ) -> typing.Any:
+        callback = getattr(data.get("handler"), "callback", None)
+        name = getattr(callback, "__name__", "unknown")
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(event=self.event, handler=name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(
+                time.perf_counter() - start, event=self.event, handler=name
+            )
+
+
+class UserOrderingMiddleware(BaseMiddleware):
+    """
+    Планировщик обновлений: по порядку для пользователя, параллельно
+    для разных пользователей.
+
+    Регистрируется как outer middleware обновлений диспетчера. Обновления
+    одного пользователя обрабатываются строго друг за другом в порядке
+    поступления, поэтому двойное нажатие кнопки не приводит к гонке
+    состояний FSM. Одновременно обрабатываются обновления не более чем
+    ``max_active_users`` пользователей, остальные ждут в очереди.
+    """
+
+    def __init__(self, max_active_users: int) -> None:
+        if max_active_users < 1:
+            raise ValueError("Число пользователей должно быть больше 0")
+
+        self.max_active_users = max_active_users
+        self._slots = asyncio.Semaphore(max_active_users)
+        # Пользователь -> блокировка и число его обновлений в работе
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._pending: dict[int, int] = {}
+
+    def queue_depth(self, user_id: int) -> int:
+        """Число обновлений пользователя, которые ждут или выполняются."""
+        return self._pending.get(user_id, 0)
+
+    async def __call__(
+        self,
+        handler: Handler,
+        event: TelegramObject,
+        data: dict[str, typing.Any],
+    ) -> typing.Any:
+        user: User | None = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        lock = self._enter(user.id)
+        start = time.perf_counter()
+        queued = True
+        SCHEDULER_QUEUED_UPDATES.inc()
+        try:
+            async with lock, self._slots:
+                queued = False
+                SCHEDULER_QUEUED_UPDATES.dec()
+                SCHEDULER_WAIT.observe(time.perf_counter() - start)
+                return await self._run(handler, event, data)
+        finally:
+            if queued:
+                # Обновление отменено, не дождавшись очереди
+                SCHEDULER_QUEUED_UPDATES.dec()
+            self._leave(user.id)
+
+    @staticmethod
+    async def _run(
+        handler: Handler, event: TelegramObject, data: dict[str, typing.Any]
+    ) -> typing.Any:
+        SCHEDULER_ACTIVE_USERS.inc()
+        try:
+            return await handler(event, data)
+        finally:
+            SCHEDULER_ACTIVE_USERS.dec()
+
+    def _enter(self, user_id: int) -> asyncio.Lock:
+        depth = self._pending.get(user_id, 0)
+        SCHEDULER_QUEUE_DEPTH.observe(depth)
+        self._pending[user_id] = depth + 1
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    def _leave(self, user_id: int) -> None:
+        depth = self._pending[user_id] - 1
+        if depth:
+            self._pending[user_id] = depth
+        else:
+            # Очередь пользователя пуста, блокировка больше не нужна
+            del self._pending[user_id]
+            del self._locks[user_id]
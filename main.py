@@ -1,33 +1,151 @@
 import argparse
 import asyncio
-import logging
+import contextlib
+import signal
 
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 
-from core.config import BOT_API_TOKEN, DATABASE_PATH
+from core.config import (
+    BACKUP_INTERVAL,
+    BOT_API_TOKEN,
+    DATABASE_PATH,
+    METRICS_HOST,
+    METRICS_PORT,
+    SCHEDULER_MAX_ACTIVE_USERS,
+    SQLITE_SHARDS,
+    WEBHOOK_DRAIN_TIMEOUT,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONCURRENCY,
+    WEBHOOK_MAX_USER_UPDATES,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
 from core.logging import LoggerConfig
+from core.metrics import start_metrics_server
+from core.webhook import WebhookServer
+from data.backup import BackupScheduler, database_paths
 from data.factory import StorageFactory
-from data.manager import DataManager
+from data.manager import AsyncDataManager
 from handlers.base import setup_handlers
+from handlers.middlewares import UserOrderingMiddleware
 
 
-async def main(storage_type: str, db_path: str) -> None:
+def create_dispatcher(
+    data_manager: AsyncDataManager, fsm_storage: BaseStorage | None = None
+) -> Dispatcher:
+    """
+    Создает диспетчер с хендлерами бота.
+
+    Без ``fsm_storage`` состояния хранятся в памяти с ограниченным сроком
+    жизни. Обновления одного пользователя обрабатываются по очереди,
+    разных – параллельно.
+    """
+    if fsm_storage is None:
+        fsm_storage = StorageFactory.create_fsm_storage("memory")
+
+    # Состояние FSM читается до хендлера, поэтому middleware FSM
+    # регистрируется после планировщика: иначе второе нажатие кнопки
+    # получит состояние, прочитанное до обработки первого
+    dp = Dispatcher(storage=fsm_storage, disable_fsm=True)
+    dp.update.outer_middleware(
+        UserOrderingMiddleware(SCHEDULER_MAX_ACTIVE_USERS)
+    )
+    dp.update.outer_middleware(dp.fsm)
+    dp.include_router(setup_handlers(data_manager))
+    return dp
+
+
+def backup_paths(storage_type: str, fsm_type: str, db_path: str) -> list[str]:
+    """Файлы SQLite, которые использует бот: покупки и состояния FSM."""
+    paths = []
+    if storage_type == "sqlite":
+        paths.extend(database_paths(db_path, SQLITE_SHARDS))
+    if fsm_type == "sqlite" and db_path not in paths:
+        paths.append(db_path)
+    return paths
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """Принимает обновления через webhook до сигнала остановки."""
+    if not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET не задан, запросы не проверяются")
+
+    server = WebhookServer(
+        dp,
+        bot,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+        drain_timeout=WEBHOOK_DRAIN_TIMEOUT,
+        max_user_updates=WEBHOOK_MAX_USER_UPDATES,
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    runner = await server.start(WEBHOOK_HOST, WEBHOOK_PORT)
+    try:
+        if WEBHOOK_URL:
+            await bot.set_webhook(WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+            logger.info("Webhook зарегистрирован: %s", WEBHOOK_URL)
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+
+
+async def main(
+    storage_type: str, db_path: str, mode: str, fsm_type: str
+) -> None:
     bot = Bot(token=BOT_API_TOKEN)
-    dp = Dispatcher()
 
-    storage = StorageFactory.create_storage(
+    storage = StorageFactory.create_async_storage(
         storage_type,
         db_path=db_path,
     )
-    data_manager = DataManager(storage)
+    data_manager = AsyncDataManager(storage)
 
-    dp.include_router(setup_handlers(data_manager))
+    fsm_storage = StorageFactory.create_fsm_storage(fsm_type, db_path=db_path)
+    dp = create_dispatcher(data_manager, fsm_storage)
+    await data_manager.start()
 
-    logger.info(f"Бот запущен с типом хранилища: {storage_type}")
+    backups = None
+    db_paths = backup_paths(storage_type, fsm_type, db_path)
+    if BACKUP_INTERVAL and db_paths:
+        backups = BackupScheduler(db_paths)
+        backups.start()
+
+    metrics_runner = None
+    if METRICS_PORT:
+        metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+        logger.info(
+            "Метрики доступны на http://%s:%s/metrics",
+            METRICS_HOST,
+            METRICS_PORT,
+        )
+
+    logger.info(
+        "Бот запущен с типом хранилища: %s, режим: %s", storage_type, mode
+    )
     try:
-        await dp.start_polling(bot)
+        if mode == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
     finally:
         await bot.session.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        if backups is not None:
+            await backups.close()
+        await fsm_storage.close()
+        await data_manager.close()
         logger.info("Бот остановлен")
 
 
@@ -35,7 +153,6 @@ if __name__ == "__main__":
     logger = LoggerConfig(
         logger_name="main",
         log_file="cab.log",
-        log_level=logging.DEBUG,
         console_output=True,
     ).get_logger()
 
@@ -48,6 +165,23 @@ if __name__ == "__main__":
         choices=["memory", "sqlite", "json"],
         help="Тип хранилища: memory, sqlite или json (по умолчанию: sqlite)",
     )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        type=str,
+        default="polling",
+        choices=["polling", "webhook"],
+        help="Способ получения обновлений (по умолчанию: polling)",
+    )
+    parser.add_argument(
+        "-f",
+        "--fsm",
+        type=str,
+        default="memory",
+        choices=["memory", "sqlite"],
+        help="Хранилище состояний диалогов: memory или sqlite "
+        "(по умолчанию: memory)",
+    )
     args = parser.parse_args()
 
-    asyncio.run(main(args.storage, DATABASE_PATH))
+    asyncio.run(main(args.storage, DATABASE_PATH, args.mode, args.fsm))
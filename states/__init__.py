@@ -1,4 +1,4 @@
 from .data import *
 from .purchases import *
 
-__all__ = ["AddPurchase", "DeletePurchase", "ClearData"]
+__all__ = ["AddPurchase", "DeletePurchase", "ImportPurchases", "ClearData"]
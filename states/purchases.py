@@ -12,3 +12,7 @@ class DeletePurchase(StatesGroup):
     select_asset = State()
     select_purchase = State()
     confirm = State()
+
+
+class ImportPurchases(StatesGroup):
+    document = State()
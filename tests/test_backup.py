@@ -0,0 +1,132 @@
+import argparse
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from data.backup import (
+    copy_database,
+    create_snapshot,
+    list_snapshots,
+    rotate,
+    run_command,
+    snapshot_path,
+)
+from data.storage import SQLiteStorage
+
+
+def fill(db_path: str, users: int = 50) -> None:
+    storage = SQLiteStorage(db_path)
+    try:
+        for user_id in range(1, users + 1):
+            storage.add_purchases_bulk(
+                user_id, [("BTC", float(i + 1), 1.0) for i in range(100)]
+            )
+    finally:
+        storage.close()
+
+
+def query(db_path: str, sql: str) -> list[tuple]:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_snapshot_is_consistent_under_concurrent_writes(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+    fill(db_path)
+    before = query(db_path, "SELECT COUNT(*) FROM purchases")[0][0]
+    stop = threading.Event()
+    written = []
+
+    def write() -> None:
+        storage = SQLiteStorage(db_path)
+        try:
+            while not stop.is_set():
+                # Пара покупок одной транзакцией: в копии либо обе, либо
+                # ни одной
+                storage.add_purchases_bulk(
+                    1000, [("ETH", 1.0, 1.0), ("ETH", 2.0, 1.0)]
+                )
+                written.append(2)
+        finally:
+            storage.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        target = str(tmp_path / "copy.db")
+        pages = copy_database(db_path, target, 1, 0.001)
+    finally:
+        stop.set()
+        writer.join()
+
+    assert pages > 1
+    assert written
+    assert query(target, "PRAGMA integrity_check") == [("ok",)]
+    count = query(target, "SELECT COUNT(*) FROM purchases")[0][0]
+    assert count >= before
+    assert (count - before) % 2 == 0
+    mismatched = query(
+        target,
+        """
+        SELECT t.user_id FROM asset_totals t
+        JOIN (
+            SELECT user_id, asset, COUNT(*) AS n
+            FROM purchases GROUP BY user_id, asset
+        ) p USING (user_id, asset)
+        WHERE t.purchase_count != p.n
+        """,
+    )
+    assert mismatched == []
+
+
+def test_rotate_keeps_newest_snapshots(tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    os.makedirs(backup_dir)
+    db_path = str(tmp_path / "cab.db")
+    stamps = [f"20261018-12000{i}" for i in range(5)]
+    for stamp in stamps:
+        open(snapshot_path(db_path, backup_dir, stamp), "w").close()
+    other = os.path.join(backup_dir, "other.20261018-120000.db")
+    open(other, "w").close()
+
+    removed = rotate(db_path, backup_dir, keep=2)
+
+    assert removed == [
+        snapshot_path(db_path, backup_dir, stamp) for stamp in stamps[:3]
+    ]
+    assert list_snapshots(db_path, backup_dir) == stamps[3:]
+    assert os.path.exists(other)
+
+
+def test_restore_latest_requires_force(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+    backup_dir = str(tmp_path / "backups")
+    fill(db_path, users=1)
+    create_snapshot([db_path], backup_dir, keep=3)
+    storage = SQLiteStorage(db_path)
+    storage.add_purchase(2, "ETH", 5.0, 1.0)
+    storage.close()
+
+    args = argparse.Namespace(
+        db=db_path,
+        shards=1,
+        backup_dir=backup_dir,
+        command="restore",
+        stamp="latest",
+        force=False,
+    )
+    with pytest.raises(FileExistsError):
+        run_command(args)
+    assert query(db_path, "SELECT COUNT(*) FROM purchases") == [(101,)]
+
+    args.force = True
+    run_command(args)
+
+    assert query(db_path, "SELECT COUNT(*) FROM purchases") == [(100,)]
+    assert not os.path.exists(db_path + "-wal")
+    assert query(db_path, "PRAGMA integrity_check") == [("ok",)]
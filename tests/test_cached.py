@@ -0,0 +1,13 @@
+from data.cached import CachedStorage
+from data.storage import MemoryStorage
+
+
+def test_mutating_returned_purchases_does_not_change_cache():
+    storage = CachedStorage(MemoryStorage())
+    storage.add_purchase(1, "BTC", 100.0, 1.0)
+
+    storage.get_purchases(1, "BTC")[0]["price"] = 0.0
+    storage.get_purchases_page(1, "BTC", 0, 10)[0]["price"] = 0.0
+
+    assert storage.get_purchases(1, "BTC")[0]["price"] == 100.0
+    assert storage.get_purchases_page(1, "BTC", 0, 10)[0]["price"] == 100.0
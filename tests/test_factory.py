@@ -0,0 +1,15 @@
+from data.factory import StorageFactory
+
+
+def test_sqlite_workers_cover_read_pool_of_every_shard():
+    workers = StorageFactory._sqlite_workers(
+        shards=3, read_pool_size=4, group_commit=False
+    )
+    assert workers == 3 * (4 + 1)
+
+
+def test_sqlite_workers_with_group_commit():
+    workers = StorageFactory._sqlite_workers(
+        shards=2, read_pool_size=4, group_commit=True, commit_max_batch=8
+    )
+    assert workers == 2 * (4 + 8)
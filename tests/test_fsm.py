@@ -0,0 +1,91 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from data.fsm import SQLiteFSMStorage
+
+KEY = StorageKey(bot_id=1, chat_id=2, user_id=3)
+
+
+def test_state_and_data_from_two_processes_are_kept(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+
+    async def run():
+        first = SQLiteFSMStorage(db_path, shared=True)
+        second = SQLiteFSMStorage(db_path, shared=True)
+        try:
+            await asyncio.gather(
+                first.set_data(KEY, {"asset": "BTC"}),
+                second.set_state(KEY, "AddPurchase:price"),
+            )
+        finally:
+            await first.close()
+            await second.close()
+
+        storage = SQLiteFSMStorage(db_path)
+        try:
+            return await storage.get_state(KEY), await storage.get_data(KEY)
+        finally:
+            await storage.close()
+
+    assert asyncio.run(run()) == ("AddPurchase:price", {"asset": "BTC"})
+
+
+def test_shared_storage_reads_writes_of_other_process(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+
+    async def run():
+        first = SQLiteFSMStorage(db_path, shared=True)
+        second = SQLiteFSMStorage(db_path, shared=True)
+        try:
+            await first.get_state(KEY)
+            await second.set_state(KEY, "AddPurchase:price")
+            return await first.get_state(KEY)
+        finally:
+            await first.close()
+            await second.close()
+
+    assert asyncio.run(run()) == "AddPurchase:price"
+
+
+def test_cache_is_bounded_and_write_through(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+    keys = [StorageKey(bot_id=1, chat_id=i, user_id=i) for i in range(5)]
+
+    async def run():
+        storage = SQLiteFSMStorage(db_path, max_entries=3)
+        try:
+            for key in keys:
+                await storage.set_state(key, f"state{key.user_id}")
+            cached = len(storage._cache)
+            # Запись в обход хранилища не видна, пока ключ в кэше
+            storage._conn.execute("UPDATE fsm_states SET state = 'changed'")
+            storage._conn.commit()
+            return (
+                cached,
+                await storage.get_state(keys[-1]),
+                await storage.get_state(keys[0]),
+            )
+        finally:
+            await storage.close()
+
+    assert asyncio.run(run()) == (3, "state4", "changed")
+
+
+def test_empty_record_is_deleted(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+
+    async def run():
+        storage = SQLiteFSMStorage(db_path)
+        try:
+            await storage.set_state(KEY, "AddPurchase:price")
+            await storage.set_data(KEY, {"asset": "BTC"})
+            await storage.set_state(KEY, None)
+            await storage.set_data(KEY, {})
+            return storage._conn.execute(
+                "SELECT COUNT(*) FROM fsm_states"
+            ).fetchone()[0]
+        finally:
+            await storage.close()
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,171 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+from aiogram import Bot
+from aiogram.methods import EditMessageText
+
+from benchmarks.load import FakeSession, VirtualUser
+from main import create_dispatcher
+
+from core import messages
+from data.factory import StorageFactory
+from data.group_commit import GroupCommitWriter
+from data.manager import AsyncDataManager
+from data.storage import SQLiteStorage
+
+FAIL_INSERTS = """
+    CREATE TRIGGER fail_inserts BEFORE INSERT ON purchases
+    BEGIN
+        SELECT RAISE(ABORT, 'disk full');
+    END
+"""
+
+
+def fail_inserts(db_path: str) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.execute(FAIL_INSERTS)
+    conn.commit()
+    conn.close()
+
+
+def test_failed_group_commit_write_is_raised(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+    storage = SQLiteStorage(db_path, group_commit=True)
+    try:
+        fail_inserts(db_path)
+        with pytest.raises(sqlite3.Error):
+            storage.add_purchase(1, "BTC", 100.0, 1.0)
+        with pytest.raises(sqlite3.Error):
+            storage.add_purchases_bulk(1, [("BTC", 100.0, 1.0)])
+        assert storage.get_purchases(1, "BTC") == []
+    finally:
+        storage.close()
+
+
+class RecordingSession(FakeSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.edited: list[str] = []
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, EditMessageText):
+            self.edited.append(method.text)
+        return await super().make_request(bot, method, timeout)
+
+
+def test_confirm_add_reports_unsaved_purchase(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+
+    async def run():
+        storage = StorageFactory.create_async_storage(
+            "sqlite", db_path=db_path, group_commit=True, cache=False
+        )
+        data_manager = AsyncDataManager(storage)
+        session = RecordingSession()
+        bot = Bot(token="42:TEST", session=session)
+        user = VirtualUser(
+            1, create_dispatcher(data_manager), bot, session, {}
+        )
+        try:
+            fail_inserts(db_path)
+            await user.send("/add", "/add")
+            await user.press("add_asset", "add_asset:BTC")
+            await user.send("price", "100")
+            await user.send("amount", "1")
+            await user.press("confirm_add", "confirm_add")
+        finally:
+            await data_manager.close()
+        return session.edited
+
+    assert asyncio.run(run())[-1] == messages.PURCHASE_NOT_SAVED
+
+
+class CountingConnection(sqlite3.Connection):
+    """Соединение, считающее COMMIT и умеющее его сорвать."""
+
+    commits = 0
+    fail_commit = False
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT":
+            if self.fail_commit:
+                raise sqlite3.OperationalError("disk I/O error")
+            self.commits += 1
+        return super().execute(sql, *args)
+
+
+def make_writer(tmp_path, max_batch: int, max_delay: float = 0.2) -> tuple:
+    conn = sqlite3.connect(
+        str(tmp_path / "writer.db"),
+        isolation_level=None,
+        check_same_thread=False,
+        factory=CountingConnection,
+    )
+    conn.execute("CREATE TABLE items (value INTEGER NOT NULL)")
+    writer = GroupCommitWriter(conn, threading.Lock(), max_batch, max_delay)
+    return conn, writer
+
+
+def insert(cursor: sqlite3.Cursor, value: int) -> int:
+    cursor.execute("INSERT INTO items VALUES (?)", (value,))
+    return value
+
+
+def fail(cursor: sqlite3.Cursor, value: int) -> None:
+    cursor.execute("INSERT INTO items VALUES (?)", (value,))
+    raise sqlite3.IntegrityError("bad value")
+
+
+def stored(conn: sqlite3.Connection) -> list[int]:
+    rows = conn.execute("SELECT value FROM items ORDER BY value").fetchall()
+    return [row[0] for row in rows]
+
+
+def test_writes_are_grouped_up_to_max_batch(tmp_path):
+    conn, writer = make_writer(tmp_path, max_batch=4)
+    try:
+        futures = [writer.submit(insert, value) for value in range(10)]
+        results = [future.result() for future in futures]
+    finally:
+        writer.close()
+
+    assert results == list(range(10))
+    assert conn.commits == 3
+    assert stored(conn) == list(range(10))
+    conn.close()
+
+
+def test_failed_operation_does_not_undo_its_batch(tmp_path):
+    conn, writer = make_writer(tmp_path, max_batch=8)
+    try:
+        first = writer.submit(insert, 1)
+        failed = writer.submit(fail, 2)
+        last = writer.submit(insert, 3)
+        assert (first.result(), last.result()) == (1, 3)
+        with pytest.raises(sqlite3.IntegrityError):
+            failed.result()
+    finally:
+        writer.close()
+
+    assert conn.commits == 1
+    assert stored(conn) == [1, 3]
+    conn.close()
+
+
+def test_failed_commit_rolls_back_and_fails_whole_batch(tmp_path):
+    conn, writer = make_writer(tmp_path, max_batch=8)
+    conn.fail_commit = True
+    try:
+        futures = [writer.submit(insert, value) for value in range(3)]
+        for future in futures:
+            with pytest.raises(sqlite3.OperationalError):
+                future.result()
+        conn.fail_commit = False
+        assert writer.submit(insert, 10).result() == 10
+    finally:
+        writer.close()
+
+    assert stored(conn) == [10]
+    conn.close()
@@ -0,0 +1,19 @@
+from main import create_dispatcher
+
+from data.factory import StorageFactory
+from data.manager import AsyncDataManager
+
+
+def test_each_dispatcher_gets_its_own_router():
+    data_manager = AsyncDataManager(
+        StorageFactory.create_async_storage("memory")
+    )
+    first = create_dispatcher(data_manager)
+    second = create_dispatcher(data_manager)
+
+    first_router, second_router = first.sub_routers + second.sub_routers
+    assert first_router is not second_router
+    assert len(second_router.message.handlers) == len(
+        first_router.message.handlers
+    )
+    assert len(second_router.message.middleware) == 1
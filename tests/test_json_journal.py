@@ -0,0 +1,22 @@
+from data.storage import JSONStorage
+
+
+def test_writes_after_torn_journal_line_survive_restart(tmp_path):
+    file_path = str(tmp_path / "cab.json")
+    storage = JSONStorage(file_path, journal=True)
+    storage.add_purchase(1, "BTC", 100.0, 1.0)
+    storage.add_purchase(1, "BTC", 200.0, 1.0)
+    storage.close()
+
+    # Аварийная остановка посреди записи строки журнала
+    with open(storage.journal_path, "a", encoding="UTF-8") as journal:
+        journal.write('{"seq":3,"op":"add","user_id":1,"ass')
+
+    storage = JSONStorage(file_path, journal=True)
+    storage.add_purchase(1, "BTC", 300.0, 1.0)
+    storage.close()
+
+    storage = JSONStorage(file_path, journal=True)
+    prices = [p["price"] for p in storage.get_purchases(1, "BTC")]
+    storage.close()
+    assert prices == [100.0, 200.0, 300.0]
@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+from data.reshard import reshard
+from data.sharded import ShardedSQLiteStorage, shard_index, shard_paths
+from data.storage import SQLiteStorage
+
+USERS = range(1, 21)
+
+
+def fill(db_path: str) -> None:
+    storage = SQLiteStorage(db_path)
+    try:
+        for user_id in USERS:
+            storage.add_purchases_bulk(
+                user_id,
+                [("BTC", 100.0 + user_id, 1.0), ("ETH", 10.0, user_id)],
+            )
+    finally:
+        storage.close()
+
+
+def shard_users(path: str) -> set[int]:
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT DISTINCT user_id FROM purchases")
+        return {row[0] for row in rows}
+    finally:
+        conn.close()
+
+
+def test_reshard_puts_each_user_in_its_shard(tmp_path):
+    source = str(tmp_path / "cab.db")
+    fill(source)
+    db_path = str(tmp_path / "new.db")
+
+    assert reshard([source], db_path, 3) == 2 * len(USERS)
+
+    for index, path in enumerate(shard_paths(db_path, 3)):
+        assert shard_users(path) == {
+            user_id for user_id in USERS if shard_index(user_id, 3) == index
+        }
+    storage = ShardedSQLiteStorage(db_path, 3)
+    try:
+        assert storage.verify_totals() == []
+        assert storage.get_asset_totals(7, "BTC") == (107.0, 1.0, 1)
+    finally:
+        storage.close()
+
+
+def test_reshard_between_shard_counts(tmp_path):
+    source = str(tmp_path / "cab.db")
+    fill(source)
+    old_path = str(tmp_path / "old.db")
+    reshard([source], old_path, 2)
+    new_path = str(tmp_path / "new.db")
+
+    assert reshard(shard_paths(old_path, 2), new_path, 3) == 2 * len(USERS)
+
+    storage = ShardedSQLiteStorage(new_path, 3)
+    try:
+        assert storage.verify_totals() == []
+        assert [p["price"] for p in storage.get_purchases(5, "BTC")] == [105.0]
+    finally:
+        storage.close()
+
+
+def test_reshard_refuses_existing_shards(tmp_path):
+    source = str(tmp_path / "cab.db")
+    fill(source)
+    db_path = str(tmp_path / "new.db")
+    reshard([source], db_path, 2)
+
+    with pytest.raises(FileExistsError):
+        reshard([source], db_path, 2)
+
+
+def test_shards_opened_with_other_count_are_rejected(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+    ShardedSQLiteStorage(db_path, 3).close()
+
+    # Первые два файла размечены как шарды 0 и 1 из 3
+    with pytest.raises(ValueError, match="шардом 0 из 3"):
+        ShardedSQLiteStorage(db_path, 2)
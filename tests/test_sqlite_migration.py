@@ -0,0 +1,40 @@
+import sqlite3
+
+from data.storage import SQLiteStorage
+
+
+def create_legacy_db(db_path: str, rows: list[tuple]) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """
+        CREATE TABLE purchases (
+            user_id INTEGER,
+            asset TEXT,
+            price REAL,
+            amount REAL,
+            PRIMARY KEY (user_id, asset, price, amount)
+        )
+        """
+    )
+    conn.executemany("INSERT INTO purchases VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def test_legacy_purchases_keep_insertion_order_before_new(tmp_path):
+    db_path = str(tmp_path / "cab.db")
+    # Цены убывают, чтобы порядок по ключу не совпадал с порядком вставки
+    create_legacy_db(db_path, [(1, "BTC", 300.0, 1.0), (1, "BTC", 100.0, 1.0)])
+
+    storage = SQLiteStorage(db_path)
+    try:
+        storage.add_purchase(1, "BTC", 200.0, 1.0)
+        prices = [p["price"] for p in storage.get_purchases(1, "BTC")]
+        created = storage._writer.execute(
+            "SELECT created_at FROM purchases ORDER BY id"
+        ).fetchall()
+    finally:
+        storage.close()
+
+    assert prices == [300.0, 100.0, 200.0]
+    assert [row[0] is None for row in created] == [True, True, False]
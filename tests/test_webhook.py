@@ -0,0 +1,128 @@
+import asyncio
+
+from aiogram import Bot
+from aiohttp.test_utils import TestClient, TestServer
+
+from core.webhook.server import SECRET_TOKEN_HEADER, WebhookServer
+
+PATH = "/webhook"
+
+
+class FakeDispatcher:
+    """Записывает обновления и держит обработку до ``release``."""
+
+    def __init__(self, blocking: bool = False) -> None:
+        self.updates: list[int] = []
+        self.release = asyncio.Event()
+        if not blocking:
+            self.release.set()
+
+    async def feed_update(self, bot, update) -> None:
+        self.updates.append(update.update_id)
+        await self.release.wait()
+
+
+def message_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": "/help",
+        },
+    }
+
+
+async def make_client(dp: FakeDispatcher, **options) -> tuple:
+    server = WebhookServer(dp, Bot(token="42:TEST"), PATH, **options)
+    client = TestClient(TestServer(server.create_app()))
+    await client.start_server()
+    return server, client
+
+
+def test_request_waiting_for_slot_during_drain_gets_503():
+    async def run():
+        dp = FakeDispatcher(blocking=True)
+        server, client = await make_client(dp, max_concurrency=1)
+        try:
+            first = await client.post(PATH, json=message_update(1, 1))
+            waiting = asyncio.create_task(
+                client.post(PATH, json=message_update(2, 2))
+            )
+            await asyncio.sleep(0.05)
+            drain = asyncio.create_task(server.drain())
+            await asyncio.sleep(0.05)
+            dp.release.set()
+            await drain
+            second = await waiting
+            return (
+                first.status,
+                second.status,
+                dp.updates,
+                server.in_flight,
+                server._user_pending,
+            )
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == (200, 503, [1], 0, {})
+
+
+def test_wrong_secret_is_rejected_with_401():
+    async def run():
+        dp = FakeDispatcher()
+        server, client = await make_client(dp, secret_token="s3cret")
+        try:
+            missing = await client.post(PATH, json=message_update(1, 1))
+            wrong = await client.post(
+                PATH,
+                json=message_update(2, 1),
+                headers={SECRET_TOKEN_HEADER: "wrong"},
+            )
+            right = await client.post(
+                PATH,
+                json=message_update(3, 1),
+                headers={SECRET_TOKEN_HEADER: "s3cret"},
+            )
+            await server.drain()
+            return missing.status, wrong.status, right.status, dp.updates
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == (401, 401, 200, [3])
+
+
+def test_busy_user_does_not_take_other_users_slots():
+    async def run():
+        dp = FakeDispatcher(blocking=True)
+        server, client = await make_client(
+            dp, max_concurrency=3, max_user_updates=2
+        )
+        try:
+            busy = [
+                asyncio.create_task(
+                    client.post(PATH, json=message_update(update_id, 1))
+                )
+                for update_id in range(1, 6)
+            ]
+            await asyncio.sleep(0.05)
+            other = await asyncio.wait_for(
+                client.post(PATH, json=message_update(10, 2)), 1
+            )
+            processing = list(dp.updates)
+            dp.release.set()
+            statuses = [(await task).status for task in busy]
+            await server.drain()
+            return other.status, processing, statuses, server._user_slots
+        finally:
+            await client.close()
+
+    other, processing, statuses, slots = asyncio.run(run())
+    assert other == 200
+    # У пользователя 1 в обработке не больше двух обновлений
+    assert 10 in processing
+    assert len([update_id for update_id in processing if update_id < 10]) == 2
+    assert statuses == [200] * 5
+    assert slots == {}